@@ -0,0 +1,2 @@
+# Puts the repository root on sys.path so tests import `modules`, `entities`
+# and `helpers` the same way test.py does.
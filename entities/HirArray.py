@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator
+
+try:
+    import numpy
+except ImportError:  # optional: scans fall back to array.index
+    numpy = None
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable
+from helpers.HirHelper import ARITHMETIC_OPERATORS, CONDITIONAL_OPERATORS, UNARY_OPERATORS
+
+KINDS = (
+    AssignmentHirLine,
+    ArithmeticOpHirLine,
+    ConditionalOpHirLine,
+    UnaryOpHirLine,
+    CallHirLine,
+    IfOpHirLine,
+    GotoHirLine,
+    LabelHirLine,
+)
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+ASSIGNMENT, ARITHMETIC_OP, CONDITIONAL_OP, UNARY_OP, CALL, IF_OP, GOTO, LABEL = range(len(KINDS))
+
+OPERATORS = tuple(sorted(ARITHMETIC_OPERATORS | CONDITIONAL_OPERATORS | UNARY_OPERATORS))
+_OPERATOR_CODES = {operator: code for code, operator in enumerate(OPERATORS)}
+NO_OPERATOR = 0xFF
+
+NO_OPERAND = -1
+
+class HirFlag:
+    REMOVED = 1
+    CHANGED = 2
+
+
+class OperandTable:
+    """Interns every name, label and constant of a function to a small
+    integer ID. `names` take the first IDs, one per entry, and a later entry
+    of the same name wins, so seeded with a scope's `names_by_id` a
+    variable's ID is its symbol id. Other operands get IDs in order of
+    first appearance.
+    """
+    def __init__(self, names:Iterable[str] = ()):
+        self.values: list[Operand] = [intern_operand(name) for name in names]
+        self._ids: dict[Operand, int] = {name: i for i, name in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def id_of(self, operand:Operand) -> int:
+        operand_id = self._ids.get(operand)
+        if operand_id is None:
+            operand_id = self._ids[operand] = len(self.values)
+            self.values.append(intern_operand(operand))
+        return operand_id
+
+    def find(self, operand:Operand) -> int | None:
+        return self._ids.get(operand)
+
+    def value(self, operand_id:int) -> Operand:
+        return self.values[operand_id]
+
+    def is_name(self, operand_id:int) -> bool:
+        return isinstance(self.values[operand_id], str)
+
+    def is_temp(self, operand_id:int) -> bool:
+        value = self.values[operand_id]
+        return isinstance(value, str) and value.startswith('.t')
+
+
+class HirArray:
+    """HIR of one function stored column-wise: one typed array per field
+    instead of one object per line, with every operand interned in an
+    `OperandTable`.
+
+    `results` holds the defined variable, `lefts` and `rights` the operands
+    read and `targets` the label jumped to or defined, or the function
+    called. Call arguments are flattened into `args`; `arg_starts` and
+    `arg_counts` locate a line's arguments and `arg_lines` gives the line
+    each belongs to. Removed lines are flagged and their operands cleared,
+    so scans skip them without a check; `compact` drops them. Edited lines
+    are flagged too, so `to_lines` builds objects for those alone.
+
+    Def and use counts per operand are kept up to date by every edit.
+    Position scans such as `uses_of` compare a whole column at once, through
+    numpy when it is installed and `array.index` otherwise.
+    """
+    def __init__(self, symbol_table:SymbolTable|None = None):
+        self.symbol_table = symbol_table
+        self.operands = OperandTable(symbol_table.names_by_id() if symbol_table is not None else ())
+        self.kinds = array('B')
+        self.operators = array('B')
+        self.flags = array('B')
+        self.results = array('i')
+        self.lefts = array('i')
+        self.rights = array('i')
+        self.targets = array('i')
+        self.arg_starts = array('i')
+        self.arg_counts = array('H')
+        self.args = array('i')
+        self.arg_lines = array('i')
+        self.def_counts = array('i')
+        self.use_counts = array('i')
+        self._grow_counts()
+
+    @classmethod
+    def from_lines(cls, hir_lines:Iterable[HirLine], symbol_table:SymbolTable|None = None) -> HirArray:
+        hir_array = cls(symbol_table)
+        hir_array.extend(hir_lines)
+        return hir_array
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __eq__(self, other:object) -> bool:
+        if not isinstance(other, HirArray):
+            return NotImplemented
+        # Operand IDs depend on the order of edits, so lines are compared.
+        return [hir.render() for hir in self] == [hir.render() for hir in other]
+
+    @property
+    def nbytes(self) -> int:
+        columns = (self.kinds, self.operators, self.flags, self.results, self.lefts, self.rights, self.targets,
+                   self.arg_starts, self.arg_counts, self.args, self.arg_lines, self.def_counts, self.use_counts)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def _operand_id(self, operand:Operand|None) -> int:
+        if operand is None:
+            return NO_OPERAND
+        operand_id = self.operands.id_of(operand)
+        if operand_id >= len(self.def_counts):
+            self._grow_counts()
+        return operand_id
+
+    def _grow_counts(self):
+        zeros = array('i', [0]) * (len(self.operands) - len(self.def_counts))
+        self.def_counts.extend(zeros)
+        self.use_counts.extend(zeros)
+
+    def _count(self, position:int, step:int):
+        result = self.results[position]
+        if result != NO_OPERAND:
+            self.def_counts[result] += step
+        for operand_id in self.used_ids(position):
+            self.use_counts[operand_id] += step
+
+    def _count_line(self, hir:HirLine, result:int):
+        # Every operand of the line was interned by _fields already.
+        if result != NO_OPERAND:
+            self.def_counts[result] += 1
+        find = self.operands.find
+        for var in hir.used_vars():
+            self.use_counts[find(var)] += 1
+
+    def _fields(self, hir:HirLine) -> tuple[int, int, int, int, int, int]:
+        kind = _KIND_CODES.get(type(hir))
+        if kind is None:
+            raise NotImplementedError(f"HirArray storage for '{type(hir).__name__}' not implemented.")
+        operator, result, left, right, target = NO_OPERATOR, hir.defined_var(), None, None, None
+        if kind == ASSIGNMENT:
+            left = hir.value
+        elif kind in (ARITHMETIC_OP, CONDITIONAL_OP):
+            operator, left, right = _OPERATOR_CODES[hir.operator], hir.left_operand, hir.right_operand
+        elif kind == UNARY_OP:
+            operator, left = _OPERATOR_CODES[hir.operator], hir.operand
+        elif kind == CALL:
+            target = hir.func_name
+        elif kind == IF_OP:
+            left, target = hir.cond_var, hir.target_label
+        elif kind == GOTO:
+            target = hir.target_label
+        else:
+            target = hir.label_name
+        return kind, operator, self._operand_id(result), self._operand_id(left), self._operand_id(right), self._operand_id(target)
+
+    def _append_args(self, position:int, hir:HirLine) -> tuple[int, int]:
+        if not isinstance(hir, CallHirLine) or not hir.args:
+            return len(self.args), 0
+        start = len(self.args)
+        for arg in hir.args:
+            self.args.append(self._operand_id(arg))
+            self.arg_lines.append(position)
+        return start, len(hir.args)
+
+    def append(self, hir:HirLine):
+        position = len(self)
+        kind, operator, result, left, right, target = self._fields(hir)
+        start, count = self._append_args(position, hir)
+        self.kinds.append(kind)
+        self.operators.append(operator)
+        self.flags.append(0)
+        self.results.append(result)
+        self.lefts.append(left)
+        self.rights.append(right)
+        self.targets.append(target)
+        self.arg_starts.append(start)
+        self.arg_counts.append(count)
+        self._count_line(hir, result)
+
+    def extend(self, hir_lines:Iterable[HirLine]):
+        for hir in hir_lines:
+            self.append(hir)
+
+    def _clear(self, position:int):
+        self._count(position, -1)
+        start = self.arg_starts[position]
+        for i in range(start, start + self.arg_counts[position]):
+            self.args[i] = NO_OPERAND
+            self.arg_lines[i] = NO_OPERAND
+        self.arg_counts[position] = 0
+
+    def set_line(self, position:int, hir:HirLine):
+        self._clear(position)
+        kind, operator, result, left, right, target = self._fields(hir)
+        # A call's new arguments go to the end; its old slots stay cleared.
+        start, count = self._append_args(position, hir)
+        self.kinds[position] = kind
+        self.operators[position] = operator
+        self.flags[position] = HirFlag.CHANGED
+        self.results[position] = result
+        self.lefts[position] = left
+        self.rights[position] = right
+        self.targets[position] = target
+        self.arg_starts[position] = start
+        self.arg_counts[position] = count
+        self._count_line(hir, result)
+
+    def set_result(self, position:int, operand_id:int):
+        """Makes the assignment at `position` define `operand_id` instead."""
+        if operand_id >= len(self.def_counts):
+            self._grow_counts()
+        self.def_counts[self.results[position]] -= 1
+        self.def_counts[operand_id] += 1
+        self.results[position] = operand_id
+        self.flags[position] |= HirFlag.CHANGED
+
+    def remove(self, position:int):
+        if self.is_removed(position):
+            return
+        self._clear(position)
+        self.flags[position] |= HirFlag.REMOVED
+        self.results[position] = NO_OPERAND
+        self.lefts[position] = NO_OPERAND
+        self.rights[position] = NO_OPERAND
+        self.targets[position] = NO_OPERAND
+
+    def is_removed(self, position:int) -> bool:
+        return bool(self.flags[position] & HirFlag.REMOVED)
+
+    def used_ids(self, position:int) -> list[int]:
+        """IDs of the variables line `position` reads, like `used_vars`."""
+        values = self.operands.values
+        used = [operand_id for operand_id in (self.lefts[position], self.rights[position])
+                if operand_id != NO_OPERAND and isinstance(values[operand_id], str)]
+        start = self.arg_starts[position]
+        for i in range(start, start + self.arg_counts[position]):
+            if isinstance(values[self.args[i]], str):
+                used.append(self.args[i])
+        return used
+
+    def _value(self, operand_id:int) -> Operand | None:
+        return None if operand_id == NO_OPERAND else self.operands.values[operand_id]
+
+    def line(self, position:int) -> HirLine | None:
+        """Builds the HirLine stored at `position`, or None if it was removed."""
+        if self.is_removed(position):
+            return None
+        kind = self.kinds[position]
+        result = self._value(self.results[position])
+        left = self._value(self.lefts[position])
+        if kind == ASSIGNMENT:
+            return AssignmentHirLine(result, left)
+        if kind in (ARITHMETIC_OP, CONDITIONAL_OP):
+            return KINDS[kind](result, left, OPERATORS[self.operators[position]], self._value(self.rights[position]))
+        if kind == UNARY_OP:
+            return UnaryOpHirLine(result, OPERATORS[self.operators[position]], left)
+        target = self._value(self.targets[position])
+        if kind == CALL:
+            start = self.arg_starts[position]
+            args = [self.operands.values[self.args[i]] for i in range(start, start + self.arg_counts[position])]
+            return CallHirLine(result, target, args)
+        if kind == IF_OP:
+            return IfOpHirLine(left, target)
+        if kind == GOTO:
+            return GotoHirLine(target)
+        return LabelHirLine(target)
+
+    def __getitem__(self, position:int) -> HirLine | None:
+        return self.line(position)
+
+    def __iter__(self) -> Iterator[HirLine]:
+        for position in range(len(self)):
+            hir = self.line(position)
+            if hir is not None:
+                yield hir
+
+    def to_lines(self, unchanged:list[HirLine]|None = None) -> list[HirLine]:
+        """The lines still stored. `unchanged` are the lines the array was
+        built from; lines never edited since are taken from it as they are.
+        """
+        if unchanged is None:
+            return list(self)
+        lines = []
+        for position, flags in enumerate(self.flags):
+            if flags & HirFlag.REMOVED:
+                continue
+            lines.append(self.line(position) if flags & HirFlag.CHANGED else unchanged[position])
+        return lines
+
+    def compact(self) -> HirArray:
+        """Copy without the removed lines, built column by column. Operand
+        IDs and counts carry over, since removed lines were already
+        uncounted.
+        """
+        kept = [position for position, flags in enumerate(self.flags) if not flags & HirFlag.REMOVED]
+        compacted = HirArray.__new__(HirArray)
+        compacted.symbol_table = self.symbol_table
+        compacted.operands = self.operands
+        for name in ('kinds', 'operators', 'flags', 'results', 'lefts', 'rights', 'targets'):
+            column = getattr(self, name)
+            setattr(compacted, name, array(column.typecode, [column[position] for position in kept]))
+        compacted.arg_starts = array('i')
+        compacted.arg_counts = array('H')
+        compacted.args = array('i')
+        compacted.arg_lines = array('i')
+        for new_position, position in enumerate(kept):
+            start, count = self.arg_starts[position], self.arg_counts[position]
+            compacted.arg_starts.append(len(compacted.args))
+            compacted.arg_counts.append(count)
+            compacted.args.extend(self.args[start:start + count])
+            compacted.arg_lines.extend(array('i', [new_position]) * count)
+        compacted.def_counts = array('i', self.def_counts)
+        compacted.use_counts = array('i', self.use_counts)
+        return compacted
+
+    def _positions(self, column:array, key:int) -> list[int]:
+        if numpy is not None:
+            return numpy.nonzero(numpy.frombuffer(column, dtype=column.typecode) == key)[0].tolist()
+        positions = []
+        position = -1
+        try:
+            while True:
+                position = column.index(key, position + 1)
+                positions.append(position)
+        except ValueError:
+            return positions
+
+    def def_count(self, var_name:str) -> int:
+        operand_id = self.operands.find(var_name)
+        return 0 if operand_id is None else self.def_counts[operand_id]
+
+    def use_count(self, var_name:str) -> int:
+        """Reads of `var_name`, one per operand, so `a + a` counts twice."""
+        operand_id = self.operands.find(var_name)
+        return 0 if operand_id is None else self.use_counts[operand_id]
+
+    def defs_of(self, var_name:str) -> list[int]:
+        operand_id = self.operands.find(var_name)
+        if operand_id is None or not self.def_counts[operand_id]:
+            return []
+        return self._positions(self.results, operand_id)
+
+    def uses_of(self, var_name:str) -> list[int]:
+        """Positions of the lines reading `var_name`, in order."""
+        operand_id = self.operands.find(var_name)
+        if operand_id is None or not self.use_counts[operand_id]:
+            return []
+        if numpy is not None:
+            lefts = numpy.frombuffer(self.lefts, dtype='i')
+            rights = numpy.frombuffer(self.rights, dtype='i')
+            positions = numpy.nonzero((lefts == operand_id) | (rights == operand_id))[0]
+            if not len(self.args):
+                return positions.tolist()
+            args = numpy.frombuffer(self.args, dtype='i')
+            arg_lines = numpy.frombuffer(self.arg_lines, dtype='i')
+            return numpy.union1d(positions, arg_lines[args == operand_id]).tolist()
+        positions = set(self._positions(self.lefts, operand_id))
+        positions.update(self._positions(self.rights, operand_id))
+        positions.update(self.arg_lines[i] for i in self._positions(self.args, operand_id))
+        return sorted(positions)
+
+    def temps(self) -> set[str]:
+        # Every operand in the table came from a line that is still stored
+        # or was removed; count only the ones still referenced.
+        return {value for value, defs, uses in zip(self.operands.values, self.def_counts, self.use_counts)
+                if (defs or uses) and isinstance(value, str) and value.startswith('.t')}
@@ -1,34 +1,99 @@
 from __future__ import annotations
 
-from helpers.HirHelper import _op_eval
+import sys
+
+from helpers.HirHelper import evaluate_binary, format_val, ARITHMETIC_OPERATORS, CONDITIONAL_OPERATORS, UNARY_OPERATORS
+from helpers.TraceHelper import get_tracer, TraceLevel, TraceCategory
+
+Operand = int | str
+
+_fold_trace = get_tracer(TraceCategory.HIR_FOLD)
+
+class HirLineType:
+    ASSIGNMENT = "ASSIGNMENT"
+    ARITHMETIC_OP = "ARITHMETIC_OP"
+    CONDITIONAL_OP = "CONDITIONAL_OP"
+    UNARY_OP = "UNARY_OP"
+    CALL = "CALL"
+    IF_OP = "IF_OP"
+    GOTO = "GOTO"
+    LABEL = "LABEL"
+
+def intern_operand(operand:Operand) -> Operand:
+    # Names are interned so that passes can compare operands by identity and
+    # dictionaries keyed by them hash the same object every time.
+    if isinstance(operand, str):
+        return sys.intern(operand)
+    return operand
+
+def _rename(operand:Operand, mapping:dict[str, str]) -> Operand:
+    if isinstance(operand, str):
+        return mapping.get(operand, operand)
+    return operand
+
+def parse_operand(token:str) -> Operand:
+    if token.lstrip('-').isdigit():
+        return int(token)
+    return sys.intern(token)
+
 class HirLine:
-    def __init__(self, line:str):
-        self.line = line
-        self.splitted = line.split()
-        self.splitted_len = len(self.splitted)
-        self.type = None
+    __slots__ = ()
+    type:str|None = None
 
     def __str__(self):
-        return self.line
-    
+        return self.render()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.render()}>"
+
+    @property
+    def line(self) -> str:
+        return self.render()
+
+    def render(self) -> str:
+        raise NotImplementedError(f"render not implemented for {type(self).__name__}")
+
+    def defined_var(self) -> str | None:
+        return None
+
+    def used_vars(self) -> tuple[str, ...]:
+        return ()
+
+    def rename(self, mapping:dict[str, str]) -> HirLine:
+        """Copy of the line with variables and labels renamed through `mapping`."""
+        return self
+
+    def substitute(self, mapping:dict[str, Operand]) -> HirLine:
+        """Copy of the line with the variables it reads replaced through `mapping`."""
+        return self
 
     @staticmethod
     def parse_hir_line(hir_line:str) -> HirLine:
         splitted = hir_line.split()
         splitted_len = len(splitted)
         if splitted_len == 3 and splitted[1] == '=':
-            return AssignmentHirLine(hir_line)
-        elif splitted_len == 5 and splitted[3] in ['+', '-', '*', '/', '%', '<<', '>>', '&', '|', '^']:
-            return ArithmeticOpHirLine(hir_line)
-        elif splitted_len == 5 and splitted[3] in ['==', '!=', '<', '<=', '>', '>=', '&&', '||']:
-            return ConditionalOpHirLine(hir_line)
-        elif splitted_len == 4 and splitted[0] == 'IF': 
-            return IfOpHirLine(hir_line)
+            return AssignmentHirLine(splitted[0], parse_operand(splitted[2]))
+        elif splitted_len == 5 and splitted[3] in ARITHMETIC_OPERATORS:
+            return ArithmeticOpHirLine(splitted[0], parse_operand(splitted[2]), splitted[3], parse_operand(splitted[4]))
+        elif splitted_len == 5 and splitted[3] in CONDITIONAL_OPERATORS:
+            return ConditionalOpHirLine(splitted[0], parse_operand(splitted[2]), splitted[3], parse_operand(splitted[4]))
+        elif splitted_len == 4 and splitted[1] == '=' and splitted[2] in UNARY_OPERATORS:
+            return UnaryOpHirLine(splitted[0], splitted[2], parse_operand(splitted[3]))
+        elif splitted_len >= 4 and splitted[1] == '=' and splitted[2] == 'CALL':
+            call = " ".join(splitted[3:])
+            func_name, _, args = call.partition('(')
+            args = args.rstrip(')')
+            parsed_args = [parse_operand(a.strip()) for a in args.split(',') if a.strip()]
+            return CallHirLine(splitted[0], func_name, parsed_args)
+        elif splitted_len == 4 and splitted[0] == 'IF':
+            return IfOpHirLine(splitted[1], splitted[3])
+        elif splitted_len == 2 and splitted[0] == 'GOTO':
+            return GotoHirLine(splitted[1])
         elif splitted_len == 1 and splitted[0].endswith(':'):
-            return LabelHirLine(hir_line)
+            return LabelHirLine(splitted[0][:-1])
         else:
             raise NotImplementedError(f"HIR line parsing for format '{hir_line}' not implemented.")
-        
+
     @staticmethod
     def parse_hir_lines(hir_lines:list[str]) -> list[HirLine]:
         parsed_lines = []
@@ -36,128 +101,204 @@ class HirLine:
             parsed_line = HirLine.parse_hir_line(line)
             parsed_lines.append(parsed_line)
         return parsed_lines
-        
 
 
 class AssignmentHirLine(HirLine):
-    def __init__(self, line:str):
-        super().__init__(line)
-        self.type = HirLineType.ASSIGNMENT
-        self.var_name = self.splitted[0]
-        self.value = self.splitted[2]
-        self.isConstant = self.value.isdigit()
-        if self.isConstant:
-            self.value = int(self.value)
-
-    def set_value(self, new_value):
-        self.value = new_value
-        self.update_line()
-
-    def update_line(self):
-        self.line = f"{self.var_name} = {self.value}"
-    
-class ArithmeticOpHirLine(HirLine):
-    def __init__(self, line:str):
-        super().__init__(line)
-        self.type = HirLineType.ARITHMETIC_OP
-        self.result_var = self.splitted[0]
-        self.left_operand = self.splitted[2]
-        self.operator = self.splitted[3]
-        self.right_operand = self.splitted[4]
-        self.left_isConstant = False
-        self.right_isConstant = False
-        self.set_left_operand(self.left_operand)
-        self.set_right_operand(self.right_operand)
-        if self.left_isConstant:
-            self.left_operand = int(self.left_operand)
-        if self.right_isConstant:
-            self.right_operand = int(self.right_operand)
-        
-    def set_left_operand(self, new_left):
-        self.left_operand = new_left
-        if isinstance(self.left_operand, str):
-            self.left_isConstant = self.left_operand.isdigit()
-            self.left_operand = int(self.left_operand) if self.left_isConstant else self.left_operand
-        elif isinstance(self.left_operand, int):
-            self.left_isConstant = True
-    
-        self.evaluate_if_possible()
-        self.update_line()
-
-    def set_right_operand(self, new_right):
-        self.right_operand = new_right
-        if isinstance(self.right_operand, str):
-            self.right_isConstant = self.right_operand.isdigit()
-            self.right_operand = int(self.right_operand) if self.right_isConstant else self.right_operand
-        elif isinstance(self.right_operand, int):
-            self.right_isConstant = True
-        self.evaluate_if_possible()
-        self.update_line()
-
-    def evaluate_if_possible(self):
+    __slots__ = ('var_name', 'value')
+    type = HirLineType.ASSIGNMENT
+
+    def __init__(self, var_name:str, value:Operand):
+        self.var_name = sys.intern(var_name)
+        self.value = intern_operand(value)
+
+    @property
+    def isConstant(self) -> bool:
+        return isinstance(self.value, int)
+
+    def set_value(self, new_value:Operand):
+        self.value = intern_operand(new_value)
+
+    def render(self) -> str:
+        return f"{self.var_name} = {format_val(self.value)}"
+
+    def defined_var(self) -> str:
+        return self.var_name
+
+    def used_vars(self) -> tuple[str, ...]:
+        return () if isinstance(self.value, int) else (self.value,)
+
+    def rename(self, mapping:dict[str, str]) -> AssignmentHirLine:
+        return AssignmentHirLine(mapping.get(self.var_name, self.var_name), _rename(self.value, mapping))
+
+    def substitute(self, mapping:dict[str, Operand]) -> AssignmentHirLine:
+        return AssignmentHirLine(self.var_name, _rename(self.value, mapping))
+
+
+class BinaryOpHirLine(HirLine):
+    __slots__ = ('result_var', 'left_operand', 'operator', 'right_operand')
+
+    def __init__(self, result_var:str, left_operand:Operand, operator:str, right_operand:Operand):
+        self.result_var = sys.intern(result_var)
+        self.left_operand = intern_operand(left_operand)
+        self.operator = operator
+        self.right_operand = intern_operand(right_operand)
+
+    @property
+    def left_isConstant(self) -> bool:
+        return isinstance(self.left_operand, int)
+
+    @property
+    def right_isConstant(self) -> bool:
+        return isinstance(self.right_operand, int)
+
+    def set_left_operand(self, new_left:Operand):
+        self.left_operand = intern_operand(new_left)
+
+    def set_right_operand(self, new_right:Operand):
+        self.right_operand = intern_operand(new_right)
+
+    def evaluate_if_possible(self) -> AssignmentHirLine | None:
+        """Returns the folded assignment when both operands are constants."""
         if self.left_isConstant and self.right_isConstant:
-            print("evaluating", self.left_operand, self.operator, self.right_operand)
-            evaluated = _op_eval[self.operator](self.left_operand, self.right_operand)
-            print("evaluated to", evaluated)
-            new_self = AssignmentHirLine(f"{self.result_var} = {evaluated}")
-            self.__class__ = AssignmentHirLine
-            self.__dict__ = new_self.__dict__
-            new_self.set_value(evaluated)
-            
-            
-    def update_line(self):
-        self.line = f"{self.result_var} = {self.left_operand} {self.operator} {self.right_operand}"
-
-
-class ConditionalOpHirLine(HirLine):
-    def __init__(self, line:str):
-        super().__init__(line)
-        self.type = HirLineType.CONDITIONAL_OP
-        self.result_var = self.splitted[0]
-        self.left_operand = self.splitted[2]
-        self.operator = self.splitted[3]
-        self.right_operand = self.splitted[4]
-        self.left_isConstant = self.left_operand.isdigit()
-        self.right_isConstant = self.right_operand.isdigit()
-        if self.left_isConstant:
-            self.left_operand = int(self.left_operand)
-        if self.right_isConstant:
-            self.right_operand = int(self.right_operand)
-
-    def set_left_operand(self, new_left):
-        self.left_operand = new_left
-        self.update_line()
-        
-    def set_right_operand(self, new_right):
-        self.right_operand = new_right
-        self.update_line()
-
-    def update_line(self):
-        self.line = f"{self.result_var} = {self.left_operand} {self.operator} {self.right_operand}"
+            evaluated = evaluate_binary(self.operator, self.left_operand, self.right_operand)
+            if _fold_trace.debug:
+                _fold_trace.emit(TraceLevel.DEBUG, 'fold', line=self.render(), value=evaluated)
+            return AssignmentHirLine(self.result_var, evaluated)
+        return None
+
+    def render(self) -> str:
+        return f"{self.result_var} = {format_val(self.left_operand)} {self.operator} {format_val(self.right_operand)}"
+
+    def defined_var(self) -> str:
+        return self.result_var
+
+    def used_vars(self) -> tuple[str, ...]:
+        left, right = self.left_operand, self.right_operand
+        if isinstance(left, int):
+            return () if isinstance(right, int) else (right,)
+        return (left,) if isinstance(right, int) else (left, right)
+
+    def rename(self, mapping:dict[str, str]) -> BinaryOpHirLine:
+        return type(self)(mapping.get(self.result_var, self.result_var), _rename(self.left_operand, mapping), self.operator, _rename(self.right_operand, mapping))
+
+    def substitute(self, mapping:dict[str, Operand]) -> BinaryOpHirLine:
+        return type(self)(self.result_var, _rename(self.left_operand, mapping), self.operator, _rename(self.right_operand, mapping))
+
+class ArithmeticOpHirLine(BinaryOpHirLine):
+    __slots__ = ()
+    type = HirLineType.ARITHMETIC_OP
+
+class ConditionalOpHirLine(BinaryOpHirLine):
+    __slots__ = ()
+    type = HirLineType.CONDITIONAL_OP
+
+
+class UnaryOpHirLine(HirLine):
+    __slots__ = ('result_var', 'operator', 'operand')
+    type = HirLineType.UNARY_OP
+
+    def __init__(self, result_var:str, operator:str, operand:Operand):
+        self.result_var = sys.intern(result_var)
+        self.operator = operator
+        self.operand = intern_operand(operand)
+
+    def set_operand(self, new_operand:Operand):
+        self.operand = intern_operand(new_operand)
+
+    def render(self) -> str:
+        return f"{self.result_var} = {self.operator} {format_val(self.operand)}"
+
+    def defined_var(self) -> str:
+        return self.result_var
+
+    def used_vars(self) -> tuple[str, ...]:
+        return () if isinstance(self.operand, int) else (self.operand,)
+
+    def rename(self, mapping:dict[str, str]) -> UnaryOpHirLine:
+        return UnaryOpHirLine(mapping.get(self.result_var, self.result_var), self.operator, _rename(self.operand, mapping))
+
+    def substitute(self, mapping:dict[str, Operand]) -> UnaryOpHirLine:
+        return UnaryOpHirLine(self.result_var, self.operator, _rename(self.operand, mapping))
+
+
+class CallHirLine(HirLine):
+    __slots__ = ('result_var', 'func_name', 'args')
+    type = HirLineType.CALL
+
+    def __init__(self, result_var:str, func_name:str, args:list[Operand]):
+        self.result_var = sys.intern(result_var)
+        self.func_name = sys.intern(func_name)
+        self.args = tuple(intern_operand(a) for a in args)
+
+    def set_arg(self, index:int, new_arg:Operand):
+        args = list(self.args)
+        args[index] = intern_operand(new_arg)
+        self.args = tuple(args)
+
+    def render(self) -> str:
+        args_repr = ", ".join(format_val(a) for a in self.args)
+        return f"{self.result_var} = CALL {self.func_name}({args_repr})"
+
+    def defined_var(self) -> str:
+        return self.result_var
+
+    def used_vars(self) -> tuple[str, ...]:
+        return tuple(a for a in self.args if isinstance(a, str))
+
+    def rename(self, mapping:dict[str, str]) -> CallHirLine:
+        return CallHirLine(mapping.get(self.result_var, self.result_var), self.func_name, [_rename(a, mapping) for a in self.args])
+
+    def substitute(self, mapping:dict[str, Operand]) -> CallHirLine:
+        return CallHirLine(self.result_var, self.func_name, [_rename(a, mapping) for a in self.args])
+
 
 class IfOpHirLine(HirLine):
-    def __init__(self, line:str):
-        super().__init__(line)
-        self.type = HirLineType.IF_OP
-        self.cond_var = self.splitted[1]
-        self.target_label = self.splitted[3]
-    
-    def set_cond_var(self, new_cond_var):
-        self.cond_var = new_cond_var
-        self.update_line()
-
-    def update_line(self):
-        self.line = f"IF {self.cond_var} GOTO {self.target_label}"
+    __slots__ = ('cond_var', 'target_label')
+    type = HirLineType.IF_OP
+
+    def __init__(self, cond_var:Operand, target_label:str):
+        self.cond_var = intern_operand(cond_var)
+        self.target_label = sys.intern(target_label)
+
+    def set_cond_var(self, new_cond_var:Operand):
+        self.cond_var = intern_operand(new_cond_var)
+
+    def render(self) -> str:
+        return f"IF {format_val(self.cond_var)} GOTO {self.target_label}"
+
+    def used_vars(self) -> tuple[str, ...]:
+        return () if isinstance(self.cond_var, int) else (self.cond_var,)
+
+    def rename(self, mapping:dict[str, str]) -> IfOpHirLine:
+        return IfOpHirLine(_rename(self.cond_var, mapping), mapping.get(self.target_label, self.target_label))
+
+    def substitute(self, mapping:dict[str, Operand]) -> IfOpHirLine:
+        return IfOpHirLine(_rename(self.cond_var, mapping), self.target_label)
+
+
+class GotoHirLine(HirLine):
+    __slots__ = ('target_label',)
+    type = HirLineType.GOTO
+
+    def __init__(self, target_label:str):
+        self.target_label = sys.intern(target_label)
+
+    def render(self) -> str:
+        return f"GOTO {self.target_label}"
+
+    def rename(self, mapping:dict[str, str]) -> GotoHirLine:
+        return GotoHirLine(mapping.get(self.target_label, self.target_label))
+
 
 class LabelHirLine(HirLine):
-    def __init__(self, line:str):
-        super().__init__(line)
-        self.type = HirLineType.LABEL
-        self.label_name = self.splitted[0][:-1] 
+    __slots__ = ('label_name',)
+    type = HirLineType.LABEL
 
-class HirLineType:
-    ASSIGNMENT = "ASSIGNMENT"
-    ARITHMETIC_OP = "ARITHMETIC_OP"
-    CONDITIONAL_OP = "CONDITIONAL_OP"
-    IF_OP = "IF_OP"
-    LABEL = "LABEL"
+    def __init__(self, label_name:str):
+        self.label_name = sys.intern(label_name)
+
+    def render(self) -> str:
+        return f"{self.label_name}:"
+
+    def rename(self, mapping:dict[str, str]) -> LabelHirLine:
+        return LabelHirLine(mapping.get(self.label_name, self.label_name))
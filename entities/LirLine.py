@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from helpers.ArchitectureHelper import SOURCE_REGISTERS_STR
+from helpers.ArchitectureHelper import SOURCE_REGISTERS_STR, DESTINATION_REGISTERS_STR
 
 
 class LirLine:
@@ -11,20 +11,40 @@ class LirLine:
         self.type = None
 
     def __str__(self):
-        return self.line    
-    
+        return self.line
+
     @staticmethod
     def parse_lir_line(lir_line:str) -> LirLine:
+        splitted = lir_line.split()
+        if not splitted:
+            raise ValueError("Empty LIR line.")
+        opcode = splitted[0]
+        if opcode == LirLineType.LDI:
+            return LoadImmLirLine(lir_line)
+        elif opcode == LirLineType.MOV:
+            return MovLirLine(lir_line)
+        elif opcode in ALU_OPCODES:
+            return AluLirLine(lir_line)
+        elif opcode == LirLineType.CMP:
+            return CmpLirLine(lir_line)
+        elif opcode in JUMP_OPCODES:
+            return JumpLirLine(lir_line)
+        elif len(splitted) == 1 and opcode.endswith(':'):
+            return LabelLirLine(lir_line)
         return LirLine(lir_line)
 
-class LoadImmLirLine(LirLine): 
+    @staticmethod
+    def parse_lir_lines(lir_lines:list[str]) -> list[LirLine]:
+        return [LirLine.parse_lir_line(line) for line in lir_lines]
+
+class LoadImmLirLine(LirLine):
     def __init__(self, line:str):
         super().__init__(line)
         if self.splitted[0] != LirLineType.LDI:
             raise ValueError(f"Invalid LIR line for LoadImmLirLine: {line}")
         self.type = LirLineType.LDI
         self.value:int = int(self.splitted[1])
-    
+
     @staticmethod
     def create_line(value:int) -> LoadImmLirLine:
         return LoadImmLirLine(f"LDI {value}")
@@ -35,13 +55,63 @@ class MovLirLine(LirLine):
         if self.splitted[0] != LirLineType.MOV:
             raise ValueError(f"Invalid LIR line for MovLirLine: {line}")
         self.type = LirLineType.MOV
-        self.source = self.splitted[1]
-        self.destination = self.splitted[2]
-    
+        self.destination = self.splitted[1]
+        self.source = self.splitted[2]
+
     @staticmethod
     def create_line(destination:MovDestination, source:MovSource) -> MovLirLine:
+        if destination.is_memory and source.is_memory:
+            raise ValueError(f"MOV cannot copy memory to memory: {destination} <- {source}")
         return MovLirLine(f"MOV {destination} {source}")
-    
+
+class AluLirLine(LirLine):
+    # ACC <- RD <op> source
+    def __init__(self, line:str):
+        super().__init__(line)
+        if self.splitted[0] not in ALU_OPCODES:
+            raise ValueError(f"Invalid LIR line for AluLirLine: {line}")
+        self.type = self.splitted[0]
+        self.source = self.splitted[1]
+
+    @staticmethod
+    def create_line(opcode:str, source:str) -> AluLirLine:
+        return AluLirLine(f"{opcode} {source}")
+
+class CmpLirLine(LirLine):
+    # flags <- RD compared with source
+    def __init__(self, line:str):
+        super().__init__(line)
+        if self.splitted[0] != LirLineType.CMP:
+            raise ValueError(f"Invalid LIR line for CmpLirLine: {line}")
+        self.type = LirLineType.CMP
+        self.source = self.splitted[1]
+
+    @staticmethod
+    def create_line(source:str) -> CmpLirLine:
+        return CmpLirLine(f"CMP {source}")
+
+class JumpLirLine(LirLine):
+    def __init__(self, line:str):
+        super().__init__(line)
+        if self.splitted[0] not in JUMP_OPCODES:
+            raise ValueError(f"Invalid LIR line for JumpLirLine: {line}")
+        self.type = self.splitted[0]
+        self.target_label = self.splitted[1]
+
+    @staticmethod
+    def create_line(opcode:str, target_label:str) -> JumpLirLine:
+        return JumpLirLine(f"{opcode} {target_label}")
+
+class LabelLirLine(LirLine):
+    def __init__(self, line:str):
+        super().__init__(line)
+        self.type = LirLineType.LABEL
+        self.label_name = self.splitted[0][:-1]
+
+    @staticmethod
+    def create_line(label_name:str) -> LabelLirLine:
+        return LabelLirLine(f"{label_name}:")
+
 
 class MovDestinationType:
     VARIABLE = 'VARIABLE'
@@ -49,19 +119,23 @@ class MovDestinationType:
 
 class MovSourceType:
     REGISTER = 'REGISTER'
+    VARIABLE = 'VARIABLE'
 
 class MovDestination:
     def __init__(self, type:MovDestinationType, value:str):
         if type is MovDestinationType.VARIABLE:
             self.value_str = f'var:{value}'
         elif type is MovDestinationType.REGISTER:
+            if value not in DESTINATION_REGISTERS_STR:
+                raise ValueError(f"Invalid destination register: {value}")
             self.value_str = value
         else:
             raise ValueError(f"Invalid MovDestinationType: {type}")
-        
+        self.is_memory = type is MovDestinationType.VARIABLE
+
     def __str__(self):
         return self.value_str
-    
+
 
 class MovSource:
     def __init__(self, type:MovSourceType, value:str):
@@ -69,14 +143,58 @@ class MovSource:
             if value not in SOURCE_REGISTERS_STR:
                 raise ValueError(f"Invalid source register: {value}")
             self.value_str = value
+        elif type is MovSourceType.VARIABLE:
+            self.value_str = f'var:{value}'
         else:
             raise ValueError(f"Invalid MovSourceType: {type}")
-    
+        self.is_memory = type is MovSourceType.VARIABLE
+
     def __str__(self):
         return self.value_str
-    
+
 
 class LirLineType:
     LDI = 'LDI'
     MOV = 'MOV'
+    ADD = 'ADD'
+    SUB = 'SUB'
+    AND = 'AND'
+    OR = 'OR'
+    XOR = 'XOR'
+    CMP = 'CMP'
+    JMP = 'JMP'
+    JEQ = 'JEQ'
+    JNE = 'JNE'
+    JLT = 'JLT'
+    JGT = 'JGT'
+    JLE = 'JLE'
+    JGE = 'JGE'
+    LABEL = 'LABEL'
+
+ALU_OPCODES = {
+    LirLineType.ADD, LirLineType.SUB, LirLineType.AND, LirLineType.OR, LirLineType.XOR,
+}
+
+JUMP_OPCODES = {
+    LirLineType.JMP, LirLineType.JEQ, LirLineType.JNE, LirLineType.JLT,
+    LirLineType.JGT, LirLineType.JLE, LirLineType.JGE,
+}
+
+# HIR operator -> ALU opcode
+ALU_OPERATOR_OPCODES = {
+    '+': LirLineType.ADD,
+    '-': LirLineType.SUB,
+    '&': LirLineType.AND,
+    '|': LirLineType.OR,
+    '^': LirLineType.XOR,
+}
 
+# HIR comparison -> jump taken when the comparison holds
+CONDITION_JUMP_OPCODES = {
+    '==': LirLineType.JEQ,
+    '!=': LirLineType.JNE,
+    '<': LirLineType.JLT,
+    '>': LirLineType.JGT,
+    '<=': LirLineType.JLE,
+    '>=': LirLineType.JGE,
+}
@@ -27,6 +27,8 @@ class Symbol:
         self.type:SymbolType = type
         self.scope:SymbolScope = scope
         self.qualifier:SymbolQualifier|None = qualifier
+        # Set when the symbol is added to a table.
+        self.id:int = -1
     
     def as_dict(self):
         dic = {
@@ -40,21 +42,105 @@ class Symbol:
         return dic
 
 class SymbolTable:
-    def __init__(self):
+    """Symbols of one scope, chained to the enclosing scope by `parent`.
+
+    The root holds the globals and functions, and each function gets a
+    child scope for its locals. Lookups walk the chain outwards, so a
+    function's scope sees its own locals before the globals. Locals of
+    different functions live in different scopes and cannot overwrite
+    each other.
+
+    Every symbol gets a small integer `id`. A scope's ids continue from
+    its parent's, so the symbols visible from a scope are numbered
+    0..next_id-1 without gaps and analyses can use the ids as bit
+    positions; sibling scopes reuse the same numbers. For that, a scope
+    takes no new names once it has nested scopes.
+    """
+    def __init__(self, name:str = 'global', parent:SymbolTable|None = None):
+        self.name = name
+        self.parent = parent
         self.table: dict[str, Symbol] = {}
-    
+        self.scopes: dict[str, SymbolTable] = {}
+        self._symbols: list[Symbol] = []
+        self._base = parent.next_id if parent is not None else 0
+
+    @property
+    def root(self) -> SymbolTable:
+        scope = self
+        while scope.parent is not None:
+            scope = scope.parent
+        return scope
+
+    @property
+    def next_id(self) -> int:
+        return self._base + len(self._symbols)
+
+    def enter_scope(self, name:str) -> SymbolTable:
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = SymbolTable(name, self)
+        return scope
+
+    def scope(self, name:str) -> SymbolTable:
+        # A function without locals of its own may have no scope; it sees
+        # the enclosing one.
+        return self.scopes.get(name, self)
+
     def add(self, name:str, type:SymbolType, scope:SymbolScope, qualifier:SymbolQualifier|None = None):
-        symbol = Symbol(name, type, scope, qualifier)
-        self.table[name] = symbol
+        self.add_symbol(Symbol(name, SymbolKind.VARIABLE, type, scope, qualifier))
 
     def add_symbol(self, symbol:Symbol):
+        previous = self.table.get(symbol.name)
+        if previous is not None:
+            # A redeclaration in the same scope replaces the symbol but keeps its ID.
+            symbol.id = previous.id
+            self._symbols[symbol.id - self._base] = symbol
+        elif self.scopes:
+            raise ValueError(f"Cannot add '{symbol.name}' to scope '{self.name}' after nested scopes were created.")
+        else:
+            symbol.id = self.next_id
+            self._symbols.append(symbol)
         self.table[symbol.name] = symbol
 
     def get(self, name:str) -> Symbol | None:
-        return self.table.get(name, None)
+        scope = self
+        while scope is not None:
+            symbol = scope.table.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
+        return None
     
     def is_exists(self, name:str) -> bool:
-        return name in self.table
+        return self.get(name) is not None
+
+    def id_of(self, name:str) -> int | None:
+        symbol = self.get(name)
+        return symbol.id if symbol is not None else None
+
+    def by_id(self, symbol_id:int) -> Symbol:
+        scope = self
+        while symbol_id < scope._base:
+            scope = scope.parent
+        return scope._symbols[symbol_id - scope._base]
+
+    def names_by_id(self) -> list[str]:
+        """Names of the symbols visible from this scope, indexed by id."""
+        names = self.parent.names_by_id() if self.parent is not None else []
+        names.extend(symbol.name for symbol in self._symbols)
+        return names
+
+    def items(self) -> list[tuple[str, Symbol]]:
+        """Every symbol visible from this scope, innermost first; a name
+        shadowed by an inner scope is listed once.
+        """
+        visible: dict[str, Symbol] = {}
+        scope = self
+        while scope is not None:
+            for name, symbol in scope.table.items():
+                visible.setdefault(name, symbol)
+            scope = scope.parent
+        return list(visible.items())
     
     def as_dict(self):
-        return {name: symbol.as_dict() for name, symbol in self.table.items()}
+        return {name: symbol.as_dict() for name, symbol in self.items()}
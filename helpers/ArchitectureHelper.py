@@ -9,4 +9,42 @@ SOURCE_REGISTERS_STR = [
 
 GENERAL_PURPOSE_REGISTERS_STR = [
     "RA", "RB", "RD"
-]
\ No newline at end of file
+]
+
+DESTINATION_REGISTERS_STR = [
+    "RA", "RB", "RD", "PRL", "PRH", "MARL", "MARH"
+]
+
+# Registers the LIR lowering overwrites on its own: LDI always targets RA
+# and the ALU reads its left operand from RD.
+IMMEDIATE_REGISTER_STR = "RA"
+ALU_LEFT_REGISTER_STR = "RD"
+ALU_RESULT_REGISTER_STR = "ACC"
+
+# Instruction classes used for cost accounting: register moves, memory
+# loads/stores (MOV with a memory operand, address in MARL/MARH), ALU ops,
+# compares, unconditional and conditional jumps (target in PRL/PRH).
+INSTRUCTION_CYCLES = {
+    "LDI": 1,
+    "MOV": 1,
+    "LOAD": 2,
+    "STORE": 2,
+    "ALU": 1,
+    "CMP": 1,
+    "JMP": 2,
+    "JCC": 2,
+}
+JCC_NOT_TAKEN_CYCLES = 1
+
+INSTRUCTION_BYTES = {
+    "LDI": 2,
+    "MOV": 1,
+    "LOAD": 3,
+    "STORE": 3,
+    "ALU": 1,
+    "CMP": 1,
+    "JMP": 3,
+    "JCC": 3,
+}
+
+DATA_MEMORY_SIZE = 0x10000
@@ -1,3 +1,12 @@
+import os
+
+from modules.Config import CACHE_DIR_ENV_VAR
+
 def read_file(filename):
     with open(filename, 'r') as f:
-        return f.read()
\ No newline at end of file
+        return f.read()
+
+def get_cache_dir(kind:str) -> str | None:
+    # Disk caches are opt-in; see CACHE_DIR_ENV_VAR.
+    root = os.environ.get(CACHE_DIR_ENV_VAR)
+    return os.path.join(root, kind) if root else None
@@ -1,12 +1,6 @@
 from typing import Union
 
-_temp_counter = 0
-
-def new_temp() -> str:
-    global _temp_counter
-    name = f".t{_temp_counter}"
-    _temp_counter += 1
-    return name
+from modules.Config import REGISTER_MAX_VALUE
 
 _op_eval = {
     '+': lambda a,b: a + b,
@@ -29,6 +23,25 @@ _op_eval = {
     '>=': lambda a,b: 1 if a >= b else 0,
 }
 
+_unary_eval = {
+    'neg': lambda a: -a,
+    'bitnot': lambda a: ~a,
+    'not': lambda a: 0 if a else 1,
+}
+
+def evaluate_binary(op: str, left: int, right: int) -> int:
+    # Constants are folded as the 8-bit registers compute them: operands
+    # and results wrap, and comparisons are unsigned like CMP.
+    return _op_eval[op](left & REGISTER_MAX_VALUE, right & REGISTER_MAX_VALUE) & REGISTER_MAX_VALUE
+
+def evaluate_unary(op: str, operand: int) -> int:
+    return _unary_eval[op](operand & REGISTER_MAX_VALUE) & REGISTER_MAX_VALUE
+
+ARITHMETIC_OPERATORS = frozenset(['+', '-', '*', '/', '%', '<<', '>>', '&', '|', '^'])
+CONDITIONAL_OPERATORS = frozenset(['==', '!=', '<', '<=', '>', '>=', '&&', '||'])
+COMPARISON_OPERATORS = frozenset(['==', '!=', '<', '<=', '>', '>='])
+UNARY_OPERATORS = frozenset(['neg', 'bitnot', 'not'])
+
 def invert_condition(op: str) -> str:
     mapping = {
         '>': '<=',
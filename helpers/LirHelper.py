@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from entities.HirLine import *
+from entities.LirLine import *
+from helpers.ArchitectureHelper import IMMEDIATE_REGISTER_STR, ALU_LEFT_REGISTER_STR, ALU_RESULT_REGISTER_STR
+
+# Pseudo register for the comparison state CMP leaves for conditional jumps.
+FLAGS_STR = "FLAGS"
+
+COMMUTATIVE_OPERATORS = frozenset(['+', '&', '|', '^', '==', '!='])
+
+# a <op> b == b <swapped op> a
+SWAPPED_COMPARISONS = {
+    '==': '==',
+    '!=': '!=',
+    '<': '>',
+    '>': '<',
+    '<=': '>=',
+    '>=': '<=',
+}
+
+def normalize_operands(left:Operand, operator:str, right:Operand) -> tuple[Operand, str, Operand]:
+    # Keep constants on the right so they go through LDI straight into the
+    # ALU source instead of being staged into RD first.
+    if isinstance(left, int) and not isinstance(right, int):
+        if operator in COMMUTATIVE_OPERATORS:
+            return right, operator, left
+        if operator in SWAPPED_COMPARISONS:
+            return right, SWAPPED_COMPARISONS[operator], left
+    return left, operator, right
+
+def find_fused_conditions(hir_lines:list[HirLine]) -> set[int]:
+    """ids of ConditionalOpHirLines that lower straight into a CMP + jump."""
+    uses: dict[str, int] = {}
+    for hir in hir_lines:
+        for var in hir.used_vars():
+            uses[var] = uses.get(var, 0) + 1
+    fused = set()
+    for hir, next_hir in zip(hir_lines, hir_lines[1:]):
+        if isinstance(hir, ConditionalOpHirLine) and isinstance(next_hir, IfOpHirLine):
+            if next_hir.cond_var == hir.result_var and uses.get(hir.result_var) == 1 and hir.operator in SWAPPED_COMPARISONS:
+                fused.add(id(hir))
+    return fused
+
+def get_clobbered_registers(hir:HirLine, is_memory:Callable[[Operand], bool], fused:bool = False) -> tuple[set[str], tuple[str, ...]]:
+    """Scratch registers the lowering of `hir` writes, and the operands it
+    still reads after those writes. `is_memory` tells whether a variable
+    operand lives in memory rather than in a register; `fused` marks a
+    condition that lowers into the jump of the following IF.
+    """
+    ra, rd = IMMEDIATE_REGISTER_STR, ALU_LEFT_REGISTER_STR
+    if isinstance(hir, AssignmentHirLine):
+        if hir.isConstant:
+            return {ra}, ()
+        if is_memory(hir.var_name) and is_memory(hir.value):
+            return {ra}, ()
+        return set(), ()
+    if isinstance(hir, BinaryOpHirLine):
+        left, _, right = normalize_operands(hir.left_operand, hir.operator, hir.right_operand)
+        clobbers = {rd}
+        if isinstance(left, int) or isinstance(right, int) or is_memory(right):
+            clobbers.add(ra)
+        late_uses = (right,) if isinstance(right, str) and right != left else ()
+        if isinstance(hir, ConditionalOpHirLine) and not fused:
+            # The 0/1 result is materialised through LDI.
+            clobbers.add(ra)
+        return clobbers, late_uses
+    if isinstance(hir, UnaryOpHirLine):
+        if hir.operator == 'not':
+            return {ra, rd}, ()
+        return {ra, rd}, hir.used_vars()
+    if isinstance(hir, IfOpHirLine):
+        if isinstance(hir.cond_var, int):
+            return set(), ()
+        return {ra, rd}, ()
+    if isinstance(hir, (LabelHirLine, GotoHirLine)):
+        return set(), ()
+    return {ra, rd}, hir.used_vars()
+
+
+def is_memory_operand(operand:str) -> bool:
+    return operand.startswith('var:') or operand.startswith('[')
+
+def get_lir_reads(lir:LirLine) -> tuple[str, ...]:
+    """Registers (and `var:` memory operands) the instruction reads."""
+    if isinstance(lir, MovLirLine):
+        return (lir.source,)
+    if isinstance(lir, (AluLirLine, CmpLirLine)):
+        return (ALU_LEFT_REGISTER_STR, lir.source)
+    if isinstance(lir, JumpLirLine) and lir.type != LirLineType.JMP:
+        return (FLAGS_STR,)
+    return ()
+
+def get_lir_writes(lir:LirLine) -> tuple[str, ...]:
+    if isinstance(lir, LoadImmLirLine):
+        return (IMMEDIATE_REGISTER_STR,)
+    if isinstance(lir, MovLirLine):
+        return (lir.destination,)
+    if isinstance(lir, AluLirLine):
+        return (ALU_RESULT_REGISTER_STR,)
+    if isinstance(lir, CmpLirLine):
+        return (FLAGS_STR,)
+    return ()
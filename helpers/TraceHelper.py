@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from collections import deque
+from enum import IntEnum
+
+from modules.Config import TRACE_ENV_VAR
+
+class TraceLevel(IntEnum):
+    OFF = 0
+    WARNING = 1
+    INFO = 2
+    DEBUG = 3
+
+
+class TraceCategory:
+    HIR_FOLD = 'hir.fold'
+    OPTIMIZER = 'optimizer'
+    SYMBOLS = 'symbols'
+
+
+class TraceEvent:
+    __slots__ = ('timestamp', 'category', 'level', 'name', 'fields')
+
+    def __init__(self, category:str, level:TraceLevel, name:str, fields:dict):
+        self.timestamp = time.perf_counter()
+        self.category = category
+        self.level = level
+        self.name = name
+        self.fields = fields
+
+    def as_dict(self):
+        return {
+            'ts': self.timestamp,
+            'category': self.category,
+            'level': self.level.name.lower(),
+            'name': self.name,
+            'fields': self.fields,
+        }
+
+
+class MemorySink:
+    def __init__(self):
+        self.events: list[TraceEvent] = []
+
+    def write(self, event:TraceEvent):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+class RingBufferSink:
+    """Keeps the last `capacity` events, e.g. to dump after a failed compile."""
+    def __init__(self, capacity:int = 4096):
+        self.events: deque[TraceEvent] = deque(maxlen=capacity)
+
+    def write(self, event:TraceEvent):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    def __init__(self, filename:str):
+        self.file = open(filename, 'a')
+
+    def write(self, event:TraceEvent):
+        self.file.write(json.dumps(event.as_dict(), default=str))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class Tracer:
+    """Per-category handle. The level flags are plain attributes fixed by
+    configure(), so hot paths guard with `if tracer.debug:` and build no
+    event data when the category is off.
+    """
+    __slots__ = ('category', 'level', 'warning', 'info', 'debug')
+
+    def __init__(self, category:str):
+        self.category = category
+        self.set_level(TraceLevel.OFF)
+
+    def set_level(self, level:TraceLevel):
+        self.level = level
+        self.warning = level >= TraceLevel.WARNING
+        self.info = level >= TraceLevel.INFO
+        self.debug = level >= TraceLevel.DEBUG
+
+    def emit(self, level:TraceLevel, name:str, /, **fields):
+        if level > self.level:
+            return
+        event = TraceEvent(self.category, level, name, fields)
+        for sink in _sinks:
+            sink.write(event)
+
+
+_tracers: dict[str, Tracer] = {}
+_levels: dict[str, TraceLevel] = {}
+_default_level = TraceLevel.OFF
+_sinks: list = []
+
+def get_tracer(category:str) -> Tracer:
+    tracer = _tracers.get(category)
+    if tracer is None:
+        tracer = Tracer(category)
+        tracer.set_level(_levels.get(category, _default_level))
+        _tracers[category] = tracer
+    return tracer
+
+def parse_trace_spec(spec:str) -> tuple[TraceLevel, dict[str, TraceLevel]]:
+    # "optimizer=debug,symbols" -> per-category levels; a bare level such as
+    # "info" sets the default for every category.
+    default = TraceLevel.OFF
+    levels: dict[str, TraceLevel] = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        category, _, level = item.partition('=')
+        if not level:
+            if category.upper() in TraceLevel.__members__:
+                default = TraceLevel[category.upper()]
+                continue
+            level = 'debug'
+        if level.upper() not in TraceLevel.__members__:
+            raise ValueError(f"Unknown trace level '{level}' for category '{category}'.")
+        levels[category] = TraceLevel[level.upper()]
+    return default, levels
+
+def configure(spec:str = '', sinks:list|None = None):
+    """Sets category levels and sinks. Meant to be called once at startup;
+    without a call, the spec is read from the ARNICOMP_TRACE environment
+    variable and events go to stderr as JSON lines.
+    """
+    global _default_level
+    _default_level, levels = parse_trace_spec(spec)
+    _levels.clear()
+    _levels.update(levels)
+    for sink in _sinks:
+        sink.close()
+    _sinks.clear()
+    _sinks.extend(sinks if sinks is not None else [])
+    for category, tracer in _tracers.items():
+        tracer.set_level(_levels.get(category, _default_level))
+
+
+class _StderrSink:
+    def write(self, event:TraceEvent):
+        sys.stderr.write(json.dumps(event.as_dict(), default=str) + '\n')
+
+    def close(self):
+        pass
+
+
+_env_spec = os.environ.get(TRACE_ENV_VAR, '')
+if _env_spec:
+    configure(_env_spec, [_StderrSink()])
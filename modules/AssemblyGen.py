@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from entities.LirLine import *
+from entities.SymbolTable import SymbolTable
+from modules.LIROptimizer import optimize_lir
+
+def format_operand(operand:str, addresses:dict[str, int]) -> str:
+    # var:x -> [0x0012]; the simulator and hardware take the address into
+    # MARL/MARH when the instruction executes.
+    if operand.startswith('var:'):
+        name = operand[4:]
+        if name not in addresses:
+            raise ValueError(f"No address for variable '{name}'.")
+        return f"[{addresses[name]:#06x}]"
+    return operand
+
+def assemble_line(lir:LirLine, addresses:dict[str, int]) -> str:
+    if isinstance(lir, LabelLirLine):
+        return f"{lir.label_name}:"
+    operands = ' '.join(format_operand(operand, addresses) for operand in lir.splitted[1:])
+    return f"    {lir.splitted[0]} {operands}".rstrip()
+
+def generate_assembly(lir_lines:list[LirLine], addresses:dict[str, int], symbol_table:SymbolTable|None = None, optimize:bool = True) -> list[str]:
+    if optimize:
+        lir_lines = optimize_lir(lir_lines, symbol_table)
+    return [assemble_line(lir, addresses) for lir in lir_lines]
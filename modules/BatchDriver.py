@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from helpers.FileHelper import read_file, get_cache_dir
+from modules.AssemblyGen import generate_assembly
+from modules.CompilationCache import FunctionCache, IncrementalCompiler
+from modules.CompilationContext import CompilationContext
+from modules.FrontEnd import FrontEndService, AstCache
+from modules.MemoryOverlay import plan_overlay
+from modules.SymbolTableGen import generate_symbol_table
+
+_front_end: FrontEndService | None = None
+_function_cache: FunctionCache | None = None
+
+def get_front_end() -> FrontEndService:
+    # One per worker process so the in-memory AST cache survives between files.
+    global _front_end
+    if _front_end is None:
+        _front_end = FrontEndService(AstCache(get_cache_dir('ast')))
+    return _front_end
+
+def get_function_cache() -> FunctionCache:
+    global _function_cache
+    if _function_cache is None:
+        _function_cache = FunctionCache(get_cache_dir('functions'))
+    return _function_cache
+
+
+class FunctionResult:
+    def __init__(self, name:str):
+        self.name = name
+        self.hir: list[str] = []
+        self.lir: list[str] = []
+        self.assembly: list[str] = []
+        self.allocation: dict = {}
+        # Stages this compile ran instead of taking from the cache.
+        self.recompiled: list[str] = []
+
+    def as_dict(self):
+        return {
+            'hir': self.hir,
+            'lir': self.lir,
+            'assembly': self.assembly,
+            'allocation': self.allocation,
+            'recompiled': self.recompiled,
+        }
+
+
+class CompilationResult:
+    """`functions` holds every function of the unit; `hir`, `lir`,
+    `assembly` and `allocation` are main's, which also runs the global
+    initializers.
+    """
+    def __init__(self, filename:str):
+        self.filename = filename
+        self.hir: list[str] = []
+        self.lir: list[str] = []
+        self.assembly: list[str] = []
+        self.allocation: dict = {}
+        self.functions: dict[str, FunctionResult] = {}
+        self.variables: dict[str, int] = {}
+        self.log = ''
+        self.error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_dict(self):
+        return {
+            'filename': self.filename,
+            'hir': self.hir,
+            'lir': self.lir,
+            'assembly': self.assembly,
+            'allocation': self.allocation,
+            'functions': {name: function.as_dict() for name, function in self.functions.items()},
+            'variables': self.variables,
+            'error': self.error,
+        }
+
+
+def compile_source(code:str, filename:str = '', context:CompilationContext|None = None, assemble:bool = False, cache:FunctionCache|None = None) -> CompilationResult:
+    """Compiles every function of `code` to LIR and, with `assemble`, to
+    peephole-optimized assembly.
+
+    Functions go through an IncrementalCompiler, so a function whose code
+    and symbols did not change since an earlier call is not compiled
+    again. `cache` defaults to one per process. Addresses and assembly are
+    always redone, since they depend on every function of the unit.
+
+    `context` supplies the temp and label counters for the functions that
+    are regenerated and receives the unit's symbol table and variables.
+
+    Calls are not lowered to LIR yet, so a function that makes one fails
+    with NotImplementedError instead of being left out.
+    """
+    result = CompilationResult(filename)
+    ast = get_front_end().parse(code, filename)
+    symbol_table = generate_symbol_table(ast)
+    context = context if context is not None else CompilationContext(symbol_table)
+    context.symbol_table = symbol_table
+    vm = context.variable_manager
+
+    compiled = IncrementalCompiler(symbol_table, cache if cache is not None else get_function_cache(), context=context).compile(ast)
+    if 'main' not in compiled:
+        raise ValueError("No main function found.")
+    # main first: it runs the global initializers.
+    compiled = {'main': compiled.pop('main'), **compiled}
+
+    # Locals of functions other than main only get a home in the overlay.
+    callees = {name: function.optimized_hir_lines for name, function in compiled.items() if name != 'main'}
+    overlay = None
+    if callees:
+        overlay = plan_overlay(ast, callees, {name: compiled[name].allocation.spilled for name in callees})
+    vm.load_symbol_table(symbol_table, overlay)
+    if overlay is not None:
+        vm.load_overlay(overlay)
+    vm.load_spilled_variables(compiled['main'].allocation.spilled)
+    result.variables = {name: var.address.address for name, var in vm.variables.items()}
+
+    for name, function in compiled.items():
+        function_result = result.functions[name] = FunctionResult(name)
+        function_result.hir = [str(line) for line in function.optimized_hir_lines]
+        function_result.lir = [str(line) for line in function.lir_lines]
+        function_result.allocation = function.allocation.as_dict()
+        function_result.recompiled = sorted(function.recompiled)
+        if assemble:
+            function_result.assembly = generate_assembly(function.lir_lines, vm.addresses_for(name), symbol_table.scope(name))
+    main = result.functions['main']
+    result.hir, result.lir, result.assembly, result.allocation = main.hir, main.lir, main.assembly, main.allocation
+    return result
+
+def compile_file(filename:str, assemble:bool = False) -> CompilationResult:
+    # Every unit gets a fresh context, and anything the stages print is kept
+    # with its result so parallel runs do not interleave on stdout.
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = compile_source(read_file(filename), filename, assemble=assemble)
+    except Exception as e:
+        result = CompilationResult(filename)
+        result.error = f"{type(e).__name__}: {e}"
+    result.log = log.getvalue()
+    return result
+
+def compile_files(filenames:list[str], max_workers:int|None = None, assemble:bool = False) -> list[CompilationResult]:
+    """Compiles each file independently; results are in input order whatever
+    order the workers finish in.
+    """
+    max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    if max_workers <= 1 or len(filenames) <= 1:
+        return [compile_file(filename, assemble) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(filenames))) as executor:
+        return list(executor.map(partial(compile_file, assemble=assemble), filenames))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile C files to LIR in parallel.')
+    arg_parser.add_argument('files', nargs='+')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None)
+    arg_parser.add_argument('-S', '--assembly', action='store_true', help='print assembly instead of LIR')
+    args = arg_parser.parse_args()
+
+    failed = False
+    for result in compile_files(args.files, args.jobs, args.assembly):
+        print(f"---- {result.filename} ----")
+        if not result.ok:
+            failed = True
+            print(result.error)
+            continue
+        for name, function in result.functions.items():
+            print(f"{name}:")
+            for line in (function.assembly if args.assembly else function.lir):
+                print(line)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict, replace
+
+from modules.CompilationContext import CompilationContext
+from modules.Config import BENCHMARK_BASELINE_FILE
+from modules.FrontEnd import FrontEndService, AstCache
+from modules.HIRGen import generate_ir_high, generate_function_ir_high
+from modules.HIROptimizer import optimize_hir
+from modules.LIRGen import generate_ir_low
+from modules.MemoryManager import VariableManager
+from modules.RegisterAllocator import allocate_registers
+from modules.Simulator import Simulator
+from modules.SymbolTableGen import generate_symbol_table
+
+STAGES = [
+    'parse',
+    'generate_symbol_table',
+    'load_symbol_table',
+    'generate_ir_high',
+    'optimize_hir',
+    'allocate_registers',
+    'generate_ir_low',
+]
+
+_EXPR_OPERATORS = ['+', '-', '&', '|', '^']
+# Only lowered with a constant right operand, through strength reduction.
+_CONSTANT_OPERATORS = ['/', '%', '<<', '>>']
+_COND_OPERATORS = ['<', '>', '<=', '>=', '==', '!=']
+
+@dataclass
+class ProgramShape:
+    globals: int = 8
+    ifs: int = 4
+    depth: int = 2
+    functions: int = 2
+    statements: int = 4
+    nesting: int = 3
+    seed: int = 0
+    constant_operators: bool = False
+
+
+class ProgramGenerator:
+    """Random but reproducible C in the subset the compiler accepts.
+
+    Each of `functions` functions (main included) declares `statements`
+    locals and contains `ifs` if/else statements nested up to `nesting`
+    deep; every expression is a tree of depth `depth` over the function's
+    locals, the globals and small constants. With `constant_operators`
+    expressions also divide, take a modulo and shift by constants.
+    """
+    def __init__(self, shape:ProgramShape):
+        self.shape = shape
+        self.random = random.Random(shape.seed)
+        self.global_names = [f"g{i}" for i in range(shape.globals)]
+
+    def expression(self, names:list[str], depth:int) -> str:
+        if depth <= 0:
+            if self.random.random() < 0.25:
+                return str(self.random.randint(0, 15))
+            return self.random.choice(names)
+        left = self.expression(names, depth - 1)
+        if self.shape.constant_operators and self.random.random() < 0.25:
+            return f"({left} {self.random.choice(_CONSTANT_OPERATORS)} {self.random.randint(0, 9)})"
+        right = self.expression(names, self.random.randint(0, depth - 1))
+        return f"({left} {self.random.choice(_EXPR_OPERATORS)} {right})"
+
+    def condition(self, names:list[str]) -> str:
+        left = self.random.choice(names)
+        return f"{left} {self.random.choice(_COND_OPERATORS)} {self.expression(names, self.shape.depth - 1)}"
+
+    def assignments(self, names:list[str], targets:list[str], indent:str, count:int) -> list[str]:
+        return [f"{indent}{self.random.choice(targets)} = {self.expression(names, self.shape.depth)};" for _ in range(count)]
+
+    def if_chain(self, names:list[str], targets:list[str], count:int, level:int) -> list[str]:
+        indent = '    ' * level
+        lines = []
+        while count > 0:
+            count -= 1
+            inner = min(count, self.shape.nesting - level) if level < self.shape.nesting else 0
+            count -= inner
+            lines.append(f"{indent}if ({self.condition(names)}) {{")
+            lines.extend(self.assignments(names, targets, indent + '    ', 2))
+            lines.extend(self.if_chain(names, targets, inner, level + 1))
+            lines.append(f"{indent}}} else {{")
+            lines.extend(self.assignments(names, targets, indent + '    ', 1))
+            lines.append(f"{indent}}}")
+        return lines
+
+    def function(self, name:str) -> list[str]:
+        # Locals carry the function name, so none of them shadows a global
+        # or another function's local.
+        local_names = [f"{name}_v{i}" for i in range(max(self.shape.statements, 1))]
+        names = local_names + self.global_names
+        lines = [f"void {name}(){{"]
+        for local in local_names:
+            lines.append(f"    char {local} = {self.random.randint(0, 15)};")
+        lines.extend(self.assignments(names, local_names + self.global_names, '    ', self.shape.statements))
+        lines.extend(self.if_chain(names, local_names + self.global_names, self.shape.ifs, 1))
+        lines.append("}")
+        return lines
+
+    def generate(self) -> str:
+        lines = [f"char {name} = {self.random.randint(0, 15)};" for name in self.global_names]
+        for k in range(max(self.shape.functions - 1, 0)):
+            lines.extend(self.function(f"f{k}"))
+        lines.extend(self.function('main'))
+        return '\n'.join(lines) + '\n'
+
+
+def run_pipeline(code:str, timings:dict[str, float]|None = None) -> dict:
+    # Same stages as test.main, applied to every function.
+    def timed(stage:str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+        return result
+
+    ast = timed('parse', FrontEndService(AstCache(None)).parse, code)
+    symbol_table = timed('generate_symbol_table', generate_symbol_table, ast)
+    context = CompilationContext(symbol_table, VariableManager(static_end_address=0xFFFF))
+    timed('load_symbol_table', context.variable_manager.load_symbol_table, symbol_table)
+    functions = {}
+    for ext in ast.ext:
+        if hasattr(ext, 'body'):
+            name = ext.decl.name
+            if name == 'main':
+                functions[name] = timed('generate_ir_high', generate_ir_high, ast, context)
+            else:
+                functions[name] = timed('generate_ir_high', generate_function_ir_high, ext, context)
+    hir_count = sum(len(lines) for lines in functions.values())
+    lir_functions = {}
+    for name, hir_lines in functions.items():
+        scope = symbol_table.scope(name)
+        optimized = timed('optimize_hir', optimize_hir, hir_lines, scope)
+        allocation = timed('allocate_registers', allocate_registers, optimized, scope)
+        lir_functions[name] = timed('generate_ir_low', generate_ir_low, optimized, allocation, scope)
+    return {'hir_lines': hir_count, 'lir_lines': sum(len(lines) for lines in lir_functions.values()), 'lir': lir_functions}
+
+def measure_code(lir_functions:dict) -> tuple[int, int]:
+    # Instructions and bytes of the emitted code, labels left out.
+    instructions = code_bytes = 0
+    for lir_lines in lir_functions.values():
+        simulator = Simulator(lir_lines)
+        instructions += len(simulator.program)
+        code_bytes += simulator.end_address
+    return instructions, code_bytes
+
+def measure_peak_memory(code:str) -> int:
+    # Start from a clean collector so the peak does not depend on where the
+    # earlier points left the generation counters.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_pipeline(code)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@dataclass
+class BenchmarkPoint:
+    factor: int
+    shape: dict
+    source_lines: int
+    hir_lines: int
+    lir_lines: int
+    instructions: int
+    code_bytes: int
+    timings: dict
+    total: float
+    peak_memory: int
+
+
+def benchmark_shape(shape:ProgramShape, factor:int = 1, repeat:int = 3) -> BenchmarkPoint:
+    code = ProgramGenerator(shape).generate()
+    best: dict[str, float] = {}
+    sizes = {}
+    for _ in range(repeat):
+        timings: dict[str, float] = {}
+        sizes = run_pipeline(code, timings)
+        for stage, elapsed in timings.items():
+            best[stage] = min(best.get(stage, elapsed), elapsed)
+    instructions, code_bytes = measure_code(sizes['lir'])
+    return BenchmarkPoint(
+        factor=factor,
+        shape=asdict(shape),
+        source_lines=code.count('\n'),
+        hir_lines=sizes['hir_lines'],
+        lir_lines=sizes['lir_lines'],
+        instructions=instructions,
+        code_bytes=code_bytes,
+        timings={stage: best.get(stage, 0.0) for stage in STAGES},
+        total=sum(best.values()),
+        peak_memory=measure_peak_memory(code),
+    )
+
+def scale_shape(shape:ProgramShape, dimension:str, factor:int) -> ProgramShape:
+    if dimension == 'size':
+        # Grows a single function body; this is where per-function
+        # algorithms show their complexity.
+        return replace(shape, ifs=shape.ifs * factor, statements=shape.statements * factor, globals=shape.globals * factor)
+    return replace(shape, **{dimension: getattr(shape, dimension) * factor})
+
+def fit_exponent(xs:list[float], ys:list[float]) -> float | None:
+    # Least-squares slope in log-log space: ~1 is linear, ~2 quadratic.
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(p[0] for p in points) / len(points)
+    mean_y = sum(p[1] for p in points) / len(points)
+    var_x = sum((p[0] - mean_x) ** 2 for p in points)
+    if var_x == 0:
+        return None
+    return sum((p[0] - mean_x) * (p[1] - mean_y) for p in points) / var_x
+
+def scaling_curve(shape:ProgramShape, dimension:str, factors:list[int], repeat:int = 3) -> dict:
+    points = [benchmark_shape(scale_shape(shape, dimension, factor), factor, repeat) for factor in factors]
+    # Exponents are taken against the HIR size so that they compare across
+    # dimensions and machines.
+    sizes = [point.hir_lines for point in points]
+    exponents = {stage: fit_exponent(sizes, [point.timings[stage] for point in points]) for stage in STAGES}
+    exponents['total'] = fit_exponent(sizes, [point.total for point in points])
+    exponents['peak_memory'] = fit_exponent(sizes, [point.peak_memory for point in points])
+    return {
+        'dimension': dimension,
+        'points': [asdict(point) for point in points],
+        'exponents': exponents,
+    }
+
+SIZE_METRICS = ['hir_lines', 'lir_lines', 'instructions', 'code_bytes']
+
+def compare_to_baseline(result:dict, baseline:dict, check_timings:bool = False, exponent_tolerance:float = 0.3, time_tolerance:float = 1.5) -> list[str]:
+    """Regressions against a stored curve of the same dimension: any point
+    whose HIR, LIR, instruction count or code size grew.
+
+    Those are the same on every machine. Timings are not, since the
+    baseline may come from another one, so a stage's scaling exponent
+    (beyond `exponent_tolerance`) and its time at the largest common factor
+    (beyond `time_tolerance` times) are only checked with `check_timings`.
+    """
+    regressions = []
+    base_points = {point['factor']: point for point in baseline['points']}
+    common = [point for point in result['points'] if point['factor'] in base_points]
+    for point in common:
+        base_point = base_points[point['factor']]
+        for metric in SIZE_METRICS:
+            now, before = point.get(metric), base_point.get(metric)
+            if now is not None and before is not None and now > before:
+                regressions.append(f"{metric}: {now} vs baseline {before} at x{point['factor']}")
+    if not check_timings:
+        return regressions
+    for stage, exponent in result['exponents'].items():
+        base_exponent = baseline['exponents'].get(stage)
+        if exponent is None or base_exponent is None:
+            continue
+        if exponent > base_exponent + exponent_tolerance:
+            regressions.append(f"{stage}: scaling exponent {exponent:.2f} vs baseline {base_exponent:.2f}")
+    if common:
+        point = common[-1]
+        base_point = base_points[point['factor']]
+        for stage in STAGES:
+            now, before = point['timings'].get(stage, 0.0), base_point['timings'].get(stage, 0.0)
+            if before > 0 and now > before * time_tolerance:
+                regressions.append(f"{stage}: {now * 1000:.2f}ms vs baseline {before * 1000:.2f}ms at x{point['factor']}")
+    return regressions
+
+def print_curve(result:dict):
+    print(f"Scaling by '{result['dimension']}'")
+    header = f"{'factor':>6} {'hir':>7} {'lir':>7} {'instrs':>7} {'bytes':>7} " + ' '.join(f"{stage[:14]:>14}" for stage in STAGES) + f" {'total':>9} {'peak KiB':>9}"
+    print(header)
+    for point in result['points']:
+        cells = ' '.join(f"{point['timings'][stage] * 1000:>12.2f}ms" for stage in STAGES)
+        print(f"{point['factor']:>6} {point['hir_lines']:>7} {point['lir_lines']:>7} {point.get('instructions', 0):>7} {point.get('code_bytes', 0):>7} {cells} {point['total'] * 1000:>7.1f}ms {point['peak_memory'] / 1024:>9.1f}")
+    exponents = ' '.join(f"{stage}={value:.2f}" for stage, value in result['exponents'].items() if value is not None)
+    print(f"Exponents: {exponents}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Benchmark each compiler stage on generated programs.')
+    arg_parser.add_argument('--dimension', default='size', choices=['size', 'globals', 'ifs', 'depth', 'functions', 'statements'])
+    arg_parser.add_argument('--factors', default='1,2,4,8', help='comma separated scale factors')
+    arg_parser.add_argument('--globals', type=int, default=ProgramShape.globals)
+    arg_parser.add_argument('--ifs', type=int, default=ProgramShape.ifs)
+    arg_parser.add_argument('--depth', type=int, default=ProgramShape.depth)
+    arg_parser.add_argument('--functions', type=int, default=ProgramShape.functions)
+    arg_parser.add_argument('--statements', type=int, default=ProgramShape.statements)
+    arg_parser.add_argument('--seed', type=int, default=ProgramShape.seed)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--output', help='write the curve as JSON')
+    arg_parser.add_argument('--baseline', default=BENCHMARK_BASELINE_FILE)
+    arg_parser.add_argument('--save-baseline', action='store_true')
+    arg_parser.add_argument('--check-timings', action='store_true', help='also fail on slower stages; only meaningful against a baseline saved on this machine')
+    arg_parser.add_argument('--note', help='why the baseline changed, kept with it when saving')
+    args = arg_parser.parse_args()
+
+    shape = ProgramShape(args.globals, args.ifs, args.depth, args.functions, args.statements, seed=args.seed)
+    factors = [int(factor) for factor in args.factors.split(',')]
+    result = scaling_curve(shape, args.dimension, factors, args.repeat)
+    print_curve(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    baselines = {}
+    try:
+        with open(args.baseline, 'r') as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        pass
+    if args.save_baseline:
+        # Earlier notes stay, so the file explains every intentional change.
+        result['notes'] = baselines.get(args.dimension, {}).get('notes', []) + ([args.note] if args.note else [])
+        baselines[args.dimension] = result
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline for '{args.dimension}' saved to {args.baseline}")
+    elif args.dimension in baselines:
+        regressions = compare_to_baseline(result, baselines[args.dimension], args.check_timings)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import re
+from collections import OrderedDict
+
+from pycparser import c_ast
+from pycparser.c_ast import FileAST, FuncDef, Decl
+
+from entities.HirLine import *
+from entities.LirLine import LirLine
+from entities.SymbolTable import SymbolTable
+from modules.AssemblyGen import generate_assembly
+from modules.CompilationContext import CompilationContext
+from modules.Config import COMPILER_VERSION, FUNCTION_CACHE_MAX_ENTRIES, FUNCTION_MEMORY_CACHE_MAX_ENTRIES, FUNCTION_CACHE_EVICT_INTERVAL
+from modules.HIRGen import generate_ir_high, generate_function_ir_high
+from modules.HIROptimizer import optimize_hir
+from modules.LIRGen import generate_ir_low
+from modules.MemoryManager import VariableManager
+from modules.RegisterAllocator import RegisterAllocation, allocate_registers
+
+_LABEL_KIND = re.compile(r'^\.L([A-Za-z]*)\d*$')
+
+class CacheStage:
+    HIR = 'hir'
+    OPTIMIZED_HIR = 'opt'
+    LIR = 'lir'
+
+
+class _NameCollector(c_ast.NodeVisitor):
+    def __init__(self):
+        self.names: set[str] = set()
+
+    def visit_ID(self, node:c_ast.ID):
+        self.names.add(node.name)
+
+    def visit_Decl(self, node:Decl):
+        if node.name is not None:
+            self.names.add(node.name)
+        self.generic_visit(node)
+
+def get_node_text(node:c_ast.Node) -> str:
+    # Coordinates are left out so moving a function inside the file, or
+    # editing another one above it, keeps its key.
+    buf = io.StringIO()
+    node.show(buf, attrnames=True, nodenames=True, showcoord=False)
+    return buf.getvalue()
+
+def get_symbol_dependencies(node:c_ast.Node, symbol_table:SymbolTable) -> dict[str, dict|None]:
+    collector = _NameCollector()
+    collector.visit(node)
+    dependencies = {}
+    for name in sorted(collector.names):
+        symbol = symbol_table.get(name)
+        dependencies[name] = symbol.as_dict() if symbol is not None else None
+    return dependencies
+
+def get_stage_key(stage:str, *parts:str) -> str:
+    digest = hashlib.sha256()
+    digest.update(COMPILER_VERSION.encode())
+    digest.update(b'\0')
+    digest.update(stage.encode())
+    for part in parts:
+        digest.update(b'\0')
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+def canonicalize_hir(function:str, hir_lines:list[HirLine]) -> list[HirLine]:
+    """Renames temps and labels so a function's HIR does not depend on what
+    was generated before it: temps become .t0, .t1, ... in order of
+    appearance and labels get the function name, e.g. .Lmain_else0.
+    """
+    mapping: dict[str, str] = {}
+    label_counts: dict[str, int] = {}
+    temp_count = 0
+    for hir in hir_lines:
+        for var in (hir.defined_var(), *hir.used_vars()):
+            if var is not None and var.startswith('.t') and var not in mapping:
+                mapping[var] = f".t{temp_count}"
+                temp_count += 1
+        if isinstance(hir, LabelHirLine):
+            label = hir.label_name
+        elif isinstance(hir, (IfOpHirLine, GotoHirLine)):
+            label = hir.target_label
+        else:
+            continue
+        if label not in mapping:
+            match = _LABEL_KIND.match(label)
+            kind = match.group(1) if match else 'label'
+            mapping[label] = f".L{function}_{kind}{label_counts.get(kind, 0)}"
+            label_counts[kind] = label_counts.get(kind, 0) + 1
+    return [hir.rename(mapping) for hir in hir_lines]
+
+def serialize_hir(hir_lines:list[HirLine]) -> list[str]:
+    return [hir.render() for hir in hir_lines]
+
+def serialize_lir(lir_lines:list[LirLine]) -> list[str]:
+    return [str(lir) for lir in lir_lines]
+
+
+class FunctionCache:
+    """Per-function stage results keyed by content hash in an in-memory
+    LRU and, given a `cache_dir`, as JSON files on disk, like AstCache.
+    """
+    def __init__(self, cache_dir:str|None = None, max_entries:int = FUNCTION_CACHE_MAX_ENTRIES, memory_max_entries:int = FUNCTION_MEMORY_CACHE_MAX_ENTRIES, evict_interval:int = FUNCTION_CACHE_EVICT_INTERVAL):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.memory_max_entries = memory_max_entries
+        self.evict_interval = evict_interval
+        self.memory: OrderedDict[str, dict] = OrderedDict()
+        self._writes = 0
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    def _path(self, key:str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key:str, entry:dict):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, stage:str, key:str) -> dict | None:
+        entry = self.memory.get(key)
+        if entry is None and self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+        elif entry is not None:
+            self.memory.move_to_end(key)
+        counter = self.hits if entry is not None else self.misses
+        counter[stage] = counter.get(stage, 0) + 1
+        return entry
+
+    def put(self, key:str, entry:dict):
+        self._remember(key, entry)
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._writes += 1
+        if self._writes % self.evict_interval == 0:
+            self.evict()
+
+    def evict(self):
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    os.remove(entry.path)
+
+    def stats(self) -> dict:
+        return {'hits': dict(self.hits), 'misses': dict(self.misses)}
+
+
+class CompiledFunction:
+    def __init__(self, name:str):
+        self.name = name
+        self.hir_lines: list[HirLine] = []
+        self.optimized_hir_lines: list[HirLine] = []
+        self.allocation = RegisterAllocation()
+        self.lir_lines: list[LirLine] = []
+        self.assembly: list[str] = []
+        self.recompiled: set[str] = set()
+
+
+class IncrementalCompiler:
+    """Runs HIR generation, HIR optimization and LIR generation per function,
+    reusing cached results when the function and the symbols it refers to
+    have not changed.
+
+    Each stage key chains on the previous stage's output, so a change that
+    does not alter the HIR (e.g. reformatting) stops invalidating there.
+
+    Given a VariableManager holding the program's variables, each function
+    is also assembled. That runs on the cached LIR every time, since
+    addresses move when other functions change.
+
+    HIR generation draws temp and label names from `context`, one per
+    compiler unless given. Cached HIR is canonicalized, so the counters
+    only advance for functions that are actually regenerated.
+    """
+    def __init__(self, symbol_table:SymbolTable, cache:FunctionCache|None = None, variable_manager:VariableManager|None = None, context:CompilationContext|None = None):
+        self.symbol_table = symbol_table
+        self.cache = cache if cache is not None else FunctionCache()
+        self.variable_manager = variable_manager
+        self.context = context if context is not None else CompilationContext(symbol_table)
+
+    def _dependencies(self, node:c_ast.Node, symbol_table:SymbolTable) -> str:
+        return json.dumps(get_symbol_dependencies(node, symbol_table), sort_keys=True)
+
+    def compile_function(self, ast:FileAST, func_def:FuncDef) -> CompiledFunction:
+        name = func_def.decl.name
+        compiled = CompiledFunction(name)
+        symbol_table = self.symbol_table.scope(name)
+        source = get_node_text(func_def)
+        dependencies = self._dependencies(func_def, symbol_table)
+        if name == 'main':
+            # main also carries the global initializers, see generate_ir_high.
+            global_decls = [ext for ext in ast.ext if isinstance(ext, Decl)]
+            source += ''.join(get_node_text(decl) for decl in global_decls)
+            dependencies += ''.join(self._dependencies(decl, self.symbol_table) for decl in global_decls)
+
+        hir_key = get_stage_key(CacheStage.HIR, source, dependencies)
+        entry = self.cache.get(CacheStage.HIR, hir_key)
+        if entry is None:
+            hir_lines = generate_ir_high(ast, self.context) if name == 'main' else generate_function_ir_high(func_def, self.context)
+            entry = {'hir': serialize_hir(canonicalize_hir(name, hir_lines))}
+            self.cache.put(hir_key, entry)
+            compiled.recompiled.add(CacheStage.HIR)
+        hir_text = entry['hir']
+        compiled.hir_lines = HirLine.parse_hir_lines(hir_text)
+
+        label_prefix = f".L{name}_"
+        opt_key = get_stage_key(CacheStage.OPTIMIZED_HIR, '\n'.join(hir_text), dependencies, label_prefix)
+        entry = self.cache.get(CacheStage.OPTIMIZED_HIR, opt_key)
+        if entry is None:
+            optimized = optimize_hir(HirLine.parse_hir_lines(hir_text), symbol_table, label_prefix=label_prefix)
+            entry = {'hir': serialize_hir(optimized)}
+            self.cache.put(opt_key, entry)
+            compiled.recompiled.add(CacheStage.OPTIMIZED_HIR)
+        optimized_text = entry['hir']
+        compiled.optimized_hir_lines = HirLine.parse_hir_lines(optimized_text)
+
+        lir_key = get_stage_key(CacheStage.LIR, '\n'.join(optimized_text), dependencies, label_prefix)
+        entry = self.cache.get(CacheStage.LIR, lir_key)
+        if entry is None:
+            allocation = allocate_registers(compiled.optimized_hir_lines, symbol_table)
+            lir_lines = generate_ir_low(compiled.optimized_hir_lines, allocation, symbol_table, label_prefix)
+            entry = {'lir': serialize_lir(lir_lines), 'allocation': allocation.as_dict()}
+            self.cache.put(lir_key, entry)
+            compiled.recompiled.add(CacheStage.LIR)
+        compiled.lir_lines = LirLine.parse_lir_lines(entry['lir'])
+        compiled.allocation.registers = dict(entry['allocation']['registers'])
+        compiled.allocation.spilled = set(entry['allocation']['spilled'])
+        compiled.allocation.coalesced_moves = entry['allocation']['coalesced_moves']
+        if self.variable_manager is not None:
+            self.variable_manager.load_spilled_variables(compiled.allocation.spilled)
+            compiled.assembly = generate_assembly(compiled.lir_lines, self.variable_manager.addresses_for(name), symbol_table)
+        return compiled
+
+    def compile(self, ast:FileAST) -> dict[str, CompiledFunction]:
+        return {ext.decl.name: self.compile_function(ast, ext) for ext in ast.ext if isinstance(ext, FuncDef)}
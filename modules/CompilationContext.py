@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from entities.SymbolTable import SymbolTable
+from modules.MemoryManager import VariableManager
+
+class CompilationContext:
+    """State of one translation unit: name counters, symbol table and
+    variable manager. Nothing here is shared between units, so output does
+    not depend on what the process compiled before.
+    """
+    def __init__(self, symbol_table:SymbolTable|None = None, variable_manager:VariableManager|None = None):
+        self.symbol_table = symbol_table if symbol_table is not None else SymbolTable()
+        self.variable_manager = variable_manager if variable_manager is not None else VariableManager()
+        self.temp_counter = 0
+        self.label_counters: dict[str, int] = {}
+        # (continue, break) labels of the loops being generated, innermost last.
+        self.loop_targets: list[tuple[str, str]] = []
+
+    def new_temp(self) -> str:
+        name = f".t{self.temp_counter}"
+        self.temp_counter += 1
+        return name
+
+    def new_label(self, kind:str) -> str:
+        counter = self.label_counters.get(kind, 0)
+        self.label_counters[kind] = counter + 1
+        return f".L{kind}{counter}"
+
+    def new_else_label(self) -> str:
+        return self.new_label('else')
+
+    def new_if_label(self) -> str:
+        return self.new_label('if')
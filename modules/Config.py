@@ -6,4 +6,21 @@ REGISTERS = [
     'RA',
     'RB',
     'RD'
-]
\ No newline at end of file
+]
+
+COMPILER_VERSION = '0.1.0'
+
+# The on-disk caches are off unless this names a directory to keep them in.
+CACHE_DIR_ENV_VAR = 'ARNICOMP_CACHE_DIR'
+
+AST_CACHE_MAX_ENTRIES = 1024
+AST_MEMORY_CACHE_MAX_ENTRIES = 64
+AST_CACHE_EVICT_INTERVAL = 64
+
+FUNCTION_CACHE_MAX_ENTRIES = 4096
+FUNCTION_MEMORY_CACHE_MAX_ENTRIES = 256
+FUNCTION_CACHE_EVICT_INTERVAL = 64
+
+TRACE_ENV_VAR = 'ARNICOMP_TRACE'
+
+BENCHMARK_BASELINE_FILE = 'benchmarks/baseline.json'
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.ControlFlowGraph import ControlFlowGraph, BasicBlock
+from modules.Config import REGISTER_MAX_VALUE
+from helpers.HirHelper import evaluate_binary, evaluate_unary
+
+
+_MISSING = object()
+
+class ConditionalConstantPropagation:
+    """Sparse conditional constant propagation over non-SSA HIR.
+
+    Blocks are visited in dominator-tree preorder with one scoped table
+    from variables to the constant they hold, None when they hold none;
+    a variable missing from it is not constant either. Each block records
+    only what differs from its immediate dominator: `entry_deltas` for the
+    variables assigned on a path from the dominator, met over the
+    executable incoming edges, and `exit_values` for the ones it assigns.
+    The value a predecessor leaves is read off those deltas up its
+    dominator chain, so a join only looks at the variables assigned
+    between it and its dominator instead of every constant in the
+    function.
+
+    An edge becomes executable once its source block is reached and its
+    branch can go that way, so assignments on a branch that never runs do
+    not spoil the join. Back edges are only seen once the loop body ran,
+    so a function with loops is walked again until nothing changes.
+
+    Values follow the 8-bit registers: results wrap and comparisons are
+    unsigned, as in the CMP instruction.
+    """
+    def __init__(self, cfg:ControlFlowGraph, symbol_table:SymbolTable|None = None):
+        self.cfg = cfg
+        self.symbol_table = symbol_table
+        self.values: dict[str, int|None] = {}
+        self.entry_deltas: dict[BasicBlock, dict[str, int|None]] = {}
+        self.exit_values: dict[BasicBlock, dict[str, int|None]] = {}
+        self.executable_edges: set[tuple[BasicBlock, BasicBlock]] = set()
+        self.folded: dict[BasicBlock, list[HirLine]] = {}
+        self._undo: list[tuple[str, object]] = []
+        self._idom = cfg.immediate_dominators()
+
+    def is_volatile(self, var_name:str) -> bool:
+        if self.symbol_table is None:
+            return False
+        symbol = self.symbol_table.get(var_name)
+        return symbol is not None and symbol.qualifier == SymbolQualifier.VOLATILE
+
+    def is_executable(self, block:BasicBlock) -> bool:
+        return block in self.folded
+
+    def value_of(self, operand:Operand) -> int | None:
+        if isinstance(operand, int):
+            return operand & REGISTER_MAX_VALUE
+        return self.values.get(operand)
+
+    def evaluate(self, hir:HirLine) -> int | None:
+        if isinstance(hir, AssignmentHirLine):
+            return self.value_of(hir.value)
+        if isinstance(hir, BinaryOpHirLine):
+            left = self.value_of(hir.left_operand)
+            right = self.value_of(hir.right_operand)
+            if left is None or right is None:
+                return None
+            return evaluate_binary(hir.operator, left, right)
+        if isinstance(hir, UnaryOpHirLine):
+            operand = self.value_of(hir.operand)
+            return None if operand is None else evaluate_unary(hir.operator, operand)
+        return None
+
+    def _set(self, var_name:str, value:int|None):
+        self._undo.append((var_name, self.values.get(var_name, _MISSING)))
+        self.values[var_name] = value
+
+    def _rollback(self, mark:int):
+        while len(self._undo) > mark:
+            var_name, old = self._undo.pop()
+            if old is _MISSING:
+                del self.values[var_name]
+            else:
+                self.values[var_name] = old
+
+    def transfer(self, hir:HirLine, assigned:set[str]):
+        defined = hir.defined_var()
+        if defined is None:
+            return
+        if isinstance(hir, CallHirLine):
+            # The callee may assign any global.
+            for var_name in [var for var, value in self.values.items() if value is not None and not var.startswith('.t')]:
+                self._set(var_name, None)
+                assigned.add(var_name)
+        self._set(defined, None if self.is_volatile(defined) else self.evaluate(hir))
+        assigned.add(defined)
+
+    def branch_targets(self, block:BasicBlock) -> list[BasicBlock]:
+        terminator = block.terminator
+        if isinstance(terminator, IfOpHirLine):
+            condition = self.value_of(terminator.cond_var)
+            if condition is not None:
+                if condition:
+                    return [self.cfg.label_to_block[terminator.target_label]]
+                fallthrough = self.cfg.fallthrough(block)
+                return [fallthrough] if fallthrough is not None else []
+        return list(block.successors)
+
+    def _values_below(self, pred:BasicBlock, dominator:BasicBlock) -> dict[str, int|None]:
+        # What `pred` leaves in the variables assigned on its dominator
+        # chain below `dominator`; the others hold the dominator's values.
+        values: dict[str, int|None] = {}
+        block = pred
+        while block is not dominator:
+            for deltas in (self.exit_values, self.entry_deltas):
+                for var_name, value in deltas.get(block, {}).items():
+                    values.setdefault(var_name, value)
+            block = self._idom[block]
+        return values
+
+    def _entry_delta(self, block:BasicBlock) -> dict[str, int|None]:
+        dominator = self._idom[block]
+        preds = [pred for pred in block.predecessors if (pred, block) in self.executable_edges]
+        pred_values = [self._values_below(pred, dominator) for pred in preds if pred is not dominator]
+        if not pred_values:
+            return {}
+        if len(pred_values) < len(preds):
+            # The dominator itself is a predecessor.
+            pred_values.append({})
+        delta = {}
+        for var_name in set().union(*pred_values):
+            current = self.values.get(var_name)
+            value = pred_values[0].get(var_name, current)
+            for values in pred_values[1:]:
+                if value is None:
+                    break
+                if values.get(var_name, current) != value:
+                    value = None
+            if value != current:
+                delta[var_name] = value
+        return delta
+
+    def fold(self, hir:HirLine) -> HirLine | None:
+        """Returns the line with the constants known before it substituted,
+        or None when it is a branch that is never taken.
+        """
+        if isinstance(hir, IfOpHirLine):
+            condition = self.value_of(hir.cond_var)
+            if condition is None:
+                return hir
+            return GotoHirLine(hir.target_label) if condition else None
+        if isinstance(hir, (AssignmentHirLine, BinaryOpHirLine, UnaryOpHirLine)):
+            value = self.evaluate(hir)
+            if value is not None:
+                if isinstance(hir, AssignmentHirLine) and hir.value == value:
+                    return hir
+                return AssignmentHirLine(hir.defined_var(), value)
+        if isinstance(hir, (BinaryOpHirLine, CallHirLine)):
+            constants = {var: self.values[var] for var in hir.used_vars() if self.values.get(var) is not None}
+            if constants:
+                return hir.substitute(constants)
+        return hir
+
+    def visit_block(self, block:BasicBlock) -> bool:
+        """Folds the block's lines against the current table and marks
+        the edges it can take. True when its deltas differ from the last
+        walk.
+        """
+        entry_delta = {} if block is self.cfg.entry else self._entry_delta(block)
+        for var_name, value in entry_delta.items():
+            self._set(var_name, value)
+        assigned: set[str] = set()
+        folded = []
+        for hir in block.lines:
+            line = self.fold(hir)
+            if line is not None:
+                folded.append(line)
+            self.transfer(hir, assigned)
+        exit_values = {var_name: self.values[var_name] for var_name in assigned}
+        changed = self.entry_deltas.get(block) != entry_delta or self.exit_values.get(block) != exit_values
+        self.entry_deltas[block] = entry_delta
+        self.exit_values[block] = exit_values
+        self.folded[block] = folded
+        for successor in self.branch_targets(block):
+            if (block, successor) not in self.executable_edges:
+                self.executable_edges.add((block, successor))
+                changed = True
+        return changed
+
+    def walk(self) -> tuple[bool, bool]:
+        """One pass over the dominator tree. Returns whether any block
+        changed and whether an executable edge leads back to a block
+        already visited.
+        """
+        tree = self.cfg.dominator_tree()
+        entry = self.cfg.entry
+        visited: set[BasicBlock] = set()
+        changed = loops = False
+        # Blocks to visit, interleaved with undo-log marks to roll back to
+        # once a block's dominator subtree is done.
+        stack: list[BasicBlock | int] = [entry]
+        while stack:
+            block = stack.pop()
+            if isinstance(block, int):
+                self._rollback(block)
+                continue
+            if block is not entry and not any((pred, block) in self.executable_edges for pred in block.predecessors):
+                continue
+            visited.add(block)
+            stack.append(len(self._undo))
+            changed |= self.visit_block(block)
+            loops |= any((block, successor) in self.executable_edges for successor in block.successors if successor in visited)
+            stack.extend(reversed(tree[block]))
+        return changed, loops
+
+    def run(self) -> ConditionalConstantPropagation:
+        while True:
+            changed, loops = self.walk()
+            if not (changed and loops):
+                return self
+
+    def rewrite(self) -> list[HirLine]:
+        hir_lines = []
+        for block in self.cfg.blocks:
+            if not self.is_executable(block):
+                continue
+            if block.label is not None and (not block.lines or not isinstance(block.lines[0], LabelHirLine)):
+                hir_lines.append(LabelHirLine(block.label))
+            hir_lines.extend(self.folded[block])
+        # A folded branch often jumps straight to the block laid out next.
+        return [hir for i, hir in enumerate(hir_lines)
+                if not (isinstance(hir, GotoHirLine) and i + 1 < len(hir_lines)
+                        and isinstance(hir_lines[i + 1], LabelHirLine) and hir_lines[i + 1].label_name == hir.target_label)]
+
+
+def propagate_constants(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, cfg:ControlFlowGraph|None = None) -> list[HirLine]:
+    """Folds every value that is constant on all executable paths, turns
+    branches with a constant condition into a GOTO or drops them, and
+    deletes the blocks no executable edge reaches.
+    """
+    if not hir_lines:
+        return hir_lines
+    cfg = cfg if cfg is not None else ControlFlowGraph(hir_lines)
+    return ConditionalConstantPropagation(cfg, symbol_table).run().rewrite()
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+from entities.HirLine import *
+
+class BasicBlock:
+    def __init__(self, block_id:int, label:str|None = None):
+        self.id = block_id
+        self.label = label
+        self.lines: list[HirLine] = []
+        self.predecessors: list[BasicBlock] = []
+        self.successors: list[BasicBlock] = []
+
+    def __repr__(self):
+        return f"<BasicBlock {self.id} {self.label or ''}>"
+
+    @property
+    def terminator(self) -> HirLine | None:
+        if self.lines and isinstance(self.lines[-1], (IfOpHirLine, GotoHirLine)):
+            return self.lines[-1]
+        return None
+
+    @property
+    def falls_through(self) -> bool:
+        return not isinstance(self.terminator, GotoHirLine)
+
+
+class NaturalLoop:
+    """A loop header and the blocks of every back edge into it."""
+    def __init__(self, header:BasicBlock):
+        self.header = header
+        self.blocks: set[BasicBlock] = {header}
+        self.latches: list[BasicBlock] = []
+
+    def __repr__(self):
+        return f"<NaturalLoop {self.header.id} blocks={sorted(block.id for block in self.blocks)}>"
+
+    def __contains__(self, block:BasicBlock) -> bool:
+        return block in self.blocks
+
+    def exits(self) -> list[tuple[BasicBlock, BasicBlock]]:
+        return [(block, successor) for block in self.blocks for successor in block.successors if successor not in self.blocks]
+
+
+class ControlFlowGraph:
+    """Basic blocks of a HIR function.
+
+    Blocks keep their layout order in `blocks`, which decides fallthrough
+    edges. Edge edits invalidate the cached orderings and dominator tree,
+    which are recomputed on the next query.
+    """
+    def __init__(self, hir_lines:list[HirLine]):
+        self.blocks: list[BasicBlock] = []
+        self.label_to_block: dict[str, BasicBlock] = {}
+        self._block_of_line: dict[int, BasicBlock] = {}
+        self._layout_position: dict[BasicBlock, int] = {}
+        self._next_block_id = 0
+        self._rpo: list[BasicBlock] | None = None
+        self._idom: dict[BasicBlock, BasicBlock] | None = None
+        self._build(hir_lines)
+
+    def _new_block(self, label:str|None = None) -> BasicBlock:
+        block = BasicBlock(self._next_block_id, label)
+        self._next_block_id += 1
+        if label is not None:
+            self.label_to_block[label] = block
+        return block
+
+    def _build(self, hir_lines:list[HirLine]):
+        current = self._new_block()
+        self.blocks.append(current)
+        for hir in hir_lines:
+            if isinstance(hir, LabelHirLine):
+                if current.lines or current.label is not None:
+                    current = self._new_block(hir.label_name)
+                    self.blocks.append(current)
+                else:
+                    current.label = hir.label_name
+                    self.label_to_block[hir.label_name] = current
+            elif current.terminator is not None:
+                current = self._new_block()
+                self.blocks.append(current)
+            current.lines.append(hir)
+            self._block_of_line[id(hir)] = current
+        self._update_layout()
+        for block in self.blocks:
+            for successor in self._compute_successors(block):
+                self._link(block, successor)
+
+    @property
+    def entry(self) -> BasicBlock:
+        return self.blocks[0]
+
+    def block_of(self, hir:HirLine) -> BasicBlock | None:
+        return self._block_of_line.get(id(hir))
+
+    def _update_layout(self):
+        self._layout_position = {block: i for i, block in enumerate(self.blocks)}
+
+    def _layout_next(self, block:BasicBlock) -> BasicBlock | None:
+        position = self._layout_position[block] + 1
+        return self.blocks[position] if position < len(self.blocks) else None
+
+    def fallthrough(self, block:BasicBlock) -> BasicBlock | None:
+        return self._layout_next(block) if block.falls_through else None
+
+    def is_exit(self, block:BasicBlock) -> bool:
+        # Falling off the last block returns, whatever else it branches to.
+        return block.falls_through and self._layout_next(block) is None
+
+    def _compute_successors(self, block:BasicBlock) -> list[BasicBlock]:
+        successors = []
+        terminator = block.terminator
+        if terminator is not None:
+            successors.append(self.label_to_block[terminator.target_label])
+        if block.falls_through:
+            fallthrough = self._layout_next(block)
+            if fallthrough is not None and fallthrough not in successors:
+                successors.append(fallthrough)
+        return successors
+
+    def _link(self, source:BasicBlock, target:BasicBlock):
+        if target not in source.successors:
+            source.successors.append(target)
+            target.predecessors.append(source)
+        self._invalidate()
+
+    def _unlink(self, source:BasicBlock, target:BasicBlock):
+        if target in source.successors:
+            source.successors.remove(target)
+            target.predecessors.remove(source)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._rpo = None
+        self._idom = None
+
+    def _relink(self, block:BasicBlock):
+        for successor in list(block.successors):
+            self._unlink(block, successor)
+        for successor in self._compute_successors(block):
+            self._link(block, successor)
+
+    def remove_branch(self, block:BasicBlock) -> HirLine | None:
+        terminator = block.terminator
+        if terminator is None:
+            return None
+        block.lines.pop()
+        del self._block_of_line[id(terminator)]
+        self._relink(block)
+        return terminator
+
+    def add_branch(self, block:BasicBlock, branch:IfOpHirLine|GotoHirLine):
+        if block.terminator is not None:
+            raise ValueError(f"Block {block.id} already ends with '{block.terminator}'.")
+        if branch.target_label not in self.label_to_block:
+            raise ValueError(f"Unknown branch target '{branch.target_label}'.")
+        block.lines.append(branch)
+        self._block_of_line[id(branch)] = block
+        self._relink(block)
+
+    def replace_line(self, old:HirLine, new:HirLine):
+        block = self._block_of_line.pop(id(old))
+        block.lines[block.lines.index(old)] = new
+        self._block_of_line[id(new)] = block
+        if isinstance(old, (IfOpHirLine, GotoHirLine)) or isinstance(new, (IfOpHirLine, GotoHirLine)):
+            self._relink(block)
+
+    def remove_line(self, hir:HirLine):
+        if self.block_of(hir).terminator is hir:
+            self.remove_branch(self.block_of(hir))
+            return
+        block = self._block_of_line.pop(id(hir))
+        block.lines.remove(hir)
+        if isinstance(hir, LabelHirLine) and block.label == hir.label_name:
+            del self.label_to_block[block.label]
+            block.label = None
+
+    def remove_unreachable_blocks(self) -> list[BasicBlock]:
+        reachable = set(self.reverse_postorder())
+        removed = [block for block in self.blocks if block not in reachable]
+        for block in removed:
+            for successor in list(block.successors):
+                self._unlink(block, successor)
+            for hir in block.lines:
+                del self._block_of_line[id(hir)]
+            if block.label is not None:
+                del self.label_to_block[block.label]
+        # Dropping a block can change where its layout predecessor falls through.
+        self.blocks = [block for block in self.blocks if block in reachable]
+        self._update_layout()
+        for block in self.blocks:
+            self._relink(block)
+        return removed
+
+    def reverse_postorder(self) -> list[BasicBlock]:
+        if self._rpo is None:
+            postorder = []
+            visited = {self.entry}
+            stack = [(self.entry, iter(self.entry.successors))]
+            while stack:
+                block, successors = stack[-1]
+                for successor in successors:
+                    if successor not in visited:
+                        visited.add(successor)
+                        stack.append((successor, iter(successor.successors)))
+                        break
+                else:
+                    stack.pop()
+                    postorder.append(block)
+            self._rpo = postorder[::-1]
+        return self._rpo
+
+    def immediate_dominators(self) -> dict[BasicBlock, BasicBlock]:
+        # Cooper, Harvey & Kennedy, "A Simple, Fast Dominance Algorithm".
+        if self._idom is None:
+            rpo = self.reverse_postorder()
+            order = {block: i for i, block in enumerate(rpo)}
+            idom = {self.entry: self.entry}
+            changed = True
+            while changed:
+                changed = False
+                for block in rpo[1:]:
+                    new_idom = None
+                    for pred in block.predecessors:
+                        if pred not in idom:
+                            continue
+                        if new_idom is None:
+                            new_idom = pred
+                            continue
+                        finger1, finger2 = pred, new_idom
+                        while finger1 is not finger2:
+                            while order[finger1] > order[finger2]:
+                                finger1 = idom[finger1]
+                            while order[finger2] > order[finger1]:
+                                finger2 = idom[finger2]
+                        new_idom = finger1
+                    if idom.get(block) is not new_idom:
+                        idom[block] = new_idom
+                        changed = True
+            self._idom = idom
+        return self._idom
+
+    def dominator_tree(self) -> dict[BasicBlock, list[BasicBlock]]:
+        children: dict[BasicBlock, list[BasicBlock]] = {block: [] for block in self.reverse_postorder()}
+        for block, parent in self.immediate_dominators().items():
+            if block is not parent:
+                children[parent].append(block)
+        return children
+
+    def dominates(self, dominator:BasicBlock, block:BasicBlock) -> bool:
+        idom = self.immediate_dominators()
+        if block not in idom:
+            # Unreachable blocks are dominated by everything.
+            return True
+        while True:
+            if block is dominator:
+                return True
+            parent = idom[block]
+            if parent is block:
+                return False
+            block = parent
+
+    def natural_loops(self) -> list[NaturalLoop]:
+        """Loops merged by header, outermost first. An edge is a back edge
+        when its target dominates its source.
+        """
+        idom = self.immediate_dominators()
+        loops: dict[BasicBlock, NaturalLoop] = {}
+        for block in self.reverse_postorder():
+            for successor in block.successors:
+                if not self.dominates(successor, block):
+                    continue
+                loop = loops.setdefault(successor, NaturalLoop(successor))
+                loop.latches.append(block)
+                stack = [block]
+                while stack:
+                    node = stack.pop()
+                    if node in loop.blocks:
+                        continue
+                    loop.blocks.add(node)
+                    stack.extend(pred for pred in node.predecessors if pred in idom)
+        return sorted(loops.values(), key=lambda loop: -len(loop.blocks))
+
+    def loop_depths(self) -> dict[BasicBlock, int]:
+        depths = {block: 0 for block in self.blocks}
+        for loop in self.natural_loops():
+            for block in loop.blocks:
+                depths[block] += 1
+        return depths
+
+    def to_hir_lines(self) -> list[HirLine]:
+        hir_lines = []
+        for block in self.blocks:
+            if block.label is not None:
+                if not block.lines or not isinstance(block.lines[0], LabelHirLine):
+                    hir_lines.append(LabelHirLine(block.label))
+            hir_lines.extend(block.lines)
+        return hir_lines
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from entities.HirArray import HirArray, ASSIGNMENT, CALL, IF_OP, GOTO, LABEL, NO_OPERAND
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.ControlFlowGraph import ControlFlowGraph
+from modules.DataFlow import AvailableCopies
+from modules.DefUseIndex import DefUseIndex
+
+def _volatile_variables(symbol_table:SymbolTable|None) -> set[str]:
+    if symbol_table is None:
+        return set()
+    return {name for name, symbol in symbol_table.items() if symbol.qualifier == SymbolQualifier.VOLATILE}
+
+def coalesce_temporaries(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None) -> list[HirLine]:
+    """Rewrites `.t = e ... x = .t` within a block into `x = e` when the copy
+    is the temp's only use and nothing in between reads or writes x.
+
+    Runs on the function's columns: one scan records where each operand was
+    last touched, so checking the lines between the two is a comparison of
+    positions, and a rewrite only swaps the ID in `results`. Objects are
+    built for the rewritten lines alone.
+    """
+    columns = HirArray.from_lines(hir_lines, symbol_table)
+    operands = columns.operands
+    kinds, results, lefts = columns.kinds, columns.results, columns.lefts
+    volatile = {operands.find(name) for name in _volatile_variables(symbol_table)} - {None}
+    pending: dict[int, int] = {}
+    last_access: dict[int, int] = {}
+    last_call = -1
+    last_volatile = -1
+    for i in range(len(columns)):
+        if columns.is_removed(i):
+            continue
+        kind = kinds[i]
+        if kind == LABEL:
+            pending.clear()
+            continue
+        if kind == ASSIGNMENT and lefts[i] in pending:
+            temp, target = lefts[i], results[i]
+            position = pending.pop(temp)
+            # Moving the write of a global above a call could change what the
+            # callee reads; a volatile write must not pass another volatile access.
+            if (columns.def_counts[temp] == 1 and columns.use_counts[temp] == 1
+                    and last_access.get(target, -1) <= position
+                    and (operands.is_temp(target) or last_call <= position)
+                    and (target not in volatile or last_volatile <= position)):
+                columns.set_result(position, target)
+                columns.remove(i)
+                last_access[target] = i
+                continue
+        for operand_id in columns.used_ids(i):
+            last_access[operand_id] = i
+            if operand_id in volatile:
+                last_volatile = i
+        defined = results[i]
+        if defined != NO_OPERAND:
+            last_access[defined] = i
+            if defined in volatile:
+                last_volatile = i
+            if operands.is_temp(defined):
+                pending[defined] = i
+        if kind == CALL:
+            last_call = i
+        elif kind in (IF_OP, GOTO):
+            pending.clear()
+    return columns.to_lines(hir_lines)
+
+def propagate_copies(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, index:DefUseIndex|None = None, cfg:ControlFlowGraph|None = None) -> list[HirLine]:
+    """Replaces reads of x with y wherever the copy `x = y` is available.
+
+    A temp is never propagated into the reads of a user variable: that would
+    stretch the temp's live range and keep it from folding into the
+    expression tree of its single use.
+    """
+    index = index if index is not None else DefUseIndex(hir_lines)
+    cfg = cfg if cfg is not None else ControlFlowGraph(hir_lines)
+    copies = AvailableCopies(cfg, _volatile_variables(symbol_table))
+    if not len(copies.index):
+        return hir_lines
+    replacements: dict[int, HirLine] = {}
+    for block in cfg.blocks:
+        if block not in copies.in_bits:
+            continue
+        available = copies.in_bits[block]
+        for hir in block.lines:
+            mapping = {}
+            for var in hir.used_vars():
+                source = copies.copy_source(var, available)
+                if source is not None and (var.startswith('.t') or not source.startswith('.t')):
+                    mapping[var] = source
+            if mapping:
+                replacements[id(hir)] = hir.substitute(mapping)
+            # The facts come from the original line, which the analysis indexed.
+            available = copies.transfer(hir, available)
+    if not replacements:
+        return hir_lines
+    for i, hir in list(index.items()):
+        replacement = replacements.get(id(hir))
+        if replacement is not None:
+            index.update_line(i, replacement)
+    return index.compact()
@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+from collections import deque
+from enum import StrEnum
+from typing import Hashable, Iterable
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable
+from modules.ControlFlowGraph import ControlFlowGraph, BasicBlock
+
+class BitIndex:
+    """Interns keys to dense bit positions so sets can be held in one int."""
+    def __init__(self, keys:Iterable[Hashable] = ()):
+        self.ids: dict[Hashable, int] = {}
+        self.keys: list[Hashable] = []
+        for key in keys:
+            self.id(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key:Hashable) -> bool:
+        return key in self.ids
+
+    def id(self, key:Hashable) -> int:
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self.ids[key] = key_id
+            self.keys.append(key)
+        return key_id
+
+    def bit(self, key:Hashable) -> int:
+        return 1 << self.id(key)
+
+    def mask(self, keys:Iterable[Hashable]) -> int:
+        bits = 0
+        for key in keys:
+            bits |= 1 << self.id(key)
+        return bits
+
+    @property
+    def universe(self) -> int:
+        return (1 << len(self.keys)) - 1
+
+    def keys_of(self, bits:int) -> list[Hashable]:
+        keys = []
+        while bits:
+            low = bits & -bits
+            keys.append(self.keys[low.bit_length() - 1])
+            bits ^= low
+        return keys
+
+
+class FlowDirection(StrEnum):
+    FORWARD = 'forward'
+    BACKWARD = 'backward'
+
+class MeetOperator(StrEnum):
+    UNION = 'union'
+    INTERSECTION = 'intersection'
+
+
+class DataFlowProblem:
+    """Gen/kill problem over a CFG solved with a worklist.
+
+    Subclasses fill `gen` and `kill` per block in `_initialize`. After
+    `solve`, `in_bits` and `out_bits` hold the fixed point for every
+    reachable block, in the direction of the problem (for backward problems
+    `in_bits` is the value at the block entry as well).
+    """
+    direction = FlowDirection.FORWARD
+    meet = MeetOperator.UNION
+
+    def __init__(self, cfg:ControlFlowGraph, index:BitIndex|None = None):
+        self.cfg = cfg
+        self.index = index if index is not None else BitIndex()
+        self.gen: dict[BasicBlock, int] = {}
+        self.kill: dict[BasicBlock, int] = {}
+        self.in_bits: dict[BasicBlock, int] = {}
+        self.out_bits: dict[BasicBlock, int] = {}
+        self.iterations = 0
+        self._initialize()
+        self.solve()
+
+    def _initialize(self):
+        raise NotImplementedError
+
+    def boundary(self) -> int:
+        return 0
+
+    def initial(self) -> int:
+        return self.index.universe if self.meet == MeetOperator.INTERSECTION else 0
+
+    def solve(self):
+        blocks = self.cfg.reverse_postorder()
+        if self.direction == FlowDirection.BACKWARD:
+            blocks = blocks[::-1]
+        reachable = set(blocks)
+        forward = self.direction == FlowDirection.FORWARD
+        intersect = self.meet == MeetOperator.INTERSECTION
+        boundary = self.boundary()
+        initial = self.initial()
+        # `before` is the meet side of a block and `after` the transfer side.
+        before: dict[BasicBlock, int] = {}
+        after: dict[BasicBlock, int] = {block: initial for block in blocks}
+
+        worklist = deque(blocks)
+        queued = set(blocks)
+        self.iterations = 0
+        while worklist:
+            block = worklist.popleft()
+            queued.discard(block)
+            self.iterations += 1
+            sources = block.predecessors if forward else block.successors
+            values = [after[source] for source in sources if source in reachable]
+            # The entry can also be a loop header, and the last block can
+            # branch back as well as return.
+            if not values or (block is self.cfg.entry if forward else self.cfg.is_exit(block)):
+                values.append(boundary)
+            if intersect:
+                value = self.index.universe
+                for source_value in values:
+                    value &= source_value
+            else:
+                value = 0
+                for source_value in values:
+                    value |= source_value
+            before[block] = value
+            new_after = self.gen[block] | (value & ~self.kill[block])
+            if new_after != after[block]:
+                after[block] = new_after
+                for target in (block.successors if forward else block.predecessors):
+                    if target in reachable and target not in queued:
+                        worklist.append(target)
+                        queued.add(target)
+
+        if forward:
+            self.in_bits, self.out_bits = before, after
+        else:
+            self.in_bits, self.out_bits = after, before
+
+
+class Liveness(DataFlowProblem):
+    """Backward liveness of variables and temps.
+
+    `exit_live` names the variables that are still observable when the
+    function returns; by default every non-temporary is. Given the
+    function's symbol table, a variable's bit is its symbol id and temps
+    take the bits above.
+    """
+    direction = FlowDirection.BACKWARD
+    meet = MeetOperator.UNION
+
+    def __init__(self, cfg:ControlFlowGraph, exit_live:Iterable[str]|None = None, symbol_table:SymbolTable|None = None):
+        self._exit_live = exit_live
+        self._line_live_out: dict[BasicBlock, list[int]] = {}
+        super().__init__(cfg, BitIndex(symbol_table.names_by_id()) if symbol_table is not None else None)
+
+    def _initialize(self):
+        for block in self.cfg.blocks:
+            for hir in block.lines:
+                defined = hir.defined_var()
+                if defined is not None:
+                    self.index.id(defined)
+                for var in hir.used_vars():
+                    self.index.id(var)
+        for block in self.cfg.blocks:
+            use = 0
+            defs = 0
+            for hir in reversed(block.lines):
+                defined = hir.defined_var()
+                if defined is not None:
+                    bit = self.index.bit(defined)
+                    defs |= bit
+                    use &= ~bit
+                for var in hir.used_vars():
+                    use |= self.index.bit(var)
+            self.gen[block] = use
+            self.kill[block] = defs
+
+    def boundary(self) -> int:
+        if self._exit_live is None:
+            return self.index.mask(var for var in self.index.keys if not var.startswith('.t'))
+        return self.index.mask(self._exit_live)
+
+    def live_in(self, block:BasicBlock) -> set[str]:
+        return set(self.index.keys_of(self.in_bits.get(block, 0)))
+
+    def live_out(self, block:BasicBlock) -> set[str]:
+        return set(self.index.keys_of(self.out_bits.get(block, 0)))
+
+    def line_live_out(self, block:BasicBlock) -> list[int]:
+        # Live bits after each line of the block, walked backwards once and cached.
+        cached = self._line_live_out.get(block)
+        if cached is None:
+            live = self.out_bits.get(block, 0)
+            cached = [0] * len(block.lines)
+            for i in range(len(block.lines) - 1, -1, -1):
+                cached[i] = live
+                hir = block.lines[i]
+                defined = hir.defined_var()
+                if defined is not None:
+                    live &= ~self.index.bit(defined)
+                for var in hir.used_vars():
+                    live |= self.index.bit(var)
+            self._line_live_out[block] = cached
+        return cached
+
+    def is_live_after(self, hir:HirLine, var:str) -> bool:
+        if var not in self.index:
+            return False
+        block = self.cfg.block_of(hir)
+        if block is None or block not in self.out_bits:
+            return False
+        live = self.line_live_out(block)[block.lines.index(hir)]
+        return bool(live & self.index.bit(var))
+
+
+class ReachingDefinitions(DataFlowProblem):
+    """Forward reaching definitions. Bits are definition sites (HirLines)."""
+    direction = FlowDirection.FORWARD
+    meet = MeetOperator.UNION
+
+    def _initialize(self):
+        self.var_defs: dict[str, int] = {}
+        for block in self.cfg.blocks:
+            for hir in block.lines:
+                defined = hir.defined_var()
+                if defined is not None:
+                    self.var_defs[defined] = self.var_defs.get(defined, 0) | self.index.bit(hir)
+        for block in self.cfg.blocks:
+            gen = 0
+            kill = 0
+            for hir in block.lines:
+                defined = hir.defined_var()
+                if defined is not None:
+                    bit = self.index.bit(hir)
+                    all_defs = self.var_defs[defined]
+                    gen = (gen & ~all_defs) | bit
+                    kill |= all_defs & ~bit
+            self.gen[block] = gen
+            self.kill[block] = kill
+
+    def definition_count(self, var:str) -> int:
+        return self.var_defs.get(var, 0).bit_count()
+
+    def reaching(self, hir:HirLine, var:str) -> list[HirLine]:
+        """Definitions of `var` that reach the point just before `hir`."""
+        block = self.cfg.block_of(hir)
+        if block is None or block not in self.in_bits:
+            return []
+        all_defs = self.var_defs.get(var, 0)
+        reaching = self.in_bits[block] & all_defs
+        for line in block.lines:
+            if line is hir:
+                break
+            if line.defined_var() == var:
+                reaching = self.index.bit(line)
+        return self.index.keys_of(reaching)
+
+
+def expression_key(hir:HirLine) -> tuple | None:
+    if isinstance(hir, BinaryOpHirLine):
+        return (hir.operator, hir.left_operand, hir.right_operand)
+    if isinstance(hir, UnaryOpHirLine):
+        return (hir.operator, hir.operand)
+    return None
+
+class AvailableExpressions(DataFlowProblem):
+    """Forward must-analysis of expressions computed on every path."""
+    direction = FlowDirection.FORWARD
+    meet = MeetOperator.INTERSECTION
+
+    def _initialize(self):
+        self.operand_exprs: dict[str, int] = {}
+        for block in self.cfg.blocks:
+            for hir in block.lines:
+                key = expression_key(hir)
+                if key is None:
+                    continue
+                bit = self.index.bit(key)
+                for operand in key[1:]:
+                    if isinstance(operand, str):
+                        self.operand_exprs[operand] = self.operand_exprs.get(operand, 0) | bit
+        for block in self.cfg.blocks:
+            gen = 0
+            kill = 0
+            for hir in block.lines:
+                key = expression_key(hir)
+                if key is not None:
+                    gen |= self.index.bit(key)
+                defined = hir.defined_var()
+                if defined is not None:
+                    killed = self.operand_exprs.get(defined, 0)
+                    gen &= ~killed
+                    kill |= killed
+            self.gen[block] = gen
+            self.kill[block] = kill & ~gen
+
+    def available_at(self, hir:HirLine) -> list[tuple]:
+        """Expressions available just before `hir`."""
+        block = self.cfg.block_of(hir)
+        if block is None or block not in self.in_bits:
+            return []
+        available = self.in_bits[block]
+        for line in block.lines:
+            if line is hir:
+                break
+            key = expression_key(line)
+            if key is not None:
+                available |= self.index.bit(key)
+            defined = line.defined_var()
+            if defined is not None:
+                available &= ~self.operand_exprs.get(defined, 0)
+        return self.index.keys_of(available)
+
+
+class AvailableCopies(DataFlowProblem):
+    """Forward must-analysis of copies `x = y` after which neither side has
+    been assigned, on every path. Bits are (x, y) pairs. Copies over a
+    `volatile` variable are never tracked, and a call kills every copy over
+    a non-temporary since the callee may assign it.
+    """
+    direction = FlowDirection.FORWARD
+    meet = MeetOperator.INTERSECTION
+
+    def __init__(self, cfg:ControlFlowGraph, volatile:Iterable[str] = ()):
+        self.volatile = set(volatile)
+        super().__init__(cfg)
+
+    def copy_of(self, hir:HirLine) -> tuple[str, str] | None:
+        if isinstance(hir, AssignmentHirLine) and isinstance(hir.value, str) and hir.value != hir.var_name:
+            if hir.var_name not in self.volatile and hir.value not in self.volatile:
+                return (hir.var_name, hir.value)
+        return None
+
+    def _initialize(self):
+        self.var_copies: dict[str, int] = {}
+        self.dest_copies: dict[str, int] = {}
+        self.global_copies = 0
+        for block in self.cfg.blocks:
+            for hir in block.lines:
+                copy = self.copy_of(hir)
+                if copy is None:
+                    continue
+                bit = self.index.bit(copy)
+                dest, source = copy
+                self.var_copies[dest] = self.var_copies.get(dest, 0) | bit
+                self.var_copies[source] = self.var_copies.get(source, 0) | bit
+                self.dest_copies[dest] = self.dest_copies.get(dest, 0) | bit
+                if not (dest.startswith('.t') and source.startswith('.t')):
+                    self.global_copies |= bit
+        for block in self.cfg.blocks:
+            gen = 0
+            kill = 0
+            for hir in block.lines:
+                killed = self.killed_by(hir)
+                gen &= ~killed
+                kill |= killed
+                copy = self.copy_of(hir)
+                if copy is not None:
+                    gen |= self.index.bit(copy)
+            self.gen[block] = gen
+            self.kill[block] = kill & ~gen
+
+    def killed_by(self, hir:HirLine) -> int:
+        defined = hir.defined_var()
+        if defined is None:
+            return 0
+        killed = self.var_copies.get(defined, 0)
+        if isinstance(hir, CallHirLine):
+            killed |= self.global_copies
+        return killed
+
+    def transfer(self, hir:HirLine, available:int) -> int:
+        available &= ~self.killed_by(hir)
+        copy = self.copy_of(hir)
+        if copy is not None:
+            available |= self.index.bit(copy)
+        return available
+
+    def copy_source(self, var:str, available:int) -> str | None:
+        # Copies into the same variable kill each other, so at most one is set.
+        bits = self.dest_copies.get(var, 0) & available
+        return self.index.keys[bits.bit_length() - 1][1] if bits else None
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier, SymbolScope
+from modules.ControlFlowGraph import ControlFlowGraph
+from modules.DataFlow import Liveness
+from modules.DefUseIndex import DefUseIndex
+
+def observable_variables(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None) -> set[str]:
+    """Variables still read after the function returns: every non-temporary
+    except the ones the symbol table knows to be local.
+    """
+    observable = set()
+    for hir in hir_lines:
+        for var in (hir.defined_var(), *hir.used_vars()):
+            if var is None or var.startswith('.t'):
+                continue
+            symbol = symbol_table.get(var) if symbol_table is not None else None
+            if symbol is None or symbol.scope != SymbolScope.LOCAL or symbol.qualifier == SymbolQualifier.VOLATILE:
+                observable.add(var)
+    return observable
+
+def _has_side_effects(hir:HirLine, symbol_table:SymbolTable|None) -> bool:
+    if isinstance(hir, CallHirLine):
+        return True
+    if symbol_table is None:
+        return False
+    for var in (hir.defined_var(), *hir.used_vars()):
+        symbol = symbol_table.get(var)
+        if symbol is not None and symbol.qualifier == SymbolQualifier.VOLATILE:
+            return True
+    return False
+
+def eliminate_dead_code(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, index:DefUseIndex|None = None, liveness:Liveness|None = None) -> list[HirLine]:
+    """Removes assignments whose value is never read, and self copies.
+
+    Each block is walked backwards once from its live-out set; a removed
+    line adds no uses, so a chain of dead lines inside a block goes in the
+    same walk.
+    """
+    index = index if index is not None else DefUseIndex(hir_lines)
+    if liveness is None:
+        liveness = Liveness(ControlFlowGraph(hir_lines), observable_variables(hir_lines, symbol_table), symbol_table)
+    dead: set[int] = set()
+    for block in liveness.cfg.blocks:
+        if block not in liveness.out_bits:
+            continue
+        live = liveness.out_bits[block]
+        for hir in reversed(block.lines):
+            defined = hir.defined_var()
+            if defined is not None and not _has_side_effects(hir, symbol_table):
+                self_copy = isinstance(hir, AssignmentHirLine) and hir.value == defined
+                if self_copy or not live & liveness.index.bit(defined):
+                    dead.add(id(hir))
+                    continue
+            if defined is not None:
+                live &= ~liveness.index.bit(defined)
+            for var in hir.used_vars():
+                live |= liveness.index.bit(var)
+    if not dead:
+        return hir_lines
+    for i, hir in list(index.items()):
+        if id(hir) in dead:
+            index.remove_line(i)
+    return index.compact()
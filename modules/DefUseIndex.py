@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+
+from entities.HirLine import HirLine
+
+class DefUseIndex:
+    """Def/use positions of every variable in a HIR function.
+
+    Positions are indexes into `lines`, kept per variable in sorted lists,
+    so counts and lookups are a dict read rather than a scan. Passes rewrite
+    through `update_line` and `remove_line`, which relink only the edited
+    position; removed lines are left as None until `compact` renumbers
+    everything.
+    """
+    def __init__(self, hir_lines:list[HirLine]):
+        self._build(hir_lines)
+
+    def _build(self, hir_lines:list[HirLine]):
+        self.lines: list[HirLine | None] = list(hir_lines)
+        self.defs: dict[str, list[int]] = {}
+        self.uses: dict[str, list[int]] = {}
+        self._line_vars: list[tuple[str | None, tuple[str, ...]]] = []
+        for i, hir in enumerate(self.lines):
+            defined = hir.defined_var()
+            used = hir.used_vars()
+            self._line_vars.append((defined, used))
+            if defined is not None:
+                self.defs.setdefault(defined, []).append(i)
+            for var in used:
+                self.uses.setdefault(var, []).append(i)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def items(self):
+        for i, hir in enumerate(self.lines):
+            if hir is not None:
+                yield i, hir
+
+    def def_count(self, var:str) -> int:
+        return len(self.defs.get(var, ()))
+
+    def use_count(self, var:str) -> int:
+        return len(self.uses.get(var, ()))
+
+    def defs_of(self, var:str) -> tuple[int, ...]:
+        return tuple(self.defs.get(var, ()))
+
+    def uses_of(self, var:str) -> tuple[int, ...]:
+        return tuple(self.uses.get(var, ()))
+
+    def _unlink(self, position:int):
+        defined, used = self._line_vars[position]
+        if defined is not None:
+            positions = self.defs[defined]
+            del positions[bisect_left(positions, position)]
+            if not positions:
+                del self.defs[defined]
+        for var in used:
+            positions = self.uses[var]
+            del positions[bisect_left(positions, position)]
+            if not positions:
+                del self.uses[var]
+        self._line_vars[position] = (None, ())
+
+    def _link(self, position:int, hir:HirLine):
+        defined = hir.defined_var()
+        used = hir.used_vars()
+        self._line_vars[position] = (defined, used)
+        if defined is not None:
+            insort(self.defs.setdefault(defined, []), position)
+        for var in used:
+            insort(self.uses.setdefault(var, []), position)
+
+    def update_line(self, position:int, new_line:HirLine):
+        # The old line may already have been mutated, so unlink from the
+        # snapshot taken when it was indexed rather than from the object.
+        self._unlink(position)
+        self.lines[position] = new_line
+        self._link(position, new_line)
+
+    def remove_line(self, position:int):
+        if self.lines[position] is None:
+            return
+        self._unlink(position)
+        self.lines[position] = None
+
+    def compact(self) -> list[HirLine]:
+        compacted = [hir for hir in self.lines if hir is not None]
+        self._build(compacted)
+        return compacted
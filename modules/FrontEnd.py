@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import pycparser as pcp
+from pycparser.c_ast import FileAST
+
+from helpers.FileHelper import read_file
+from modules.Config import COMPILER_VERSION, AST_CACHE_MAX_ENTRIES, AST_MEMORY_CACHE_MAX_ENTRIES, AST_CACHE_EVICT_INTERVAL
+
+_parser: pcp.CParser | None = None
+
+def get_parser() -> pcp.CParser:
+    # Building the lexer/parser tables is the expensive part of a cold run,
+    # so every parse in the process goes through one instance.
+    global _parser
+    if _parser is None:
+        _parser = pcp.CParser(lex_optimize=True, yacc_optimize=True)
+    return _parser
+
+def get_source_key(code:str, filename:str = '') -> str:
+    # The filename is part of the key since every node's coord names it.
+    digest = hashlib.sha256()
+    digest.update(COMPILER_VERSION.encode())
+    digest.update(b'\0')
+    digest.update(getattr(pcp, '__version__', '').encode())
+    digest.update(b'\0')
+    digest.update(filename.encode())
+    digest.update(b'\0')
+    digest.update(code.encode())
+    return digest.hexdigest()
+
+
+class AstCache:
+    """Parsed FileASTs keyed by source hash, in memory and, given a
+    `cache_dir`, on disk. Only point `cache_dir` at a directory no one else
+    writes to: entries are unpickled.
+
+    Entries are kept pickled at both levels and every `get` unpickles a
+    new tree, so callers may change the AST they get (name resolution
+    renames locals in place) without affecting later hits.
+
+    Both levels evict least recently used entries; on disk the file mtime
+    records the last use, and the directory is only scanned every
+    `evict_interval` writes.
+    """
+    def __init__(self, cache_dir:str|None = None, max_entries:int = AST_CACHE_MAX_ENTRIES, memory_max_entries:int = AST_MEMORY_CACHE_MAX_ENTRIES, evict_interval:int = AST_CACHE_EVICT_INTERVAL):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.memory_max_entries = memory_max_entries
+        self.evict_interval = evict_interval
+        self.memory: OrderedDict[str, bytes] = OrderedDict()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key:str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.ast")
+
+    def _remember(self, key:str, data:bytes):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key:str) -> FileAST | None:
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(data)
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                ast = pickle.loads(data)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                ast = None
+            if ast is not None:
+                self._remember(key, data)
+                self.disk_hits += 1
+                return ast
+        self.misses += 1
+        return None
+
+    def put(self, key:str, ast:FileAST):
+        data = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            # Atomic so concurrent compiles never read a half-written entry.
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._writes += 1
+        if self._writes % self.evict_interval == 0:
+            self.evict()
+
+    def evict(self):
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.ast'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.ast'):
+                    os.remove(entry.path)
+
+
+class FrontEndService:
+    def __init__(self, cache:AstCache|None = None, debug:bool = False):
+        self.cache = cache if cache is not None else AstCache()
+        self.debug = debug
+
+    def parse(self, code:str, filename:str = '') -> FileAST:
+        key = get_source_key(code, filename)
+        ast = self.cache.get(key)
+        if ast is None:
+            ast = get_parser().parse(code, filename=filename, debug=self.debug)
+            self.cache.put(key, ast)
+        return ast
+
+    def parse_file(self, filename:str) -> FileAST:
+        return self.parse(read_file(filename), filename)
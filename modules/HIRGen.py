@@ -4,34 +4,24 @@ from typing import List, Union
 from pycparser import c_ast
 from pycparser.c_ast import FileAST
 
-from helpers.HirHelper import new_temp, invert_condition, format_val, _op_eval
+from helpers.HirHelper import invert_condition, evaluate_binary, evaluate_unary, ARITHMETIC_OPERATORS, COMPARISON_OPERATORS
+from entities.HirLine import *
+from modules.CompilationContext import CompilationContext
+from modules.Config import REGISTER_MAX_VALUE
 
-_else_label_counter = 0
-_if_label_counter = 0
+_UNARY_OPERATORS = {'-': 'neg', '~': 'bitnot', '!': 'not'}
 
-def generate_else_label() -> str:
-    global _else_label_counter
-    name = f".Lelse{_else_label_counter}"
-    _else_label_counter += 1
-    return name
 
-def generate_if_label() -> str:
-    global _if_label_counter
-    name = f".Lif{_if_label_counter}"
-    _if_label_counter += 1
-    return name
-
-
-
-def generate_ir_high(ast:FileAST) -> List[str]:
-    lines: List[str] = []
+def generate_ir_high(ast:FileAST, context:CompilationContext|None = None) -> List[HirLine]:
+    context = context if context is not None else CompilationContext()
+    lines: List[HirLine] = []
     main_func = get_main_function(ast) 
 
     for node in ast.ext:
         if isinstance(node, c_ast.Decl):
             if node.init is not None:
-                val = gen_expr(node.init, lines)
-                lines.append(f"{node.name} = {format_val(val)}")
+                val = gen_expr(node.init, lines, context)
+                lines.append(AssignmentHirLine(node.name, val))
             else:
                 # declaration without init
                 pass
@@ -41,74 +31,187 @@ def generate_ir_high(ast:FileAST) -> List[str]:
         else:
             raise NotImplementedError(f"IR generation for top-level node type '{type(node).__name__}' not implemented.")
 
-    block_items = getattr(main_func.body, 'block_items', []) or []
-    lines.extend(get_ir_high(block_items))
+    lines.extend(generate_function_ir_high(main_func, context))
 
     return lines
-    
-
-def get_ir_high(block_items: List[c_ast.Node]) -> List[str]:
-    lines : List[str] = []
-    for node in block_items:
-        if isinstance(node, c_ast.Decl):
-            if node.init is not None:
-                val = gen_expr(node.init, lines)
-                lines.append(f"{node.name} = {format_val(val)}")
-            else:
-                pass
-        elif isinstance(node, c_ast.Assignment):
-            val = gen_expr(node.rvalue, lines)
-            lines.append(f"{node.lvalue.name} = {format_val(val)}")
-        elif isinstance(node, c_ast.If):
-            cond = node.cond
-
-            # --- Condition inside IF is always a BinaryOp ---
-            if not isinstance(cond, c_ast.BinaryOp):
-                raise NotImplementedError("Only BinaryOp conditions are supported in IF for now.")
-
-            # Generate left & right
-            left = gen_expr(cond.left, lines)
-            right = gen_expr(cond.right, lines)
-
-            # Invert operator
-            inv_op = invert_condition(cond.op)
-
-            # Allocate temp for inverted condition
-            t_cond = new_temp()
-            lines.append(f"{t_cond} = {format_val(left)} {inv_op} {format_val(right)}")
-
-            # Labels
-            else_label = generate_else_label()
-            end_label = generate_if_label()
-
-            # Jump if condition is FALSE
-            lines.append(f"IF {t_cond} GOTO {else_label}")
 
-            # THEN block
-            then_items = getattr(node.iftrue, 'block_items', []) or [node.iftrue]
-            lines.extend(get_ir_high(then_items))
+def generate_function_ir_high(func_def:c_ast.FuncDef, context:CompilationContext|None = None) -> List[HirLine]:
+    context = context if context is not None else CompilationContext()
+    block_items = getattr(func_def.body, 'block_items', []) or []
+    return get_ir_high(block_items, context)
 
-            # After THEN, jump end (only if ELSE exists)
-            if node.iffalse is not None:
-                lines.append(f"GOTO {end_label}")
-
-            # ELSE label
-            lines.append(f"{else_label}:")
-
-            # ELSE block
-            if node.iffalse is not None:
-                else_items = getattr(node.iffalse, 'block_items', []) or [node.iffalse]
-                lines.extend(get_ir_high(else_items))
+def generate_functions_ir_high(ast:FileAST, context:CompilationContext|None = None) -> dict[str, List[HirLine]]:
+    context = context if context is not None else CompilationContext()
+    functions: dict[str, List[HirLine]] = {}
+    for node in ast.ext:
+        if isinstance(node, c_ast.FuncDef):
+            functions[node.decl.name] = generate_function_ir_high(node, context)
+    return functions
+    
 
-                # END label
-                lines.append(f"{end_label}:")
-        else:
-            raise NotImplementedError(f"IR generation for main node type '{type(node).__name__}' not implemented.")
+def get_ir_high(block_items: List[c_ast.Node], context:CompilationContext) -> List[HirLine]:
+    lines : List[HirLine] = []
+    for node in block_items:
+        gen_statement(node, lines, context)
     return lines
 
-
-
-def gen_expr(node: c_ast.Node, ir: List[str]) -> Union[int,str]:
+def _statement_items(node:c_ast.Node) -> List[c_ast.Node]:
+    if isinstance(node, c_ast.Compound):
+        return node.block_items or []
+    return [node]
+
+def _is_jump_target(lines:List[HirLine], label:str) -> bool:
+    return any(isinstance(hir, (IfOpHirLine, GotoHirLine)) and hir.target_label == label for hir in lines)
+
+def gen_statement(node:c_ast.Node, lines:List[HirLine], context:CompilationContext):
+    if isinstance(node, c_ast.Decl):
+        if node.init is not None:
+            val = gen_expr(node.init, lines, context)
+            lines.append(AssignmentHirLine(node.name, val))
+    elif isinstance(node, c_ast.DeclList):
+        for decl in node.decls:
+            gen_statement(decl, lines, context)
+    elif isinstance(node, c_ast.Assignment):
+        gen_assignment(node, lines, context)
+    elif isinstance(node, (c_ast.FuncCall, c_ast.UnaryOp, c_ast.ExprList)):
+        gen_expr(node, lines, context)
+    elif isinstance(node, c_ast.Compound):
+        lines.extend(get_ir_high(node.block_items or [], context))
+    elif isinstance(node, c_ast.EmptyStatement):
+        pass
+    elif isinstance(node, c_ast.If):
+        # Labels
+        else_label = context.new_else_label()
+        end_label = context.new_if_label()
+
+        # Jump if condition is FALSE
+        gen_branch(node.cond, False, else_label, lines, context)
+
+        # THEN block
+        lines.extend(get_ir_high(_statement_items(node.iftrue), context))
+
+        # After THEN, jump end (only if ELSE exists)
+        if node.iffalse is not None:
+            lines.append(GotoHirLine(end_label))
+
+        # ELSE label
+        lines.append(LabelHirLine(else_label))
+
+        # ELSE block
+        if node.iffalse is not None:
+            lines.extend(get_ir_high(_statement_items(node.iffalse), context))
+
+            # END label
+            lines.append(LabelHirLine(end_label))
+    elif isinstance(node, c_ast.While):
+        gen_loop(node.cond, node.stmt, None, True, lines, context)
+    elif isinstance(node, c_ast.DoWhile):
+        gen_loop(node.cond, node.stmt, None, False, lines, context)
+    elif isinstance(node, c_ast.For):
+        if node.init is not None:
+            gen_statement(node.init, lines, context)
+        gen_loop(node.cond, node.stmt, node.next, True, lines, context)
+    elif isinstance(node, (c_ast.Break, c_ast.Continue)):
+        if not context.loop_targets:
+            raise NotImplementedError(f"'{type(node).__name__.lower()}' outside of a loop is not supported.")
+        continue_label, break_label = context.loop_targets[-1]
+        lines.append(GotoHirLine(break_label if isinstance(node, c_ast.Break) else continue_label))
+    else:
+        raise NotImplementedError(f"IR generation for main node type '{type(node).__name__}' not implemented.")
+
+def gen_loop(cond:c_ast.Node|None, body:c_ast.Node, next_expr:c_ast.Node|None, test_first:bool, lines:List[HirLine], context:CompilationContext):
+    """Lowers a loop with its test at the bottom, so an iteration costs one
+    conditional jump. Loops that test first get a guard in front:
+
+        IF !cond GOTO break       (while and for only)
+      loop:
+        body
+      continue:
+        next                      (for only)
+        IF cond GOTO loop
+      break:
+    """
+    loop_label = context.new_label('loop')
+    continue_label = context.new_label('continue')
+    break_label = context.new_label('break')
+    loop_lines: List[HirLine] = []
+    if test_first and cond is not None:
+        gen_branch(cond, False, break_label, loop_lines, context)
+    loop_lines.append(LabelHirLine(loop_label))
+    context.loop_targets.append((continue_label, break_label))
+    loop_lines.extend(get_ir_high(_statement_items(body), context))
+    context.loop_targets.pop()
+    if _is_jump_target(loop_lines, continue_label):
+        loop_lines.append(LabelHirLine(continue_label))
+    if next_expr is not None:
+        gen_expr(next_expr, loop_lines, context)
+    if cond is not None:
+        gen_branch(cond, True, loop_label, loop_lines, context)
+    else:
+        loop_lines.append(GotoHirLine(loop_label))
+    if _is_jump_target(loop_lines, break_label):
+        loop_lines.append(LabelHirLine(break_label))
+    lines.extend(loop_lines)
+
+def gen_branch(cond:c_ast.Node, jump_if:bool, target_label:str, ir:List[HirLine], context:CompilationContext):
+    """Appends a jump to `target_label` taken when `cond` is `jump_if`.
+
+    && and || become a chain of jumps that stops at the first operand
+    deciding the result, without materializing 0/1 values:
+
+        a && b, jump if false:      a || b, jump if true:
+          IF !a GOTO target           IF a GOTO target
+          IF !b GOTO target           IF b GOTO target
+
+        a && b, jump if true:       a || b, jump if false:
+          IF !a GOTO skip             IF a GOTO skip
+          IF b GOTO target            IF !b GOTO target
+        skip:                       skip:
+    """
+    if isinstance(cond, c_ast.BinaryOp) and cond.op in ('&&', '||'):
+        if (cond.op == '||') == jump_if:
+            gen_branch(cond.left, jump_if, target_label, ir, context)
+            gen_branch(cond.right, jump_if, target_label, ir, context)
+        else:
+            skip_label = context.new_label('skip')
+            start = len(ir)
+            gen_branch(cond.left, not jump_if, skip_label, ir, context)
+            gen_branch(cond.right, jump_if, target_label, ir, context)
+            if _is_jump_target(ir[start:], skip_label):
+                ir.append(LabelHirLine(skip_label))
+        return
+    if isinstance(cond, c_ast.UnaryOp) and cond.op == '!':
+        gen_branch(cond.expr, not jump_if, target_label, ir, context)
+        return
+    if isinstance(cond, c_ast.BinaryOp) and cond.op in COMPARISON_OPERATORS:
+        left = gen_expr(cond.left, ir, context)
+        right = gen_expr(cond.right, ir, context)
+        op = cond.op if jump_if else invert_condition(cond.op)
+    else:
+        # Any other expression is true when it is nonzero.
+        left = gen_expr(cond, ir, context)
+        if isinstance(left, int):
+            if bool(left & REGISTER_MAX_VALUE) == jump_if:
+                ir.append(GotoHirLine(target_label))
+            return
+        op, right = ('!=' if jump_if else '=='), 0
+    t_cond = context.new_temp()
+    ir.append(ConditionalOpHirLine(t_cond, left, op, right))
+    ir.append(IfOpHirLine(t_cond, target_label))
+
+def gen_assignment(node:c_ast.Assignment, ir:List[HirLine], context:CompilationContext) -> str:
+    lhs_name = node.lvalue.name  # assuming ID
+    rhs = gen_expr(node.rvalue, ir, context)
+    if node.op != '=':
+        # x += e -> .t = x + e; x = .t
+        t = context.new_temp()
+        ir.append(ArithmeticOpHirLine(t, lhs_name, node.op[:-1], rhs))
+        rhs = t
+    ir.append(AssignmentHirLine(lhs_name, rhs))
+    return lhs_name
+
+
+def gen_expr(node: c_ast.Node, ir: List[HirLine], context:CompilationContext) -> Union[int,str]:
     # Constant
     if isinstance(node, c_ast.Constant):
         try:
@@ -124,55 +227,65 @@ def gen_expr(node: c_ast.Node, ir: List[str]) -> Union[int,str]:
     if isinstance(node, c_ast.ExprList):
         last = None
         for e in node.exprs:
-            last = gen_expr(e, ir)
+            last = gen_expr(e, ir, context)
         return last
 
     # Assignment 
     if isinstance(node, c_ast.Assignment):
-        rhs = gen_expr(node.rvalue, ir)
-        lhs_name = node.lvalue.name  # assuming ID
-        ir.append(f"{lhs_name} = {format_val(rhs)}")
-        return lhs_name
+        return gen_assignment(node, ir, context)
+
+    # Increment / decrement
+    if isinstance(node, c_ast.UnaryOp) and node.op in ('++', '--', 'p++', 'p--'):
+        name = node.expr.name
+        result = name
+        if node.op.startswith('p'):
+            # Postfix yields the old value.
+            result = context.new_temp()
+            ir.append(AssignmentHirLine(result, name))
+        t = context.new_temp()
+        ir.append(ArithmeticOpHirLine(t, name, '+' if node.op.endswith('++') else '-', 1))
+        ir.append(AssignmentHirLine(name, t))
+        return result
 
     # UnaryOp
     if isinstance(node, c_ast.UnaryOp):
-        operand = gen_expr(node.expr, ir)
+        operand = gen_expr(node.expr, ir, context)
         op = node.op
+        if op not in _UNARY_OPERATORS:
+            raise NotImplementedError(f"Unary operator '{op}' not supported.")
         # constant fold
         if isinstance(operand, int):
-            if op == '-':
-                return -operand
-            if op == '~':
-                return ~operand
-            if op == '!':
-                return 0 if operand else 1
-        t = new_temp()
-        if op == '-':
-            ir.append(f"{t} = neg {operand}")
-        elif op == '~':
-            ir.append(f"{t} = bitnot {operand}")
-        elif op == '!':
-            ir.append(f"{t} = not {operand}")
-        else:
-            raise NotImplementedError(f"Unary operator '{op}' not supported.")
+            return evaluate_unary(_UNARY_OPERATORS[op], operand)
+        t = context.new_temp()
+        ir.append(UnaryOpHirLine(t, _UNARY_OPERATORS[op], operand))
+        return t
+
+    # && / || as values: the right operand is only evaluated when needed
+    if isinstance(node, c_ast.BinaryOp) and node.op in ('&&', '||'):
+        t = context.new_temp()
+        end_label = context.new_label('bool')
+        ir.append(AssignmentHirLine(t, 0))
+        gen_branch(node, False, end_label, ir, context)
+        ir.append(AssignmentHirLine(t, 1))
+        ir.append(LabelHirLine(end_label))
         return t
 
     # BinaryOp
     if isinstance(node, c_ast.BinaryOp):
-        left = gen_expr(node.left, ir)
-        right = gen_expr(node.right, ir)
+        left = gen_expr(node.left, ir, context)
+        right = gen_expr(node.right, ir, context)
         op = node.op
 
         # constant folding
-        if isinstance(left, int) and isinstance(right, int) and op in _op_eval:
-            try:
-                return _op_eval[op](left, right)
-            except Exception:
-                pass
+        if isinstance(left, int) and isinstance(right, int) and (op in ARITHMETIC_OPERATORS or op in COMPARISON_OPERATORS):
+            return evaluate_binary(op, left, right)
 
         # Avoid creating temps for trivial cases
-        t = new_temp()
-        ir.append(f"{t} = {format_val(left)} {op} {format_val(right)}")
+        t = context.new_temp()
+        if op in ARITHMETIC_OPERATORS:
+            ir.append(ArithmeticOpHirLine(t, left, op, right))
+        else:
+            ir.append(ConditionalOpHirLine(t, left, op, right))
         return t
 
     # FuncCall 
@@ -180,10 +293,9 @@ def gen_expr(node: c_ast.Node, ir: List[str]) -> Union[int,str]:
         args = []
         if node.args:
             for a in node.args.exprs:
-                args.append(gen_expr(a, ir))
-        t = new_temp()
-        args_repr = ", ".join(format_val(a) for a in args)
-        ir.append(f"{t} = CALL {node.name.name}({args_repr})")
+                args.append(gen_expr(a, ir, context))
+        t = context.new_temp()
+        ir.append(CallHirLine(t, node.name.name, args))
         return t
 
     raise NotImplementedError(f"Expression type unsupported: {type(node).__name__}")
@@ -1,138 +1,136 @@
 from __future__ import annotations
 
 from entities.HirLine import *
-from entities.SymbolTable import SymbolTable
-
-def remove_unused_temporaries(hir_lines:list[HirLine]) -> list[HirLine]:
-    optimized_hir_lines = []
-    used_temps_count : dict[str, int] = get_temp_vars_used_count(hir_lines)
-    is_next_to_remove = False
-    for (i, hir) in enumerate(hir_lines):
-        if is_next_to_remove:
-            is_next_to_remove = False
-            continue
-        if isinstance(hir, ArithmeticOpHirLine):
-            if hir.result_var.startswith('.t'):
-                if used_temps_count.get(hir.result_var, 0) == 2:
-                    if hir_lines[i+1].type in [HirLineType.ASSIGNMENT]:
-                        next_hir : AssignmentHirLine = hir_lines[i+1]
-                        hir : ArithmeticOpHirLine = hir
-                        optimized_hir_lines.append(ArithmeticOpHirLine(f"{next_hir.var_name} = {hir.left_operand} {hir.operator} {hir.right_operand}"))
-                        is_next_to_remove = True
-                        continue
-        if isinstance(hir, AssignmentHirLine):
-            if hir.var_name.startswith('.t'):
-                if used_temps_count.get(hir.var_name, 0) == 2:
-                    if hir_lines[i+1].type in [HirLineType.ASSIGNMENT]:
-                        next_hir : AssignmentHirLine = hir_lines[i+1]
-                        hir : AssignmentHirLine = hir
-                        optimized_hir_lines.append(AssignmentHirLine(f"{next_hir.var_name} = {hir.value}"))
-                        is_next_to_remove = True
-                        continue
-
-
-        optimized_hir_lines.append(hir)
-    return  optimized_hir_lines
-
-def find_static_vars(hir_lines:list[HirLine], symbol_table: SymbolTable) -> dict[str,int]:
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.DefUseIndex import DefUseIndex
+from modules.ControlFlowGraph import ControlFlowGraph
+from modules.DataFlow import Liveness, ReachingDefinitions
+from modules.PassManager import PassManager, PassState, HirPass, PassGroup, Analysis
+from modules.ValueNumbering import eliminate_common_subexpressions
+from modules.ConstantPropagation import propagate_constants
+from modules.CopyPropagation import coalesce_temporaries, propagate_copies
+from modules.DeadCodeElimination import eliminate_dead_code, observable_variables
+from modules.StrengthReduction import reduce_strength
+from modules.LoopInvariantCodeMotion import hoist_loop_invariants
+from helpers.TraceHelper import get_tracer, TraceLevel, TraceCategory
+
+_trace = get_tracer(TraceCategory.OPTIMIZER)
+
+def find_static_vars(hir_lines:list[HirLine], symbol_table: SymbolTable, index:DefUseIndex|None = None, cfg:ControlFlowGraph|None = None) -> dict[str,int|str]:
+    index = index if index is not None else DefUseIndex(hir_lines)
+    cfg = cfg if cfg is not None else ControlFlowGraph(hir_lines)
     static_vars = {}
-    for i, hir in enumerate(hir_lines):
+    for i, hir in index.items():
         if isinstance(hir, AssignmentHirLine):
-            var_symbol =  symbol_table.get(hir.var_name)
-            if var_symbol.qualifier == 'volatile':
+            if _is_volatile(hir.var_name, symbol_table):
+                continue
+            if index.def_count(hir.var_name) != 1:
                 continue
-            if is_variable_assigned(hir_lines[i+1:], hir.var_name):
+            if not _def_dominates_uses(index, cfg, hir.var_name, i):
                 continue
+            if not hir.isConstant:
+                # Copies are only forwarded when the source is itself
+                # assigned exactly once, otherwise the value could change
+                # between this line and the pasted use. That assignment must
+                # also come before every read, or some reads see the value
+                # the variable entered with.
+                if index.def_count(hir.value) != 1 or _is_volatile(hir.value, symbol_table):
+                    continue
+                if not _def_dominates_uses(index, cfg, hir.value, index.defs_of(hir.value)[0]):
+                    continue
             static_vars[hir.var_name] = hir.value
+    for var_name, value in static_vars.items():
+        seen = {var_name}
+        while value in static_vars and value not in seen:
+            seen.add(value)
+            value = static_vars[value]
+        static_vars[var_name] = value
     return static_vars
 
-def paste_static_vars(hir_lines:list[HirLine], static_vars:dict[str,int]) -> list[HirLine]:
-    pasted_hir_lines = []
-    for hir in hir_lines:
-        if isinstance(hir, AssignmentHirLine):
-            if hir.var_name in static_vars:
-                continue
-        elif isinstance(hir, ArithmeticOpHirLine):
-            if hir.left_operand in static_vars:
-                hir.set_left_operand(static_vars[hir.left_operand])
-            if hir.right_operand in static_vars:
-                hir.set_right_operand(static_vars[hir.right_operand])
-
-        elif isinstance(hir, ConditionalOpHirLine):
-            if hir.left_operand in static_vars:
-                hir.set_left_operand(static_vars[hir.left_operand])
-            if hir.right_operand in static_vars:
-                hir.set_right_operand(static_vars[hir.right_operand])
-        pasted_hir_lines.append(hir)
-    return pasted_hir_lines
-
-def is_variable_assigned(hir_lines:list[HirLine], var_name:str) -> bool:
-    for hir in hir_lines:
-        if isinstance(hir, AssignmentHirLine):
-            if hir.var_name == var_name:
-                return True
-        if isinstance(hir, ArithmeticOpHirLine) or isinstance(hir, ConditionalOpHirLine):
-            if hir.result_var == var_name:
-                return True
-    return False
-
-def check_var_used(hir_lines:list[str]):
-    used_vars = set()
-    for hir in hir_lines:
-        tokens = hir.split()
-        for token in tokens:
-            if token.startswith('.t'):
-                used_vars.add(token)
-    return used_vars
-
-def get_var_used_count(hir_lines:list[HirLine], symbol_table:SymbolTable) -> dict[str,int]:
-    used_vars_count = {}
-    for hir in hir_lines:
-        splitted = hir.splitted
-        for token in splitted:
-            if token.startswith('.t') or symbol_table.is_exists(token):
-                if token in used_vars_count:
-                    used_vars_count[token] += 1
-                else:
-                    used_vars_count[token] = 1
-    return used_vars_count
-
-
-def is_line_exists(hir_lines:list[HirLine], target_line:str) -> bool:
-    for hir in hir_lines:
-        if hir.line == target_line:
-            return True
-    return False
-
-def get_temp_vars_used_count(hir_lines:list[HirLine]) -> dict[str,int]:
-    used_temps_count = {}
-    for hir in hir_lines:
-        splitted = hir.splitted
-        for token in splitted:
-            if token.startswith('.t'):
-                if token in used_temps_count:
-                    used_temps_count[token] += 1
-                else:
-                    used_temps_count[token] = 1
-    return used_temps_count
-
-def _extract_value_from_line(hir: HirLine):
-    """producer satırından sonucu tek değer olarak döndürür"""
-    if isinstance(hir, AssignmentHirLine):
-        return hir.value
-    elif isinstance(hir, ArithmeticOpHirLine):
-        return f"{hir.left_operand} {hir.operator} {hir.right_operand}"
-    elif isinstance(hir, ConditionalOpHirLine):
-        return f"{hir.left_operand} {hir.operator} {hir.right_operand}"
-    else:
-        raise Exception("Unsupported temp producer")
-
-def optimize_hir(hir_lines:list[str], symbol_table: SymbolTable) -> list[HirLine]:
-    parsed_hir_lines = HirLine.parse_hir_lines(hir_lines)
-    optimize_hir_lines = []
-    static_vars = find_static_vars(parsed_hir_lines, symbol_table)
-    optimized_hir_lines = paste_static_vars(parsed_hir_lines, static_vars)
-    optimized_hir_lines = remove_unused_temporaries(optimized_hir_lines)
-    print(static_vars)
-    return optimized_hir_lines
-
+def _def_dominates_uses(index:DefUseIndex, cfg:ControlFlowGraph, var_name:str, def_position:int) -> bool:
+    # A single assignment inside an if body only reaches the uses that sit
+    # on that path, so it can only be pasted where its block dominates.
+    def_block = cfg.block_of(index.lines[def_position])
+    for use_position in index.uses_of(var_name):
+        use_block = cfg.block_of(index.lines[use_position])
+        if use_block is def_block:
+            if use_position < def_position:
+                return False
+        elif not cfg.dominates(def_block, use_block):
+            return False
+    return True
+
+def _is_volatile(var_name:str, symbol_table:SymbolTable) -> bool:
+    var_symbol = symbol_table.get(var_name)
+    return var_symbol is not None and var_symbol.qualifier == SymbolQualifier.VOLATILE
+
+def paste_static_vars(hir_lines:list[HirLine], static_vars:dict[str,int|str], index:DefUseIndex|None = None) -> list[HirLine]:
+    index = index if index is not None else DefUseIndex(hir_lines)
+    for i, hir in list(index.items()):
+        if isinstance(hir, AssignmentHirLine) and hir.var_name in static_vars:
+            # A user variable may still be read after the function
+            # returns; dead code elimination drops it if it is not.
+            if hir.var_name.startswith('.t'):
+                index.remove_line(i)
+            continue
+        if not any(var in static_vars for var in hir.used_vars()):
+            continue
+        pasted = hir.substitute(static_vars)
+        if isinstance(pasted, ArithmeticOpHirLine):
+            pasted = pasted.evaluate_if_possible() or pasted
+        index.update_line(i, pasted)
+    return index.compact()
+
+def _paste_static_vars_pass(state:PassState) -> list[HirLine]:
+    index = state.analysis('def_use')
+    static_vars = find_static_vars(state.hir_lines, state.symbol_table, index, state.analysis('cfg'))
+    state.results['static_vars'] = static_vars
+    if _trace.debug:
+        _trace.emit(TraceLevel.DEBUG, 'static_vars', values=dict(static_vars))
+    return paste_static_vars(state.hir_lines, static_vars, index)
+
+def _constant_propagation_pass(state:PassState) -> list[HirLine]:
+    return propagate_constants(state.hir_lines, state.symbol_table, state.analysis('cfg'))
+
+def _strength_reduction_pass(state:PassState) -> list[HirLine]:
+    return reduce_strength(state.hir_lines, state.symbol_table, state.label_prefix)
+
+def _value_numbering_pass(state:PassState) -> list[HirLine]:
+    return eliminate_common_subexpressions(state.hir_lines, state.symbol_table, state.analysis('def_use'), state.analysis('cfg'))
+
+def _coalesce_temporaries_pass(state:PassState) -> list[HirLine]:
+    return coalesce_temporaries(state.hir_lines, state.symbol_table)
+
+def _copy_propagation_pass(state:PassState) -> list[HirLine]:
+    return propagate_copies(state.hir_lines, state.symbol_table, state.analysis('def_use'), state.analysis('cfg'))
+
+def _dead_code_elimination_pass(state:PassState) -> list[HirLine]:
+    return eliminate_dead_code(state.hir_lines, state.symbol_table, state.analysis('def_use'), state.analysis('liveness'))
+
+def _loop_invariant_code_motion_pass(state:PassState) -> list[HirLine]:
+    return hoist_loop_invariants(state.hir_lines, state.symbol_table, state.analysis('cfg'), state.analysis('liveness'))
+
+def create_pass_manager() -> PassManager:
+    manager = PassManager()
+    # Passes edit the DefUseIndex in place, so only the CFG and what is
+    # built on it go stale. Coalescing runs on a HirArray of its own and
+    # hands back new objects for the lines it rewrote.
+    manager.register_analysis(Analysis('def_use', lambda state: DefUseIndex(state.hir_lines)))
+    manager.register_analysis(Analysis('cfg', lambda state: ControlFlowGraph(state.hir_lines)))
+    manager.register_analysis(Analysis('liveness', lambda state: Liveness(state.analysis('cfg'), observable_variables(state.hir_lines, state.symbol_table), state.symbol_table), depends=('cfg',)))
+    manager.register_analysis(Analysis('reaching_definitions', lambda state: ReachingDefinitions(state.analysis('cfg')), depends=('cfg',)))
+    # Constant propagation rebuilds the line list from the CFG's blocks.
+    manager.register(HirPass('constant_propagation', _constant_propagation_pass, requires=('cfg',), invalidates=('def_use', 'cfg')))
+    manager.register(HirPass('strength_reduction', _strength_reduction_pass, after=('constant_propagation',), invalidates=('def_use', 'cfg')))
+    manager.register(HirPass('value_numbering', _value_numbering_pass, requires=('def_use', 'cfg'), after=('strength_reduction',), invalidates=('cfg',)))
+    manager.register(HirPass('paste_static_vars', _paste_static_vars_pass, requires=('def_use', 'cfg'), after=('value_numbering',), invalidates=('cfg',)))
+    manager.register(HirPass('coalesce_temporaries', _coalesce_temporaries_pass, after=('paste_static_vars',), invalidates=('def_use', 'cfg')))
+    manager.register(HirPass('copy_propagation', _copy_propagation_pass, requires=('def_use', 'cfg'), after=('coalesce_temporaries',), invalidates=('cfg',)))
+    manager.register(HirPass('dead_code_elimination', _dead_code_elimination_pass, requires=('def_use', 'liveness'), after=('copy_propagation',), invalidates=('cfg',)))
+    manager.register(HirPass('loop_invariant_code_motion', _loop_invariant_code_motion_pass, requires=('cfg', 'liveness'), after=('dead_code_elimination',), invalidates=('def_use', 'cfg')))
+    manager.add_group(PassGroup('cleanup', ['constant_propagation', 'strength_reduction', 'value_numbering', 'paste_static_vars', 'coalesce_temporaries', 'copy_propagation', 'dead_code_elimination', 'loop_invariant_code_motion']))
+    return manager
+
+def optimize_hir(hir_lines:list[HirLine], symbol_table: SymbolTable, pass_manager:PassManager|None = None, label_prefix:str = '.L') -> list[HirLine]:
+    pass_manager = pass_manager if pass_manager is not None else create_pass_manager()
+    return pass_manager.run(hir_lines, symbol_table, label_prefix).hir_lines
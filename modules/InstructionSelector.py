@@ -0,0 +1,458 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from entities.HirLine import *
+from entities.LirLine import *
+from helpers.ArchitectureHelper import ALU_LEFT_REGISTER_STR, ALU_RESULT_REGISTER_STR, INSTRUCTION_CYCLES, INSTRUCTION_BYTES
+from helpers.LirHelper import COMMUTATIVE_OPERATORS, SWAPPED_COMPARISONS, find_fused_conditions, normalize_operands
+from modules.RegisterManager import RegisterContent, RegisterContentType
+
+Cost = tuple[int, int]
+
+class OptimizeFor:
+    SPEED = 'speed'
+    SIZE = 'size'
+
+
+class CostModel:
+    """Orders covers by cycles then bytes when optimizing for speed, and by
+    bytes then cycles when optimizing for size.
+
+    Per instruction the two orders agree, but covers of different lengths
+    do not: two LDIs (2 cycles, 4 bytes) beat three MOVs (3 cycles, 3 bytes)
+    for speed and lose to them for size. No pair of tiles in TILES trades
+    like that yet, so generate_ir_low keeps the default and the objective
+    is only reachable through a custom table.
+    """
+    def __init__(self, optimize_for:str = OptimizeFor.SPEED):
+        if optimize_for not in (OptimizeFor.SPEED, OptimizeFor.SIZE):
+            raise ValueError(f"Unknown optimization target '{optimize_for}'.")
+        self.optimize_for = optimize_for
+
+    def cost(self, kinds:tuple[str, ...]) -> Cost:
+        cycles = sum(INSTRUCTION_CYCLES[kind] for kind in kinds)
+        size = sum(INSTRUCTION_BYTES[kind] for kind in kinds)
+        return (cycles, size) if self.optimize_for == OptimizeFor.SPEED else (size, cycles)
+
+
+class NonTerminal:
+    ACC = 'acc'             # value in ACC
+    RD = 'rd'               # value in RD, ACC may be overwritten
+    RD_KEEP = 'rd_keep'     # value in RD, ACC left alone
+    SRC = 'src'             # value in an ALU source register, RD left alone
+    HOME = 'home'           # value stored to the temp the node was folded from
+    REG = 'reg'             # value in any register
+    FLAGS = 'flags'         # comparison done, ready for a conditional jump
+
+
+class ExprNode:
+    """Expression tree rebuilt from HIR: a leaf operand, or an operator over
+    two subtrees. `var_name` is the temp an inner node was folded from.
+    """
+    __slots__ = ('operator', 'value', 'left', 'right', 'var_name', 'costs')
+
+    def __init__(self, operator:str|None = None, value:Operand|None = None, left:ExprNode|None = None, right:ExprNode|None = None, var_name:str|None = None):
+        self.operator = operator
+        self.value = value
+        self.left = left
+        self.right = right
+        self.var_name = var_name
+        self.costs: dict[str, tuple[Cost, Tile]] = {}
+
+    @staticmethod
+    def leaf(operand:Operand) -> ExprNode:
+        return ExprNode(value=operand)
+
+    @staticmethod
+    def binary(operator:str, left:ExprNode, right:ExprNode, var_name:str|None = None) -> ExprNode:
+        return ExprNode(operator, left=left, right=right, var_name=var_name)
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.operator is None
+
+    def __repr__(self):
+        if self.is_leaf:
+            return repr(self.value)
+        return f"({self.left!r} {self.operator} {self.right!r})"
+
+
+class Tile:
+    """One instruction pattern: covers a node as `result` when `applies`
+    holds and the children are covered as `operands`, where a child is
+    'left', 'right' or 'self' for chain rules. `kinds` are the instruction
+    classes the pattern itself emits, priced through the cost model.
+    """
+    def __init__(self, name:str, result:str, kinds:tuple[str, ...], operands:tuple[tuple[str, str], ...], applies:Callable[[InstructionSelector, ExprNode], bool], emit:Callable[[InstructionSelector, ExprNode], str|None]):
+        self.name = name
+        self.result = result
+        self.kinds = kinds
+        self.operands = operands
+        self.applies = applies
+        self.emit = emit
+
+    @property
+    def is_chain(self) -> bool:
+        return any(child == 'self' for child, _ in self.operands)
+
+
+_NEUTRAL_RIGHT = {'+': 0, '-': 0, '|': 0, '^': 0, '&': 0xFF}
+
+def _is_const(selector, node):
+    return node.is_leaf and isinstance(node.value, int)
+
+def _is_zero(selector, node):
+    return _is_const(selector, node) and node.value == 0
+
+def _is_variable(selector, node):
+    return node.is_leaf and isinstance(node.value, str)
+
+def _in_register(selector, node):
+    return _is_variable(selector, node) and selector.emitter.location(node.value) is not None
+
+def _in_rd(selector, node):
+    return _is_variable(selector, node) and selector.emitter.location(node.value) == ALU_LEFT_REGISTER_STR
+
+def _in_memory(selector, node):
+    return _is_variable(selector, node) and selector.emitter.location(node.value) is None
+
+def _is_alu(selector, node):
+    return node.operator in ALU_OPERATOR_OPCODES
+
+def _is_comparison(selector, node):
+    return node.operator in CONDITION_JUMP_OPCODES
+
+# Swapped tiles make the left leaf the ALU source. A memory leaf there
+# would be loaded through RA where the register allocator, which sees the
+# operands in HIR order, does not expect a clobber.
+def _is_commutative_alu(selector, node):
+    return _is_alu(selector, node) and node.operator in COMMUTATIVE_OPERATORS and not _in_memory(selector, node.left)
+
+def _is_swappable_comparison(selector, node):
+    return _is_comparison(selector, node) and not _in_memory(selector, node.left)
+
+def _is_same_alu(selector, node):
+    return _is_alu(selector, node) and _is_variable(selector, node.left) and node.left.value == node.right.value
+
+def _is_identity(selector, node):
+    return _is_alu(selector, node) and _is_const(selector, node.right) and _NEUTRAL_RIGHT[node.operator] == node.right.value & 0xFF
+
+def _is_identity_left(selector, node):
+    return _is_commutative_alu(selector, node) and _is_const(selector, node.left) and _NEUTRAL_RIGHT[node.operator] == node.left.value & 0xFF
+
+# An identity node is a folded line, so the register allocator saw its
+# operand read there and not by the line using it. Read late, as an ALU
+# source or after the other subtree, a register operand may already be
+# overwritten.
+def _is_late_identity(selector, node):
+    return _is_identity(selector, node) and not _in_register(selector, node.left)
+
+def _is_late_identity_left(selector, node):
+    return _is_identity_left(selector, node) and not _in_register(selector, node.right)
+
+def _has_register_home(selector, node):
+    return node.var_name is not None and selector.emitter.location(node.var_name) is not None
+
+def _has_memory_home(selector, node):
+    return node.var_name is not None and selector.emitter.location(node.var_name) is None
+
+def _always(selector, node):
+    return True
+
+
+def _emit_source(selector, node):
+    return selector.emitter.source_operand(node.value)
+
+def _emit_load_rd(selector, node):
+    selector.emitter.load(ALU_LEFT_REGISTER_STR, node.value)
+    return ALU_LEFT_REGISTER_STR
+
+def _emit_zero(selector, node):
+    # SUB RD leaves 0 in ACC without touching RA: one byte less than LDI.
+    emitter = selector.emitter
+    zero = RegisterContent(RegisterContentType.CONSTANT, 0)
+    holder = emitter.find_register(zero)
+    if holder is None:
+        emitter.alu(LirLineType.SUB, ALU_LEFT_REGISTER_STR)
+        emitter.set_content(ALU_RESULT_REGISTER_STR, zero)
+        holder = ALU_RESULT_REGISTER_STR
+    return holder
+
+def _emit_zero_rd(selector, node):
+    _emit_zero(selector, node)
+    selector.emitter.load(ALU_LEFT_REGISTER_STR, 0)
+    return ALU_LEFT_REGISTER_STR
+
+def _emit_acc_to_rd(selector, node):
+    selector.reduce(node, NonTerminal.ACC)
+    selector.emitter.move_register(ALU_LEFT_REGISTER_STR, ALU_RESULT_REGISTER_STR)
+    return ALU_LEFT_REGISTER_STR
+
+def _emit_rd_to_acc(selector, node):
+    selector.reduce(node, NonTerminal.RD)
+    selector.emitter.alu(LirLineType.OR, ALU_LEFT_REGISTER_STR)
+    return ALU_RESULT_REGISTER_STR
+
+def _emit_home(selector, node):
+    selector.reduce(node, NonTerminal.ACC)
+    selector.emitter.store(node.var_name, ALU_RESULT_REGISTER_STR)
+    return node.var_name
+
+def _chain(nonterminal:str):
+    def emit(selector, node):
+        return selector.reduce(node, nonterminal)
+    return emit
+
+def _identity(nonterminal:str, child:str):
+    def emit(selector, node):
+        return selector.reduce(getattr(node, child), nonterminal)
+    return emit
+
+def _finish(selector, node, source:str, swapped:bool = False) -> str | None:
+    # ALU ops leave their result in ACC, comparisons return the jump opcode.
+    if _is_alu(selector, node):
+        selector.emitter.alu(ALU_OPERATOR_OPCODES[node.operator], source)
+        return ALU_RESULT_REGISTER_STR
+    selector.emitter.lines.append(CmpLirLine.create_line(source))
+    operator = SWAPPED_COMPARISONS[node.operator] if swapped else node.operator
+    return CONDITION_JUMP_OPCODES[operator]
+
+def _emit_rd_src(selector, node):
+    selector.reduce(node.left, NonTerminal.RD)
+    return _finish(selector, node, selector.reduce(node.right, NonTerminal.SRC))
+
+def _emit_src_rd(selector, node):
+    selector.reduce(node.right, NonTerminal.RD)
+    return _finish(selector, node, selector.reduce(node.left, NonTerminal.SRC), swapped=True)
+
+def _emit_rd_acc(selector, node):
+    # The right subtree runs first; the left is a leaf, so it is still read
+    # after everything the right subtree's lines clobbered, as in the HIR.
+    selector.reduce(node.right, NonTerminal.ACC)
+    selector.reduce(node.left, NonTerminal.RD_KEEP)
+    return _finish(selector, node, ALU_RESULT_REGISTER_STR)
+
+def _emit_acc_rd(selector, node):
+    selector.reduce(node.left, NonTerminal.ACC)
+    selector.reduce(node.right, NonTerminal.RD_KEEP)
+    return _finish(selector, node, ALU_RESULT_REGISTER_STR, swapped=True)
+
+def _emit_home_acc(selector, node):
+    home = selector.reduce(node.left, NonTerminal.HOME)
+    selector.reduce(node.right, NonTerminal.ACC)
+    selector.emitter.load(ALU_LEFT_REGISTER_STR, home)
+    return _finish(selector, node, ALU_RESULT_REGISTER_STR)
+
+def _emit_same(selector, node):
+    selector.reduce(node.left, NonTerminal.RD)
+    return _finish(selector, node, ALU_LEFT_REGISTER_STR)
+
+
+_LEFT_RIGHT = (('left', NonTerminal.RD), ('right', NonTerminal.SRC))
+_RIGHT_LEFT = (('right', NonTerminal.RD), ('left', NonTerminal.SRC))
+_KEEP_ACC = (('left', NonTerminal.RD_KEEP), ('right', NonTerminal.ACC))
+_ACC_KEEP = (('left', NonTerminal.ACC), ('right', NonTerminal.RD_KEEP))
+_HOME_ACC = (('left', NonTerminal.HOME), ('right', NonTerminal.ACC))
+
+TILES = [
+    # Leaves
+    Tile('ldi', NonTerminal.SRC, ('LDI',), (), _is_const, _emit_source),
+    Tile('register', NonTerminal.SRC, (), (), _in_register, _emit_source),
+    Tile('load', NonTerminal.SRC, ('LOAD',), (), _in_memory, _emit_source),
+    Tile('zero', NonTerminal.SRC, ('ALU',), (), _is_zero, _emit_zero),
+    Tile('ldi_rd', NonTerminal.RD, ('LDI', 'MOV'), (), _is_const, _emit_load_rd),
+    Tile('zero_rd', NonTerminal.RD, ('ALU', 'MOV'), (), _is_zero, _emit_zero_rd),
+    Tile('in_rd', NonTerminal.RD, (), (), _in_rd, _emit_load_rd),
+    Tile('mov_rd', NonTerminal.RD, ('MOV',), (), _in_register, _emit_load_rd),
+    Tile('load_rd', NonTerminal.RD, ('LOAD',), (), _in_memory, _emit_load_rd),
+    Tile('ldi_rd_keep', NonTerminal.RD_KEEP, ('LDI', 'MOV'), (), _is_const, _emit_load_rd),
+    Tile('in_rd_keep', NonTerminal.RD_KEEP, (), (), _in_rd, _emit_load_rd),
+    Tile('mov_rd_keep', NonTerminal.RD_KEEP, ('MOV',), (), _in_register, _emit_load_rd),
+    Tile('load_rd_keep', NonTerminal.RD_KEEP, ('LOAD',), (), _in_memory, _emit_load_rd),
+    # ALU ops: ACC <- RD op source
+    Tile('alu', NonTerminal.ACC, ('ALU',), _LEFT_RIGHT, _is_alu, _emit_rd_src),
+    Tile('alu_swapped', NonTerminal.ACC, ('ALU',), _RIGHT_LEFT, _is_commutative_alu, _emit_src_rd),
+    Tile('alu_acc', NonTerminal.ACC, ('ALU',), _KEEP_ACC, _is_alu, _emit_rd_acc),
+    Tile('alu_acc_swapped', NonTerminal.ACC, ('ALU',), _ACC_KEEP, _is_commutative_alu, _emit_acc_rd),
+    Tile('alu_home', NonTerminal.ACC, ('ALU',), _HOME_ACC, _is_alu, _emit_home_acc),
+    Tile('alu_same', NonTerminal.ACC, ('ALU',), (('left', NonTerminal.RD),), _is_same_alu, _emit_same),
+    # x + 0, x & 0xFF, ... are x itself
+    *(Tile(f'identity_{nt}', nt, (), (('left', nt),), _is_identity, _identity(nt, 'left'))
+      for nt in (NonTerminal.ACC, NonTerminal.RD)),
+    *(Tile(f'identity_{nt}', nt, (), (('left', nt),), _is_late_identity, _identity(nt, 'left'))
+      for nt in (NonTerminal.RD_KEEP, NonTerminal.SRC)),
+    *(Tile(f'identity_left_{nt}', nt, (), (('right', nt),), _is_identity_left, _identity(nt, 'right'))
+      for nt in (NonTerminal.ACC, NonTerminal.RD)),
+    *(Tile(f'identity_left_{nt}', nt, (), (('right', nt),), _is_late_identity_left, _identity(nt, 'right'))
+      for nt in (NonTerminal.RD_KEEP, NonTerminal.SRC)),
+    # Comparisons: flags <- RD - source
+    Tile('cmp', NonTerminal.FLAGS, ('CMP',), _LEFT_RIGHT, _is_comparison, _emit_rd_src),
+    Tile('cmp_swapped', NonTerminal.FLAGS, ('CMP',), _RIGHT_LEFT, _is_swappable_comparison, _emit_src_rd),
+    Tile('cmp_acc', NonTerminal.FLAGS, ('CMP',), _KEEP_ACC, _is_comparison, _emit_rd_acc),
+    Tile('cmp_acc_swapped', NonTerminal.FLAGS, ('CMP',), _ACC_KEEP, _is_swappable_comparison, _emit_acc_rd),
+    Tile('cmp_home', NonTerminal.FLAGS, ('CMP',), _HOME_ACC, _is_comparison, _emit_home_acc),
+    # Chain rules
+    Tile('acc_to_rd', NonTerminal.RD, ('MOV',), (('self', NonTerminal.ACC),), _always, _emit_acc_to_rd),
+    Tile('rd_to_acc', NonTerminal.ACC, ('ALU',), (('self', NonTerminal.RD),), _always, _emit_rd_to_acc),
+    Tile('home_register', NonTerminal.HOME, ('MOV', 'MOV'), (('self', NonTerminal.ACC),), _has_register_home, _emit_home),
+    Tile('home_memory', NonTerminal.HOME, ('STORE', 'LOAD'), (('self', NonTerminal.ACC),), _has_memory_home, _emit_home),
+    Tile('reg_acc', NonTerminal.REG, (), (('self', NonTerminal.ACC),), _always, _chain(NonTerminal.ACC)),
+    Tile('reg_rd', NonTerminal.REG, (), (('self', NonTerminal.RD),), _always, _chain(NonTerminal.RD)),
+    Tile('reg_src', NonTerminal.REG, (), (('self', NonTerminal.SRC),), _always, _chain(NonTerminal.SRC)),
+]
+
+
+class InstructionSelector:
+    """Bottom-up rewrite system instruction selection: every node of an
+    expression tree is labelled with the cheapest tile for each
+    nonterminal, by dynamic programming over its children's labels, and the
+    winning cover is then emitted top-down through the LirEmitter.
+
+    Adding an instruction is adding a Tile to the table.
+    """
+    def __init__(self, emitter, cost_model:CostModel|None = None, tiles:list[Tile]|None = None):
+        self.emitter = emitter
+        self.cost_model = cost_model if cost_model is not None else CostModel()
+        self.tiles = list(tiles) if tiles is not None else list(TILES)
+        # Leaves and operators only ever match their own base tiles.
+        self.leaf_tiles = [tile for tile in self.tiles if not tile.operands]
+        self.operator_tiles = [tile for tile in self.tiles if tile.operands and not tile.is_chain]
+        self.chain_tiles = [tile for tile in self.tiles if tile.is_chain]
+        self.tile_costs = {tile.name: self.cost_model.cost(tile.kinds) for tile in self.tiles}
+        # A leaf's labels only depend on whether it is a constant, zero or
+        # where its variable lives, so leaves of one class share them.
+        self._leaf_labels: dict[tuple, dict[str, tuple[Cost, Tile]]] = {}
+
+    def _try(self, node:ExprNode, tile:Tile) -> bool:
+        if not tile.applies(self, node):
+            return False
+        first, second = self.tile_costs[tile.name]
+        for child, nonterminal in tile.operands:
+            child_node = node if child == 'self' else getattr(node, child)
+            label = child_node.costs.get(nonterminal)
+            if label is None:
+                return False
+            first += label[0][0]
+            second += label[0][1]
+        best = node.costs.get(tile.result)
+        if best is not None and best[0] <= (first, second):
+            return False
+        node.costs[tile.result] = ((first, second), tile)
+        return True
+
+    def label(self, node:ExprNode):
+        if node.is_leaf:
+            value = node.value
+            key = (True, value == 0) if isinstance(value, int) else (False, self.emitter.location(value))
+            costs = self._leaf_labels.get(key)
+            if costs is None:
+                node.costs = {}
+                self._label_with(node, self.leaf_tiles)
+                costs = self._leaf_labels[key] = node.costs
+            node.costs = costs
+            return
+        self.label(node.left)
+        self.label(node.right)
+        node.costs = {}
+        self._label_with(node, self.operator_tiles)
+
+    def _label_with(self, node:ExprNode, tiles:list[Tile]):
+        for tile in tiles:
+            self._try(node, tile)
+        # A chain tile can only win again once the cost of the nonterminal
+        # it reads dropped, so later rounds only retry those.
+        tiles = self.chain_tiles
+        while tiles:
+            changed = {tile.result for tile in tiles if self._try(node, tile)}
+            tiles = [tile for tile in self.chain_tiles if tile.operands[0][1] in changed]
+
+    def reduce(self, node:ExprNode, nonterminal:str) -> str | None:
+        label = node.costs.get(nonterminal)
+        if label is None:
+            raise NotImplementedError(f"LIR lowering for operator '{node.operator}' not implemented.")
+        return label[1].emit(self, node)
+
+    def select(self, tree:ExprNode, nonterminal:str) -> str | None:
+        """Emits the cheapest cover of `tree` as `nonterminal`: the register
+        holding the value, or for FLAGS the jump opcode taken when the
+        comparison holds.
+        """
+        self.label(tree)
+        return self.reduce(tree, nonterminal)
+
+    def cost(self, tree:ExprNode, nonterminal:str) -> Cost | None:
+        self.label(tree)
+        label = tree.costs.get(nonterminal)
+        return label[0] if label is not None else None
+
+
+def _is_foldable(hir:HirLine, uses:dict[str, int], defs:dict[str, int], fused:set[int]) -> bool:
+    if isinstance(hir, ArithmeticOpHirLine):
+        if hir.operator not in ALU_OPERATOR_OPCODES:
+            return False
+    elif isinstance(hir, UnaryOpHirLine):
+        if hir.operator not in ('neg', 'bitnot'):
+            return False
+    elif not (isinstance(hir, ConditionalOpHirLine) and id(hir) in fused):
+        return False
+    var = hir.defined_var()
+    return var.startswith('.t') and uses.get(var) == 1 and defs.get(var) == 1
+
+def build_expression_trees(hir_lines:list[HirLine]) -> list[tuple[HirLine, ExprNode|None]]:
+    """Pairs each HIR line that still has to be lowered with the expression
+    tree it computes. A single-use temp computed by the line(s) right
+    before its use is folded into the using line's tree, so trees always
+    cover a contiguous run of HIR and keep its evaluation order.
+    """
+    uses: dict[str, int] = {}
+    defs: dict[str, int] = {}
+    for hir in hir_lines:
+        for var in hir.used_vars():
+            uses[var] = uses.get(var, 0) + 1
+        defined = hir.defined_var()
+        if defined is not None:
+            defs[defined] = defs.get(defined, 0) + 1
+    fused = find_fused_conditions(hir_lines)
+
+    roots: list[tuple[HirLine, ExprNode|None]] = []
+    pending: list[tuple[HirLine, ExprNode|None]] = []
+
+    def operand_tree(operand:Operand) -> ExprNode:
+        if isinstance(operand, str) and pending and pending[-1][0].defined_var() == operand:
+            return pending.pop()[1]
+        return ExprNode.leaf(operand)
+
+    for hir in hir_lines:
+        tree = None
+        if isinstance(hir, AssignmentHirLine):
+            tree = operand_tree(hir.value)
+        elif isinstance(hir, BinaryOpHirLine):
+            # Same operand order as get_clobbered_registers assumes, or a
+            # constant left operand would go through RA while the register
+            # allocator still has the right one live there.
+            left_operand, operator, right_operand = normalize_operands(hir.left_operand, hir.operator, hir.right_operand)
+            right = operand_tree(right_operand)
+            left = operand_tree(left_operand)
+            tree = ExprNode.binary(operator, left, right, hir.result_var)
+        elif isinstance(hir, UnaryOpHirLine):
+            operand = operand_tree(hir.operand)
+            if hir.operator == 'neg':
+                # neg x -> 0 - x, bitnot x -> x ^ 0xFF, not x -> x == 0
+                tree = ExprNode.binary('-', ExprNode.leaf(0), operand, hir.result_var)
+            elif hir.operator == 'bitnot':
+                tree = ExprNode.binary('^', operand, ExprNode.leaf(0xFF), hir.result_var)
+            else:
+                tree = ExprNode.binary('==', operand, ExprNode.leaf(0), hir.result_var)
+        elif isinstance(hir, IfOpHirLine) and not isinstance(hir.cond_var, int):
+            tree = operand_tree(hir.cond_var)
+            if tree.operator not in CONDITION_JUMP_OPCODES:
+                tree = ExprNode.binary('!=', tree, ExprNode.leaf(0))
+        roots.extend(pending)
+        pending.clear()
+        if _is_foldable(hir, uses, defs, fused):
+            pending.append((hir, tree))
+        else:
+            roots.append((hir, tree))
+    roots.extend(pending)
+    return roots
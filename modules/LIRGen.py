@@ -2,18 +2,217 @@ from __future__ import annotations
 
 from entities.HirLine import *
 from entities.LirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from helpers.ArchitectureHelper import GENERAL_PURPOSE_REGISTERS_STR, IMMEDIATE_REGISTER_STR, ALU_RESULT_REGISTER_STR
+from modules.Config import REGISTER_MAX_VALUE
+from modules.RegisterManager import RegisterManager, RegisterContent, RegisterContentType
+from modules.InstructionSelector import InstructionSelector, NonTerminal, ExprNode, build_expression_trees
+from modules.RegisterAllocator import RegisterAllocation, allocate_registers
 
-def generate_ir_low(hir_lines:list[HirLine]) -> list[str]:
-    low_ir_lines:list[LirLine] = []
-    for hir in hir_lines:
-        if isinstance(hir, AssignmentHirLine):
-            # b = 50 -> LDI 50; STORE b
-            if hir.isConstant:
-                low_ir_lines.append(LoadImmLirLine.create_line(hir.value))
-                mov_destination = MovDestination(MovDestinationType.VARIABLE, hir.var_name)
-                mov_source = MovSource(MovSourceType.REGISTER, SOURCE_REGISTERS_STR[0])
-                low_ir_lines.append(MovLirLine.create_line(mov_destination, mov_source))
-    return low_ir_lines
+class LirEmitter:
+    """Emits LIR while tracking what each register holds within a basic
+    block, so loads of a constant or variable already in a register are
+    dropped or turned into register moves.
+
+    Memory variables are only cached when a symbol table is given, since
+    volatile ones must be reloaded on every use.
+    """
+    def __init__(self, allocation:RegisterAllocation, label_prefix:str = '.L', symbol_table:SymbolTable|None = None):
+        self.allocation = allocation
+        self.lines: list[LirLine] = []
+        self.label_prefix = label_prefix
+        self.symbol_table = symbol_table
+        self._label_counter = 0
+        self.registers = RegisterManager(GENERAL_PURPOSE_REGISTERS_STR + [ALU_RESULT_REGISTER_STR])
+        # Memory variables whose current value is a known constant.
+        self.memory_constants: dict[str, int] = {}
+
+    def new_label(self) -> str:
+        name = f"{self.label_prefix}cmp{self._label_counter}"
+        self._label_counter += 1
+        return name
+
+    def location(self, operand:Operand) -> str | None:
+        # Register holding a variable operand, or None if it lives in memory.
+        if isinstance(operand, str):
+            return self.allocation.get_register(operand)
+        return None
+
+    def is_cacheable(self, var_name:str) -> bool:
+        if self.symbol_table is None:
+            return False
+        symbol = self.symbol_table.get(var_name)
+        return symbol is None or symbol.qualifier != SymbolQualifier.VOLATILE
+
+    def content(self, register:str) -> RegisterContent | None:
+        return self.registers.get_register(register).content
+
+    def set_content(self, register:str, content:RegisterContent|None):
+        if content is None:
+            self.registers.free_register(register)
+        else:
+            self.registers.allocate_register(register, content)
+
+    def find_register(self, content:RegisterContent) -> str | None:
+        for name, register in self.registers.registers.items():
+            if register.content == content:
+                return name
+        return None
+
+    def forget(self):
+        for name in self.registers.registers:
+            self.registers.free_register(name)
+        self.memory_constants.clear()
+
+    def define(self, var_name:str):
+        # var_name gets a new value: copies of the old one are stale.
+        stale = RegisterContent(RegisterContentType.VARIABLE, variable_name=var_name)
+        for name, register in self.registers.registers.items():
+            if register.content == stale:
+                self.registers.free_register(name)
+        self.memory_constants.pop(var_name, None)
+
+    def load_immediate(self, value:int):
+        self.lines.append(LoadImmLirLine.create_line(value))
+        self.set_content(IMMEDIATE_REGISTER_STR, RegisterContent(RegisterContentType.CONSTANT, value & REGISTER_MAX_VALUE))
+
+    def load(self, register:str, operand:Operand):
+        if isinstance(operand, int):
+            content = RegisterContent(RegisterContentType.CONSTANT, operand & REGISTER_MAX_VALUE)
+            if self.content(register) == content:
+                return
+            holder = self.find_register(content)
+            if holder is not None:
+                self.move_register(register, holder)
+                return
+            self.load_immediate(operand)
+            if register != IMMEDIATE_REGISTER_STR:
+                self.move_register(register, IMMEDIATE_REGISTER_STR)
+            return
+        source = self.location(operand)
+        if source is not None:
+            current = self.content(register)
+            if source != register and not (current is not None and current == self.content(source)):
+                self.move_register(register, source)
+            return
+        content = RegisterContent(RegisterContentType.VARIABLE, variable_name=operand)
+        if self.is_cacheable(operand):
+            if self.content(register) == content:
+                return
+            holder = self.find_register(content)
+            if holder is None and operand in self.memory_constants:
+                holder = self.find_register(RegisterContent(RegisterContentType.CONSTANT, self.memory_constants[operand]))
+                if holder is None and register == IMMEDIATE_REGISTER_STR:
+                    self.load_immediate(self.memory_constants[operand])
+                    return
+            if holder is not None:
+                if holder != register:
+                    self.move_register(register, holder)
+                return
+        self.lines.append(MovLirLine.create_line(
+            MovDestination(MovDestinationType.REGISTER, register),
+            MovSource(MovSourceType.VARIABLE, operand)))
+        self.set_content(register, content if self.is_cacheable(operand) else None)
+
+    def move_register(self, destination:str, source:str):
+        self.lines.append(MovLirLine.create_line(
+            MovDestination(MovDestinationType.REGISTER, destination),
+            MovSource(MovSourceType.REGISTER, source)))
+        self.set_content(destination, self.content(source))
+
+    def bind(self, var_name:str, register:str):
+        # var_name's home register now holds its new value.
+        content = self.content(register)
+        self.define(var_name)
+        if content is None or content == RegisterContent(RegisterContentType.VARIABLE, variable_name=var_name):
+            content = RegisterContent(RegisterContentType.VARIABLE, variable_name=var_name)
+        self.set_content(register, content)
+
+    def store(self, var_name:str, source:str):
+        register = self.location(var_name)
+        if register is None:
+            self.lines.append(MovLirLine.create_line(
+                MovDestination(MovDestinationType.VARIABLE, var_name),
+                MovSource(MovSourceType.REGISTER, source)))
+            content = self.content(source)
+            self.define(var_name)
+            if not self.is_cacheable(var_name):
+                return
+            if content is not None and content.content_type == RegisterContentType.CONSTANT:
+                self.memory_constants[var_name] = content.value
+            else:
+                self.set_content(source, RegisterContent(RegisterContentType.VARIABLE, variable_name=var_name))
+        else:
+            if register != source:
+                self.move_register(register, source)
+            self.bind(var_name, register)
+
+    def source_operand(self, operand:Operand) -> str:
+        # ALU/CMP source: registers are used in place, anything else goes through RA.
+        register = self.location(operand)
+        if register is not None:
+            return register
+        self.load(IMMEDIATE_REGISTER_STR, operand)
+        return IMMEDIATE_REGISTER_STR
+
+    def alu(self, opcode:str, source:str):
+        self.lines.append(AluLirLine.create_line(opcode, source))
+        self.set_content(ALU_RESULT_REGISTER_STR, None)
+
+    def label(self, label_name:str):
+        # Another path can jump here, so nothing is known about registers.
+        self.lines.append(LabelLirLine.create_line(label_name))
+        self.forget()
+
+    def materialize(self, result_var:str, jump_opcode:str):
+        # Result is 1 when the flags satisfy jump_opcode, else 0. Both paths
+        # into the label differ only in RA.
+        true_label = self.new_label()
+        self.load_immediate(1)
+        self.lines.append(JumpLirLine.create_line(jump_opcode, true_label))
+        self.load_immediate(0)
+        self.lines.append(LabelLirLine.create_line(true_label))
+        self.set_content(IMMEDIATE_REGISTER_STR, None)
+        self.store(result_var, IMMEDIATE_REGISTER_STR)
+
+
+def lower_hir_line(emitter:LirEmitter, selector:InstructionSelector, hir:HirLine, tree:ExprNode|None = None):
+    if isinstance(hir, (AssignmentHirLine, ArithmeticOpHirLine)) or (isinstance(hir, UnaryOpHirLine) and hir.operator != 'not'):
+        var_name = hir.defined_var()
+        if not tree.is_leaf:
+            emitter.store(var_name, selector.select(tree, NonTerminal.REG))
+            return
+        # b = 50 -> LDI 50; MOV var:b RA
+        register = emitter.location(var_name)
+        if register is not None:
+            emitter.load(register, tree.value)
+            emitter.bind(var_name, register)
+        else:
+            emitter.store(var_name, emitter.source_operand(tree.value))
+    elif isinstance(hir, (ConditionalOpHirLine, UnaryOpHirLine)):
+        if tree.operator not in CONDITION_JUMP_OPCODES:
+            raise NotImplementedError(f"LIR lowering for operator '{tree.operator}' not implemented.")
+        emitter.materialize(hir.result_var, selector.select(tree, NonTerminal.FLAGS))
+    elif isinstance(hir, IfOpHirLine):
+        if tree is not None:
+            emitter.lines.append(JumpLirLine.create_line(selector.select(tree, NonTerminal.FLAGS), hir.target_label))
+        elif hir.cond_var:
+            emitter.lines.append(JumpLirLine.create_line(LirLineType.JMP, hir.target_label))
+    elif isinstance(hir, GotoHirLine):
+        emitter.lines.append(JumpLirLine.create_line(LirLineType.JMP, hir.target_label))
+    elif isinstance(hir, LabelHirLine):
+        emitter.label(hir.label_name)
+    else:
+        raise NotImplementedError(f"LIR lowering for HIR line '{hir}' not implemented.")
+
+def generate_ir_low(hir_lines:list[HirLine], allocation:RegisterAllocation|None = None, symbol_table:SymbolTable|None = None, label_prefix:str = '.L') -> list[LirLine]:
+    if allocation is None:
+        allocation = allocate_registers(hir_lines, symbol_table)
+    emitter = LirEmitter(allocation, label_prefix, symbol_table)
+    selector = InstructionSelector(emitter)
+    for hir, tree in build_expression_trees(hir_lines):
+        lower_hir_line(emitter, selector, hir, tree)
+    return emitter.lines
 
 if __name__ == '__main__':
     test_hir_lines = [
@@ -24,4 +223,3 @@ if __name__ == '__main__':
     lir_lines = generate_ir_low(hir_lines)
     for lir in lir_lines:
         print(lir)
-        
\ No newline at end of file
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from entities.LirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from helpers.LirHelper import is_memory_operand, get_lir_reads, get_lir_writes
+
+class PeepholeContext:
+    def __init__(self, volatile:set[str]|None = None):
+        self.volatile = volatile if volatile is not None else set()
+
+    def is_volatile(self, operand:str) -> bool:
+        return operand.startswith('var:') and operand[4:] in self.volatile
+
+    def is_cacheable(self, operand:str) -> bool:
+        return is_memory_operand(operand) and not self.is_volatile(operand)
+
+
+class PeepholeRule:
+    """Rewrites the last `window` instructions; `match` returns the
+    replacement or None. Every rule must shrink the code or remove a memory
+    access so that rewriting terminates.
+    """
+    def __init__(self, name:str, window:int, match:Callable[[list[LirLine], PeepholeContext], list[LirLine]|None]):
+        self.name = name
+        self.window = window
+        self.match = match
+
+
+def _move(destination:str, source:str) -> MovLirLine:
+    return MovLirLine(f"{LirLineType.MOV} {destination} {source}")
+
+def _has_side_effects(lir:LirLine, context:PeepholeContext) -> bool:
+    if isinstance(lir, MovLirLine):
+        return is_memory_operand(lir.destination) or context.is_volatile(lir.source)
+    return not isinstance(lir, (LoadImmLirLine, AluLirLine, CmpLirLine))
+
+def _self_move(window, context):
+    # MOV RB RB
+    mov = window[0]
+    if isinstance(mov, MovLirLine) and mov.destination == mov.source and not is_memory_operand(mov.source):
+        return []
+    return None
+
+def _move_back(window, context):
+    # MOV RB RD; MOV RD RB -> MOV RB RD
+    first, second = window
+    if isinstance(first, MovLirLine) and isinstance(second, MovLirLine):
+        if first.destination == second.source and first.source == second.destination:
+            if all(not is_memory_operand(operand) or context.is_cacheable(operand) for operand in (first.destination, first.source)):
+                return [first]
+    return None
+
+def _store_reload(window, context):
+    # MOV var:x RB; MOV RD var:x -> MOV var:x RB; MOV RD RB
+    store, load = window
+    if isinstance(store, MovLirLine) and isinstance(load, MovLirLine):
+        if is_memory_operand(store.destination) and load.source == store.destination and context.is_cacheable(load.source):
+            return [store] if load.destination == store.source else [store, _move(load.destination, store.source)]
+    return None
+
+def _reload(window, context):
+    # MOV RB var:x; MOV RD var:x -> MOV RB var:x; MOV RD RB
+    first, second = window
+    if isinstance(first, MovLirLine) and isinstance(second, MovLirLine):
+        if is_memory_operand(first.source) and first.source == second.source and context.is_cacheable(first.source):
+            return [first] if first.destination == second.destination else [first, _move(second.destination, first.destination)]
+    return None
+
+def _overwritten_store(window, context):
+    # MOV var:x RB; MOV var:x RD -> MOV var:x RD
+    first, second = window
+    if isinstance(first, MovLirLine) and isinstance(second, MovLirLine):
+        if is_memory_operand(first.destination) and first.destination == second.destination and context.is_cacheable(first.destination):
+            return [second]
+    return None
+
+def _dead_write(window, context):
+    # LDI 3; LDI 4 -> LDI 4, and likewise for any write the next
+    # instruction overwrites without reading.
+    first, second = window
+    if _has_side_effects(first, context):
+        return None
+    writes = get_lir_writes(first)
+    if len(writes) != 1 or is_memory_operand(writes[0]):
+        return None
+    if writes[0] in get_lir_writes(second) and writes[0] not in get_lir_reads(second):
+        return [second]
+    return None
+
+def _move_chain(window, context):
+    # MOV RB RD; MOV RA RB; <overwrites RB> -> MOV RA RD; <overwrites RB>
+    first, second, third = window
+    if not (isinstance(first, MovLirLine) and isinstance(second, MovLirLine)):
+        return None
+    middle = first.destination
+    if is_memory_operand(middle) or second.source != middle or second.destination == middle or first.source == middle:
+        return None
+    if is_memory_operand(first.source) and is_memory_operand(second.destination):
+        return None
+    if _has_side_effects(first, context) or isinstance(third, LabelLirLine):
+        return None
+    if middle in get_lir_writes(third) and middle not in get_lir_reads(third):
+        return [_move(second.destination, first.source), third]
+    return None
+
+def _unreachable(window, context):
+    # Nothing after an unconditional jump runs until the next label.
+    jump, following = window
+    if isinstance(jump, JumpLirLine) and jump.type == LirLineType.JMP and not isinstance(following, LabelLirLine):
+        return [jump]
+    return None
+
+def _jump_to_next(window, context):
+    jump, label = window
+    if isinstance(jump, JumpLirLine) and isinstance(label, LabelLirLine) and jump.target_label == label.label_name:
+        return [label]
+    return None
+
+PEEPHOLE_RULES = [
+    PeepholeRule('self_move', 1, _self_move),
+    PeepholeRule('move_back', 2, _move_back),
+    PeepholeRule('store_reload', 2, _store_reload),
+    PeepholeRule('reload', 2, _reload),
+    PeepholeRule('overwritten_store', 2, _overwritten_store),
+    PeepholeRule('dead_write', 2, _dead_write),
+    PeepholeRule('move_chain', 3, _move_chain),
+    PeepholeRule('unreachable', 2, _unreachable),
+    PeepholeRule('jump_to_next', 2, _jump_to_next),
+]
+
+
+class PeepholeOptimizer:
+    """Sliding-window rewriting over a stack of emitted instructions.
+
+    Each instruction is pushed once and rules are tried against the top of
+    the stack until none applies. A rewrite only touches the top, so the
+    work is linear in the program length times the rule table size.
+    """
+    def __init__(self, rules:list[PeepholeRule]|None = None, context:PeepholeContext|None = None):
+        self.rules = list(rules) if rules is not None else list(PEEPHOLE_RULES)
+        self.context = context if context is not None else PeepholeContext()
+        self.applied: dict[str, int] = {}
+
+    def add_rule(self, rule:PeepholeRule):
+        self.rules.append(rule)
+
+    def _reduce(self, stack:list[LirLine]):
+        changed = True
+        while changed and stack:
+            changed = False
+            for rule in self.rules:
+                if len(stack) < rule.window:
+                    continue
+                replacement = rule.match(stack[-rule.window:], self.context)
+                if replacement is None:
+                    continue
+                del stack[-rule.window:]
+                self.applied[rule.name] = self.applied.get(rule.name, 0) + 1
+                # Replacements go back through the rules one at a time so
+                # they can combine with what is below them.
+                for lir in replacement:
+                    stack.append(lir)
+                    self._reduce(stack)
+                changed = True
+                break
+
+    def run_pass(self, lir_lines:list[LirLine]) -> list[LirLine]:
+        stack: list[LirLine] = []
+        for lir in lir_lines:
+            stack.append(lir)
+            self._reduce(stack)
+        return stack
+
+    def optimize(self, lir_lines:list[LirLine]) -> list[LirLine]:
+        optimized = self.run_pass(lir_lines)
+        # Dropping labels no jump refers to anymore can expose more windows.
+        targets = {lir.target_label for lir in optimized if isinstance(lir, JumpLirLine)}
+        pruned = [lir for lir in optimized if not isinstance(lir, LabelLirLine) or lir.label_name in targets]
+        if len(pruned) != len(optimized):
+            optimized = self.run_pass(pruned)
+        return optimized
+
+
+def get_volatile_variables(symbol_table:SymbolTable|None) -> set[str]:
+    if symbol_table is None:
+        return set()
+    return {name for name, symbol in symbol_table.items() if symbol.qualifier == SymbolQualifier.VOLATILE}
+
+def optimize_lir(lir_lines:list[LirLine], symbol_table:SymbolTable|None = None) -> list[LirLine]:
+    return PeepholeOptimizer(context=PeepholeContext(get_volatile_variables(symbol_table))).optimize(lir_lines)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.ControlFlowGraph import ControlFlowGraph, BasicBlock, NaturalLoop
+from modules.DataFlow import Liveness
+
+class LoopInvariantCodeMotion:
+    """Hoists loop-invariant computations into the loop's preheader.
+
+    Loops come from `ControlFlowGraph.natural_loops`, outermost first, so a
+    line invariant in several nested loops moves as far out as it can. The
+    preheader is the spot right before the header's label, which only works
+    when the one way into the loop is falling through from the block laid
+    out before it; loops entered otherwise are left alone.
+
+    A line moves when it is the only definition of its variable in the
+    loop, every operand is defined outside the loop or by a line already
+    moved, the variable is not live into the header (every read in the loop
+    follows the definition) and the definition runs before any exit, unless
+    the variable is dead at every exit. Volatile variables never move and
+    are never invariant. When the loop calls a function, globals are
+    neither moved nor treated as invariant.
+    """
+    def __init__(self, cfg:ControlFlowGraph, liveness:Liveness, symbol_table:SymbolTable|None = None):
+        self.cfg = cfg
+        self.liveness = liveness
+        self.symbol_table = symbol_table
+        self.hoisted: dict[BasicBlock, list[HirLine]] = {}
+        self._moved: set[int] = set()
+
+    def is_volatile(self, var_name:str) -> bool:
+        if self.symbol_table is None:
+            return False
+        symbol = self.symbol_table.get(var_name)
+        return symbol is not None and symbol.qualifier == SymbolQualifier.VOLATILE
+
+    def has_preheader(self, loop:NaturalLoop) -> bool:
+        outside = [pred for pred in loop.header.predecessors if pred not in loop]
+        if not outside:
+            return loop.header is self.cfg.entry
+        if len(outside) != 1:
+            return False
+        previous = outside[0]
+        if self.cfg.fallthrough(previous) is not loop.header:
+            return False
+        terminator = previous.terminator
+        return terminator is None or terminator.target_label != loop.header.label
+
+    def _is_live(self, block:BasicBlock, var_name:str, at_entry:bool = True) -> bool:
+        bits = self.liveness.in_bits if at_entry else self.liveness.out_bits
+        return var_name in self.liveness.index and bool(bits.get(block, 0) & self.liveness.index.bit(var_name))
+
+    def visit_loop(self, loop:NaturalLoop):
+        blocks = [block for block in self.cfg.reverse_postorder() if block in loop]
+        defs: dict[str, int] = {}
+        calls = False
+        for block in blocks:
+            for hir in block.lines:
+                defined = hir.defined_var()
+                if defined is not None:
+                    defs[defined] = defs.get(defined, 0) + 1
+                calls |= isinstance(hir, CallHirLine)
+        exits = loop.exits()
+        exiting = {source for source, _ in exits}
+
+        def is_invariant_operand(var:str) -> bool:
+            if self.is_volatile(var):
+                return False
+            if var in invariant:
+                return True
+            return var not in defs and (var.startswith('.t') or not calls)
+
+        invariant: set[str] = set()
+        hoisted: list[HirLine] = []
+        changed = True
+        while changed:
+            changed = False
+            for block in blocks:
+                for hir in block.lines:
+                    if id(hir) in self._moved:
+                        continue
+                    if not isinstance(hir, (AssignmentHirLine, ArithmeticOpHirLine, UnaryOpHirLine)):
+                        continue
+                    if isinstance(hir, UnaryOpHirLine) and hir.operator == 'not':
+                        # Materializes a 0/1 value; left next to its jump.
+                        continue
+                    defined = hir.defined_var()
+                    if defs[defined] != 1 or self.is_volatile(defined):
+                        continue
+                    if calls and not defined.startswith('.t'):
+                        continue
+                    if not all(is_invariant_operand(var) for var in hir.used_vars()):
+                        continue
+                    if self._is_live(loop.header, defined):
+                        continue
+                    if not all(self.cfg.dominates(block, source) for source in exiting):
+                        if any(self._is_live(target, defined) for _, target in exits):
+                            continue
+                    invariant.add(defined)
+                    hoisted.append(hir)
+                    self._moved.add(id(hir))
+                    changed = True
+        if hoisted:
+            self.hoisted[loop.header] = hoisted
+
+    def run(self) -> LoopInvariantCodeMotion:
+        for loop in self.cfg.natural_loops():
+            if self.has_preheader(loop):
+                self.visit_loop(loop)
+        return self
+
+    def rewrite(self) -> list[HirLine]:
+        hir_lines = []
+        for block in self.cfg.blocks:
+            hir_lines.extend(self.hoisted.get(block, ()))
+            if block.label is not None and (not block.lines or not isinstance(block.lines[0], LabelHirLine)):
+                hir_lines.append(LabelHirLine(block.label))
+            hir_lines.extend(hir for hir in block.lines if id(hir) not in self._moved)
+        return hir_lines
+
+
+def hoist_loop_invariants(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, cfg:ControlFlowGraph|None = None, liveness:Liveness|None = None) -> list[HirLine]:
+    cfg = cfg if cfg is not None else ControlFlowGraph(hir_lines)
+    liveness = liveness if liveness is not None else Liveness(cfg)
+    licm = LoopInvariantCodeMotion(cfg, liveness, symbol_table).run()
+    if not licm.hoisted:
+        return hir_lines
+    return licm.rewrite()
@@ -1,7 +1,12 @@
 from __future__ import annotations
+from bisect import bisect_left, insort
 from enum import StrEnum, Enum
 from dataclasses import dataclass
-from modules.SymbolTableGen import SymbolTable, SymbolScope, SymbolType, SymbolKind
+from typing import TYPE_CHECKING
+from modules.SymbolTableGen import SymbolTable, SymbolType, SymbolKind
+
+if TYPE_CHECKING:
+    from modules.MemoryOverlay import OverlayPlan
 
 @dataclass
 class VariableType:
@@ -9,14 +14,128 @@ class VariableType:
     size:int = 0
     is_signed:bool = False
     scope:str = '' # 'static', 'local', 'global'
+    alignment:int = 1
 
 class AddressType(StrEnum):
     STATIC = 'static'
     STACK = 'stack'
+    OVERLAY = 'overlay'
 
 class VariableTypes:
     char = VariableType(name='char', size=1, is_signed=False)
-    int = VariableType(name='int', size=2, is_signed=True)
+    int = VariableType(name='int', size=2, is_signed=True, alignment=2)
+
+def get_variable_type(symbol_type:SymbolType) -> VariableType:
+    if symbol_type == SymbolType.CHAR:
+        return VariableTypes.char
+    elif symbol_type == SymbolType.INT:
+        return VariableTypes.int
+    raise NotImplementedError(f"Variable type '{symbol_type}' not implemented in VariableManager.")
+
+class AllocationPolicy(StrEnum):
+    FIRST_FIT = 'first_fit'
+    BEST_FIT = 'best_fit'
+
+@dataclass
+class MemoryStats:
+    total:int = 0
+    used:int = 0
+    free:int = 0
+    free_blocks:int = 0
+    largest_free_block:int = 0
+
+    @property
+    def fragmentation(self) -> float:
+        # Share of free memory that cannot be handed out as one block.
+        if self.free == 0:
+            return 0.0
+        return 1 - self.largest_free_block / self.free
+
+class FreeListAllocator:
+    """Address-ordered free list over [start_address, end_address]."""
+    def __init__(self, start_address:int, end_address:int, policy:AllocationPolicy=AllocationPolicy.FIRST_FIT):
+        self.start_address = start_address
+        self.end_address = end_address
+        self.policy = policy
+        self.free_starts: list[int] = []
+        self.free_sizes: dict[int, int] = {}
+        self.allocations: dict[int, int] = {}
+        if end_address >= start_address:
+            self._insert_free(start_address, end_address - start_address + 1)
+
+    def _insert_free(self, start:int, size:int):
+        insort(self.free_starts, start)
+        self.free_sizes[start] = size
+
+    def _remove_free(self, start:int):
+        del self.free_starts[bisect_left(self.free_starts, start)]
+        del self.free_sizes[start]
+
+    @staticmethod
+    def _align(address:int, alignment:int) -> int:
+        return (address + alignment - 1) // alignment * alignment
+
+    def allocate(self, size:int, alignment:int = 1) -> int:
+        best_start = None
+        best_leftover = None
+        for start in self.free_starts:
+            block_size = self.free_sizes[start]
+            aligned = self._align(start, alignment)
+            leftover = start + block_size - (aligned + size)
+            if leftover < 0:
+                continue
+            if self.policy == AllocationPolicy.FIRST_FIT:
+                best_start = start
+                break
+            if best_leftover is None or leftover < best_leftover:
+                best_start, best_leftover = start, leftover
+                if leftover == 0:
+                    break
+        if best_start is None:
+            raise MemoryError("No empty addresses available.")
+
+        block_size = self.free_sizes[best_start]
+        aligned = self._align(best_start, alignment)
+        self._remove_free(best_start)
+        if aligned > best_start:
+            self._insert_free(best_start, aligned - best_start)
+        tail = best_start + block_size - (aligned + size)
+        if tail > 0:
+            self._insert_free(aligned + size, tail)
+        self.allocations[aligned] = size
+        return aligned
+
+    def free(self, address:int):
+        size = self.allocations.pop(address, None)
+        if size is None:
+            raise ValueError(f"Address {address:#04x} is not allocated.")
+        i = bisect_left(self.free_starts, address)
+        # Merge with the neighbouring free blocks so the list stays minimal.
+        if i < len(self.free_starts) and address + size == self.free_starts[i]:
+            following = self.free_starts[i]
+            size += self.free_sizes[following]
+            self._remove_free(following)
+        if i > 0:
+            previous = self.free_starts[i - 1]
+            if previous + self.free_sizes[previous] == address:
+                self.free_sizes[previous] += size
+                return
+        self._insert_free(address, size)
+
+    def is_free(self, address:int) -> bool:
+        i = bisect_left(self.free_starts, address + 1) - 1
+        return i >= 0 and address < self.free_starts[i] + self.free_sizes[self.free_starts[i]]
+
+    def stats(self) -> MemoryStats:
+        total = max(0, self.end_address - self.start_address + 1)
+        free = sum(self.free_sizes.values())
+        return MemoryStats(
+            total=total,
+            used=total - free,
+            free=free,
+            free_blocks=len(self.free_starts),
+            largest_free_block=max(self.free_sizes.values(), default=0),
+        )
 
 class VariableAddress():
     def __init__(self, address:int, address_type:AddressType):
@@ -30,26 +149,26 @@ class Variable:
         self.address = address
         self.scope = scope
     
+def qualified_name(function:str, var_name:str) -> str:
+    return f"{function}.{var_name}"
+
 class VariableManager:
-    def __init__(self, static_start_address:int=0, static_end_address:int=0x00FF):
+    def __init__(self, static_start_address:int=0, static_end_address:int=0x00FF, policy:AllocationPolicy=AllocationPolicy.FIRST_FIT):
         self.static_start_address = static_start_address
         self.static_end_address = static_end_address
         self.variables: dict[str, Variable] = {}
         self.addresses: dict[int, Variable] = {}
+        self.allocator = FreeListAllocator(static_start_address, static_end_address, policy)
+        self.overlay_base: int | None = None
     
-    def get_empty_address(self, size:int) -> int:
-        for addr in range(self.static_start_address, self.static_end_address - size + 1):
-            if all((addr + offset) not in self.addresses for offset in range(size)):
-                for offset in range(size):
-                    self.addresses[addr + offset] = None
-                return addr
-        raise MemoryError("No empty addresses available.")
+    def get_empty_address(self, size:int, alignment:int = 1) -> int:
+        return self.allocator.allocate(size, alignment)
         
     def create_variable(self, name:str, type:VariableType, addrType:AddressType=AddressType.STATIC)-> Variable:
         if name in self.variables:
             raise ValueError(f"Variable '{name}' already exists.")
         if addrType == AddressType.STATIC:
-            address = self.get_empty_address(type.size)
+            address = self.get_empty_address(type.size, type.alignment)
         else:
             raise NotImplementedError("Only STATIC address type is implemented.")
         var_address = VariableAddress(address, addrType)
@@ -57,32 +176,77 @@ class VariableManager:
         self.addresses[address] = self.variables[name]
         return self.variables[name] 
     
-    def get_variable(self, name:str) -> Variable | None:
+    def get_variable(self, name:str, function:str|None = None) -> Variable | None:
+        if function is not None:
+            var = self.variables.get(qualified_name(function, name))
+            if var is not None:
+                return var
         return self.variables.get(name, None)
     
+    def addresses_for(self, function:str) -> dict[str, int]:
+        # Names as the function's LIR uses them: its overlaid locals
+        # under their own name, everything else static.
+        addresses = {name: var.address.address for name, var in self.variables.items() if not var.scope}
+        prefix = qualified_name(function, '')
+        for name, var in self.variables.items():
+            if var.scope == function:
+                addresses[name[len(prefix):]] = var.address.address
+        return addresses
+
     def free_variable(self, name:str):
         var = self.variables.get(name, None)
         if var is None:
             raise ValueError(f"Variable '{name}' does not exist.")
-        for offset in range(var.type.size):
-            del self.addresses[var.address.address + offset]
+        self.allocator.free(var.address.address)
+        del self.addresses[var.address.address]
         del self.variables[name]
 
+    def get_memory_stats(self) -> MemoryStats:
+        return self.allocator.stats()
+
     def print_variables(self):
         for var_name, var in self.variables.items():
             print(f"Variable '{var_name}': Type={var.type.name}, Address={var.address.address:#04x}")
 
-    def load_symbol_table(self, symbol_table:SymbolTable):
-        for symbol_name, symbol in symbol_table.table.items():
+    def load_symbol_table(self, symbol_table:SymbolTable, overlay:OverlayPlan|None = None):
+        # Globals, and main's locals unless the overlay places them, get
+        # static homes under their own names, which name resolution keeps
+        # distinct. Other functions' locals only get one through the overlay.
+        symbol_table = symbol_table.root
+        overlaid = set()
+        if overlay is not None and 'main' in overlay.frames:
+            main_frame = overlay.frames['main']
+            overlaid = set(main_frame.offsets) | set(main_frame.dedicated)
+        main_scope = symbol_table.scopes.get('main')
+        main_locals = main_scope.table.items() if main_scope is not None else ()
+        for symbol_name, symbol in [*symbol_table.table.items(), *main_locals]:
             if symbol.kind != SymbolKind.VARIABLE:
                 continue
-            if symbol.scope == SymbolScope.GLOBAL:
-                if symbol.type == SymbolType.CHAR:
-                    self.create_variable(symbol_name, VariableTypes.char, AddressType.STATIC)
-                elif symbol.type == SymbolType.INT:
-                    self.create_variable(symbol_name, VariableTypes.int, AddressType.STATIC)
-                else:
-                    raise NotImplementedError(f"Variable type '{symbol.type}' not implemented in VariableManager.")
+            if symbol_name in overlaid:
+                continue
+            self.create_variable(symbol_name, get_variable_type(symbol.type), AddressType.STATIC)
+
+    def load_overlay(self, overlay:OverlayPlan):
+        # One static block holds every overlaid frame; variables inside it
+        # share addresses, so they are not tracked in `addresses`.
+        if overlay.region_size > 0:
+            self.overlay_base = self.get_empty_address(overlay.region_size, 2)
+        for function, frame in overlay.frames.items():
+            for var_name, offset in frame.offsets.items():
+                address = VariableAddress(self.overlay_base + frame.base + offset, AddressType.OVERLAY)
+                name = qualified_name(function, var_name)
+                self.variables[name] = Variable(name, frame.var_types[var_name], address, function)
+            for var_name, var_type in frame.dedicated.items():
+                name = qualified_name(function, var_name)
+                var = self.create_variable(name, var_type, AddressType.STATIC)
+                var.scope = function
+
+    def load_spilled_variables(self, spilled:set[str]):
+        # Temps the register allocator could not keep in RA/RB/RD get a
+        # static home like any other char.
+        for var_name in sorted(spilled):
+            if var_name not in self.variables:
+                self.create_variable(var_name, VariableTypes.char, AddressType.STATIC)
 
 if __name__ == '__main__':
     vm = VariableManager()
@@ -91,4 +255,5 @@ if __name__ == '__main__':
     vm.create_variable('var3', VariableTypes.int, AddressType.STATIC)
     vm.create_variable('var4', VariableTypes.int, AddressType.STATIC)
     for var_name, var in vm.variables.items():
-        print(f"Variable '{var_name}': Type={var.type.name}, Address={var.address:#04x}")
\ No newline at end of file
+        print(f"Variable '{var_name}': Type={var.type.name}, Address={var.address.address:#04x}")
+    print(vm.get_memory_stats())
\ No newline at end of file
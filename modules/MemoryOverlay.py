@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from pycparser import c_ast
+from pycparser.c_ast import FileAST, FuncDef
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolQualifier
+from modules.ControlFlowGraph import ControlFlowGraph
+from modules.DataFlow import Liveness
+from modules.MemoryManager import VariableType, VariableTypes, get_variable_type
+from modules.SymbolTableGen import create_variable_symbol, get_local_declarations, SymbolScope
+
+class _CallCollector(c_ast.NodeVisitor):
+    def __init__(self):
+        self.callees: set[str] = set()
+
+    def visit_FuncCall(self, node:c_ast.FuncCall):
+        if isinstance(node.name, c_ast.ID):
+            self.callees.add(node.name.name)
+        self.generic_visit(node)
+
+def build_call_graph(ast:FileAST) -> dict[str, set[str]]:
+    call_graph: dict[str, set[str]] = {}
+    for ext in ast.ext:
+        if isinstance(ext, FuncDef):
+            collector = _CallCollector()
+            collector.visit(ext.body)
+            call_graph[ext.decl.name] = collector.callees
+    defined = set(call_graph)
+    # Calls to functions without a body (library/extern) have no frame.
+    return {func: callees & defined for func, callees in call_graph.items()}
+
+def find_recursive_functions(call_graph:dict[str, set[str]]) -> set[str]:
+    # Tarjan's SCC: members of a cycle (or self-callers) cannot use a
+    # compiled stack because two activations would share one frame.
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    recursive: set[str] = set()
+    counter = 0
+    for root in sorted(call_graph):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(call_graph[root])))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            func, callees = work[-1]
+            for callee in callees:
+                if callee not in index:
+                    index[callee] = lowlink[callee] = counter
+                    counter += 1
+                    stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(sorted(call_graph[callee]))))
+                    break
+                if callee in on_stack:
+                    lowlink[func] = min(lowlink[func], index[callee])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[func])
+                if lowlink[func] == index[func]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == func:
+                            break
+                    if len(component) > 1 or func in call_graph[func]:
+                        recursive.update(component)
+    return recursive
+
+def get_function_locals(func_def:FuncDef) -> dict[str, tuple[VariableType, bool]]:
+    # name -> (type, is_volatile)
+    local_vars = {}
+    for decl in get_local_declarations(func_def):
+        symbol = create_variable_symbol(decl, SymbolScope.LOCAL)
+        local_vars[symbol.name] = (get_variable_type(symbol.type), symbol.qualifier == SymbolQualifier.VOLATILE)
+    return local_vars
+
+
+class FunctionFrame:
+    def __init__(self, function:str):
+        self.function = function
+        self.base = 0
+        self.size = 0
+        self.offsets: dict[str, int] = {}
+        self.var_types: dict[str, VariableType] = {}
+        self.dedicated: dict[str, VariableType] = {}
+
+    @property
+    def alignment(self) -> int:
+        return max((var_type.alignment for var_type in self.var_types.values()), default=1)
+
+    @property
+    def unshared_size(self) -> int:
+        return sum(var_type.size for var_type in self.var_types.values())
+
+    @property
+    def saved(self) -> int:
+        return self.unshared_size - self.size
+
+
+class OverlayPlan:
+    def __init__(self):
+        self.frames: dict[str, FunctionFrame] = {}
+        self.region_size = 0
+        self.recursive: set[str] = set()
+
+    @property
+    def saved(self) -> int:
+        return sum(frame.unshared_size for frame in self.frames.values()) - self.region_size
+
+    def report(self) -> list[dict]:
+        return [{
+            'function': frame.function,
+            'base': frame.base,
+            'frame_size': frame.size,
+            'unshared_size': frame.unshared_size,
+            'saved': frame.saved,
+        } for frame in self.frames.values()]
+
+    def print_report(self):
+        for row in self.report():
+            print(f"Function '{row['function']}': Base={row['base']:#04x}, Frame={row['frame_size']}B, Unshared={row['unshared_size']}B, Saved={row['saved']}B")
+        print(f"Overlay region: {self.region_size}B, Saved in total: {self.saved}B")
+
+
+def build_lifetime_interference(hir_lines:list[HirLine], variables:set[str], exit_live:set[str]) -> dict[str, set[str]]:
+    cfg = ControlFlowGraph(hir_lines)
+    liveness = Liveness(cfg, exit_live)
+    interference: dict[str, set[str]] = {var: set() for var in variables}
+    tracked = liveness.index.mask(var for var in variables if var in liveness.index)
+
+    # Anything live on entry (read before written) is live at the same time.
+    entry_live = [var for var in liveness.index.keys_of(liveness.in_bits.get(cfg.entry, 0) & tracked)]
+    for var in entry_live:
+        interference[var].update(other for other in entry_live if other != var)
+
+    for block in cfg.reverse_postorder():
+        for hir, live_out in zip(block.lines, liveness.line_live_out(block)):
+            defined = hir.defined_var()
+            if defined not in interference:
+                continue
+            copy_source = hir.value if isinstance(hir, AssignmentHirLine) else None
+            for var in liveness.index.keys_of(live_out & tracked):
+                if var != defined and var != copy_source:
+                    interference[defined].add(var)
+                    interference[var].add(defined)
+    return interference
+
+def _align(offset:int, alignment:int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+def plan_function_frame(function:str, hir_lines:list[HirLine], var_types:dict[str, VariableType], exit_live:set[str]) -> FunctionFrame:
+    frame = FunctionFrame(function)
+    frame.var_types = dict(var_types)
+    interference = build_lifetime_interference(hir_lines, set(var_types), exit_live)
+    first_seen: dict[str, int] = {}
+    for position, hir in enumerate(hir_lines):
+        for var in (hir.defined_var(), *hir.used_vars()):
+            if var in var_types and var not in first_seen:
+                first_seen[var] = position
+
+    # Largest first, then in program order: first-fit into byte offsets not
+    # held by an interfering variable.
+    order = sorted(var_types, key=lambda var: (-var_types[var].size, first_seen.get(var, len(hir_lines)), var))
+    for var in order:
+        var_type = var_types[var]
+        busy = sorted(
+            (frame.offsets[other], frame.offsets[other] + var_types[other].size)
+            for other in interference.get(var, ()) if other in frame.offsets
+        )
+        offset = 0
+        for start, end in busy:
+            if offset + var_type.size <= start:
+                break
+            offset = max(offset, _align(end, var_type.alignment))
+        frame.offsets[var] = offset
+        frame.size = max(frame.size, offset + var_type.size)
+    return frame
+
+def plan_overlay(ast:FileAST, function_hir:dict[str, list[HirLine]], memory_temps:dict[str, set[str]]|None = None, root:str = 'main') -> OverlayPlan:
+    """Overlays locals (and memory-resident temps) of non-recursive functions.
+
+    `memory_temps` names, per function, the temps that live in memory after
+    register allocation; when omitted every temp is assumed to.
+    """
+    plan = OverlayPlan()
+    call_graph = build_call_graph(ast)
+    plan.recursive = find_recursive_functions(call_graph)
+    func_defs = {ext.decl.name: ext for ext in ast.ext if isinstance(ext, FuncDef)}
+
+    for function, hir_lines in function_hir.items():
+        if function not in func_defs or function in plan.recursive:
+            continue
+        local_vars = get_function_locals(func_defs[function])
+        var_types: dict[str, VariableType] = {}
+        dedicated: dict[str, VariableType] = {}
+        for name, (var_type, is_volatile) in local_vars.items():
+            (dedicated if is_volatile else var_types)[name] = var_type
+        temps = memory_temps.get(function, set()) if memory_temps is not None else None
+        names = set()
+        for hir in hir_lines:
+            names.update(var for var in (hir.defined_var(), *hir.used_vars()) if var is not None)
+        for name in names:
+            if name.startswith('.t') and (temps is None or name in temps):
+                var_types[name] = VariableTypes.char
+        exit_live = {name for name in names if name not in local_vars and not name.startswith('.t')}
+        frame = plan_function_frame(function, hir_lines, var_types, exit_live)
+        frame.dedicated = dedicated
+        plan.frames[function] = frame
+
+    # Compiled stack: a callee frame starts above every caller frame, so
+    # only functions that are never active together share bytes.
+    def place_tree(tree_root:str, base:int, placed:set[str]) -> int:
+        reachable, stack = [], [tree_root]
+        seen = {tree_root}
+        while stack:
+            func = stack.pop()
+            reachable.append(func)
+            for callee in sorted(call_graph.get(func, ())):
+                if callee not in seen and callee not in plan.recursive:
+                    seen.add(callee)
+                    stack.append(callee)
+        indegree = {func: 0 for func in reachable}
+        for func in reachable:
+            for callee in call_graph.get(func, ()):
+                if callee in indegree:
+                    indegree[callee] += 1
+        ready = [tree_root]
+        end = base
+        bases = {tree_root: base}
+        while ready:
+            func = ready.pop()
+            frame = plan.frames.get(func)
+            if func not in placed and frame is not None:
+                frame.base = _align(bases[func], frame.alignment)
+                placed.add(func)
+            func_end = (frame.base + frame.size) if frame is not None else bases[func]
+            end = max(end, func_end)
+            for callee in sorted(call_graph.get(func, ())):
+                if callee not in indegree:
+                    continue
+                bases[callee] = max(bases.get(callee, base), func_end)
+                indegree[callee] -= 1
+                if indegree[callee] == 0:
+                    ready.append(callee)
+        return end
+
+    placed: set[str] = set()
+    region_end = 0
+    if root in call_graph and root not in plan.recursive:
+        region_end = place_tree(root, 0, placed)
+    # Other entry points (uncalled functions, e.g. handlers) get their own
+    # space above the main tree since they may run at any time.
+    called = set().union(*call_graph.values()) if call_graph else set()
+    for function in sorted(plan.frames):
+        if function not in placed and function not in called:
+            region_end = place_tree(function, region_end, placed)
+    for function in sorted(plan.frames):
+        if function not in placed:
+            frame = plan.frames[function]
+            frame.base = _align(region_end, frame.alignment)
+            region_end = frame.base + frame.size
+            placed.add(function)
+    plan.region_size = region_end
+    return plan
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Callable, Any
+
+from entities.HirLine import HirLine
+from entities.SymbolTable import SymbolTable
+
+def count_temps(hir_lines:list[HirLine]) -> int:
+    temps = set()
+    for hir in hir_lines:
+        for var in (hir.defined_var(), *hir.used_vars()):
+            if var is not None and var.startswith('.t'):
+                temps.add(var)
+    return len(temps)
+
+def lines_changed(before:list[HirLine], after:list[HirLine]) -> bool:
+    # Passes build new lines instead of mutating them, so a line that is
+    # still the same object is unchanged and only new ones are rendered.
+    if len(before) != len(after):
+        return True
+    return any(old is not new and old.render() != new.render() for old, new in zip(before, after))
+
+
+class PassState:
+    """The IR being optimized plus lazily built analyses over it.
+    `label_prefix` starts the names of labels that passes create.
+    Passes must return new lines rather than mutate the ones they get.
+    """
+    def __init__(self, hir_lines:list[HirLine], symbol_table:SymbolTable, manager:PassManager, label_prefix:str = '.L'):
+        self.hir_lines = hir_lines
+        self.symbol_table = symbol_table
+        self.manager = manager
+        self.label_prefix = label_prefix
+        self.analyses: dict[str, Any] = {}
+        self.results: dict[str, Any] = {}
+        self._temp_count: int | None = None
+
+    @property
+    def temp_count(self) -> int:
+        if self._temp_count is None:
+            self._temp_count = count_temps(self.hir_lines)
+        return self._temp_count
+
+    def set_lines(self, hir_lines:list[HirLine]):
+        self.hir_lines = hir_lines
+        self._temp_count = None
+
+    def analysis(self, name:str):
+        if name not in self.analyses:
+            self.analyses[name] = self.manager.analyses[name].build(self)
+        return self.analyses[name]
+
+    def invalidate(self, names:set[str]):
+        for name in names:
+            self.analyses.pop(name, None)
+
+
+class Analysis:
+    def __init__(self, name:str, build:Callable[[PassState], Any], depends:tuple[str, ...] = ()):
+        self.name = name
+        self.build = build
+        self.depends = depends
+
+
+class HirPass:
+    """`requires` are analyses the pass reads, `after` are passes that must
+    run before it in the same group and `invalidates` are the analyses left
+    stale when it changes the IR (None means all of them).
+    """
+    def __init__(self, name:str, run:Callable[[PassState], list[HirLine]], requires:tuple[str, ...] = (), after:tuple[str, ...] = (), invalidates:tuple[str, ...]|None = None):
+        self.name = name
+        self.run = run
+        self.requires = requires
+        self.after = after
+        self.invalidates = invalidates
+
+
+class PassGroup:
+    def __init__(self, name:str, passes:list[str], fixed_point:bool = True, max_iterations:int = 8):
+        self.name = name
+        self.passes = passes
+        self.fixed_point = fixed_point
+        self.max_iterations = max_iterations
+
+
+@dataclass
+class PassStats:
+    name: str
+    group: str
+    iteration: int
+    start: float
+    wall_time: float
+    allocated_blocks: int
+    peak_bytes: int | None
+    instructions_in: int
+    instructions_out: int
+    temps_removed: int
+    changed: bool
+
+
+class PassManager:
+    def __init__(self):
+        self.analyses: dict[str, Analysis] = {}
+        self.passes: dict[str, HirPass] = {}
+        self.groups: list[PassGroup] = []
+        self.stats: list[PassStats] = []
+        self._origin = time.perf_counter()
+
+    def register_analysis(self, analysis:Analysis):
+        self.analyses[analysis.name] = analysis
+
+    def register(self, hir_pass:HirPass):
+        for name in hir_pass.requires:
+            if name not in self.analyses:
+                raise ValueError(f"Pass '{hir_pass.name}' requires unknown analysis '{name}'.")
+        self.passes[hir_pass.name] = hir_pass
+
+    def add_group(self, group:PassGroup):
+        for name in group.passes:
+            if name not in self.passes:
+                raise ValueError(f"Pass group '{group.name}' contains unknown pass '{name}'.")
+        self.groups.append(group)
+
+    def _dependents(self, names:set[str]) -> set[str]:
+        # Invalidating an analysis also invalidates everything built on it.
+        closure = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for analysis in self.analyses.values():
+                if analysis.name not in closure and closure.intersection(analysis.depends):
+                    closure.add(analysis.name)
+                    changed = True
+        return closure
+
+    def schedule(self, group:PassGroup) -> list[HirPass]:
+        # Stable topological order over `after`; declaration order breaks ties.
+        members = set(group.passes)
+        ordered: list[HirPass] = []
+        placed: set[str] = set()
+        while len(ordered) < len(group.passes):
+            progress = False
+            for name in group.passes:
+                if name in placed:
+                    continue
+                if all(dep in placed or dep not in members for dep in self.passes[name].after):
+                    ordered.append(self.passes[name])
+                    placed.add(name)
+                    progress = True
+            if not progress:
+                raise ValueError(f"Pass group '{group.name}' has a dependency cycle.")
+        return ordered
+
+    def run_pass(self, hir_pass:HirPass, state:PassState, group:str, iteration:int) -> bool:
+        before = list(state.hir_lines)
+        temps_before = state.temp_count
+        for name in hir_pass.requires:
+            state.analysis(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base_bytes = tracemalloc.get_traced_memory()[0]
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        after = hir_pass.run(state)
+        wall_time = time.perf_counter() - start
+        allocated_blocks = sys.getallocatedblocks() - blocks
+        peak_bytes = tracemalloc.get_traced_memory()[1] - base_bytes if tracing else None
+
+        changed = lines_changed(before, after)
+        if changed:
+            state.set_lines(after)
+            invalidated = set(self.analyses) if hir_pass.invalidates is None else set(hir_pass.invalidates)
+            state.invalidate(self._dependents(invalidated))
+        self.stats.append(PassStats(
+            name=hir_pass.name,
+            group=group,
+            iteration=iteration,
+            start=start - self._origin,
+            wall_time=wall_time,
+            allocated_blocks=allocated_blocks,
+            peak_bytes=peak_bytes,
+            instructions_in=len(before),
+            instructions_out=len(after),
+            temps_removed=temps_before - state.temp_count,
+            changed=changed,
+        ))
+        return changed
+
+    def run(self, hir_lines:list[HirLine], symbol_table:SymbolTable, label_prefix:str = '.L') -> PassState:
+        state = PassState(hir_lines, symbol_table, self, label_prefix)
+        for group in self.groups:
+            passes = self.schedule(group)
+            iterations = group.max_iterations if group.fixed_point else 1
+            for iteration in range(iterations):
+                changed = False
+                for hir_pass in passes:
+                    changed |= self.run_pass(hir_pass, state, group.name, iteration)
+                if not changed:
+                    break
+        return state
+
+    def as_dict(self):
+        return {'passes': [asdict(stats) for stats in self.stats]}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def to_chrome_trace(self) -> dict:
+        # Complete ('X') events in microseconds, loadable in chrome://tracing
+        # and Perfetto.
+        events = []
+        for stats in self.stats:
+            events.append({
+                'name': stats.name,
+                'cat': stats.group,
+                'ph': 'X',
+                'ts': round(stats.start * 1e6, 3),
+                'dur': round(stats.wall_time * 1e6, 3),
+                'pid': 1,
+                'tid': 1,
+                'args': {
+                    'iteration': stats.iteration,
+                    'allocated_blocks': stats.allocated_blocks,
+                    'peak_bytes': stats.peak_bytes,
+                    'instructions_in': stats.instructions_in,
+                    'instructions_out': stats.instructions_out,
+                    'temps_removed': stats.temps_removed,
+                    'changed': stats.changed,
+                },
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_json(self, filename:str):
+        with open(filename, 'w') as f:
+            f.write(self.to_json())
+
+    def write_chrome_trace(self, filename:str):
+        with open(filename, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
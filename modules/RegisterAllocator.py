@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolScope, SymbolQualifier
+from helpers.ArchitectureHelper import GENERAL_PURPOSE_REGISTERS_STR, IMMEDIATE_REGISTER_STR
+from helpers.LirHelper import find_fused_conditions, get_clobbered_registers
+from modules.ControlFlowGraph import ControlFlowGraph, BasicBlock
+from modules.DataFlow import Liveness
+
+LOOP_WEIGHT = 10
+
+class RegisterAllocation:
+    def __init__(self):
+        self.registers: dict[str, str] = {}
+        self.spilled: set[str] = set()
+        self.coalesced_moves = 0
+        self.rounds = 0
+
+    def get_register(self, var_name:str) -> str | None:
+        return self.registers.get(var_name)
+
+    def is_in_register(self, var_name:str) -> bool:
+        return var_name in self.registers
+
+    def as_dict(self):
+        return {
+            'registers': dict(self.registers),
+            'spilled': sorted(self.spilled),
+            'coalesced_moves': self.coalesced_moves,
+        }
+
+
+class InterferenceGraph:
+    def __init__(self, precoloured:list[str]):
+        self.precoloured = set(precoloured)
+        self.adjacency: dict[str, set[str]] = {reg: set() for reg in precoloured}
+        for reg in precoloured:
+            self.adjacency[reg] = set(precoloured) - {reg}
+        self.moves: dict[tuple[str, str], int] = {}
+        self.hints: dict[str, dict[str, int]] = {}
+        self.costs: dict[str, int] = {}
+
+    def add_node(self, node:str):
+        self.adjacency.setdefault(node, set())
+        self.costs.setdefault(node, 0)
+
+    def add_edge(self, a:str, b:str):
+        if a != b:
+            self.adjacency[a].add(b)
+            self.adjacency[b].add(a)
+
+    def interferes(self, a:str, b:str) -> bool:
+        return b in self.adjacency[a]
+
+    def add_move(self, a:str, b:str, weight:int):
+        key = (a, b) if a < b else (b, a)
+        self.moves[key] = self.moves.get(key, 0) + weight
+
+    def add_hint(self, node:str, register:str, weight:int):
+        hints = self.hints.setdefault(node, {})
+        hints[register] = hints.get(register, 0) + weight
+
+    def degree(self, node:str) -> int:
+        return len(self.adjacency[node])
+
+    def merge(self, keep:str, drop:str):
+        for neighbour in self.adjacency.pop(drop):
+            self.adjacency[neighbour].discard(drop)
+            self.add_edge(keep, neighbour)
+        self.costs[keep] = self.costs.get(keep, 0) + self.costs.pop(drop, 0)
+        for register, weight in self.hints.pop(drop, {}).items():
+            self.add_hint(keep, register, weight)
+
+
+def get_allocation_candidates(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None) -> set[str]:
+    # Temps never need a memory home. Locals qualify unless volatile; globals
+    # stay in memory because they must hold their value across calls.
+    candidates = set()
+    for hir in hir_lines:
+        for var in (hir.defined_var(), *hir.used_vars()):
+            if var is None or var in candidates:
+                continue
+            if var.startswith('.t'):
+                candidates.add(var)
+            elif symbol_table is not None:
+                symbol = symbol_table.get(var)
+                if symbol is not None and symbol.scope == SymbolScope.LOCAL and symbol.qualifier != SymbolQualifier.VOLATILE:
+                    candidates.add(var)
+    fused = find_fused_conditions(hir_lines)
+    for hir in hir_lines:
+        if id(hir) in fused:
+            candidates.discard(hir.result_var)
+    return candidates
+
+def build_interference_graph(cfg:ControlFlowGraph, liveness:Liveness, candidates:set[str], fused:set[int], block_weight:Callable[[BasicBlock], int]) -> InterferenceGraph:
+    registers = GENERAL_PURPOSE_REGISTERS_STR
+    graph = InterferenceGraph(registers)
+    for var in candidates:
+        graph.add_node(var)
+    is_memory = lambda operand: isinstance(operand, str) and operand not in candidates
+    candidate_bits = liveness.index.mask(var for var in candidates if var in liveness.index)
+
+    for block in cfg.reverse_postorder():
+        weight = block_weight(block)
+        live_outs = liveness.line_live_out(block)
+        for hir, live_out in zip(block.lines, live_outs):
+            defined = hir.defined_var()
+            live = set(liveness.index.keys_of(live_out & candidate_bits))
+            copy_source = None
+            if isinstance(hir, AssignmentHirLine) and isinstance(hir.value, str):
+                copy_source = hir.value
+
+            if defined in candidates:
+                graph.costs[defined] += weight
+                for var in live:
+                    if var != copy_source:
+                        graph.add_edge(defined, var)
+                if copy_source in candidates:
+                    graph.add_move(defined, copy_source, weight)
+                elif isinstance(hir, AssignmentHirLine) and hir.isConstant:
+                    graph.add_hint(defined, IMMEDIATE_REGISTER_STR, weight)
+            for var in hir.used_vars():
+                if var in candidates:
+                    graph.costs[var] += weight
+
+            clobbers, late_uses = get_clobbered_registers(hir, is_memory, id(hir) in fused)
+            if clobbers:
+                exposed = (live - {defined}) | {var for var in late_uses if var in candidates}
+                for var in exposed:
+                    for register in clobbers:
+                        graph.add_edge(var, register)
+    return graph
+
+def _find(alias:dict[str, str], node:str) -> str:
+    while node in alias:
+        node = alias[node]
+    return node
+
+def coalesce(graph:InterferenceGraph, k:int) -> dict[str, str]:
+    # Briggs' conservative test: merge only if the combined node has fewer
+    # than k neighbours of significant degree, so colourability is kept.
+    alias: dict[str, str] = {}
+    for (a, b), _ in sorted(graph.moves.items(), key=lambda item: -item[1]):
+        a, b = _find(alias, a), _find(alias, b)
+        if a == b or a in graph.precoloured or b in graph.precoloured:
+            continue
+        if graph.interferes(a, b):
+            continue
+        neighbours = graph.adjacency[a] | graph.adjacency[b]
+        significant = sum(1 for n in neighbours if n in graph.precoloured or graph.degree(n) >= k)
+        if significant >= k:
+            continue
+        graph.merge(a, b)
+        alias[b] = a
+    return alias
+
+def colour_graph(graph:InterferenceGraph, registers:list[str], move_partners:dict[str, set[str]]) -> tuple[dict[str, str], set[str]]:
+    k = len(registers)
+    degrees = {node: graph.degree(node) for node in graph.adjacency if node not in graph.precoloured}
+    remaining = set(degrees)
+    low = sorted((node for node in remaining if degrees[node] < k), reverse=True)
+    stack = []
+    while remaining:
+        if low:
+            node = low.pop()
+            if node not in remaining:
+                continue
+        else:
+            # Optimistic spill candidate: cheapest per unit of interference.
+            node = min(remaining, key=lambda n: (graph.costs.get(n, 0) / (degrees[n] + 1), n))
+        remaining.discard(node)
+        stack.append(node)
+        for neighbour in sorted(graph.adjacency[node]):
+            if neighbour in remaining:
+                degrees[neighbour] -= 1
+                if degrees[neighbour] == k - 1:
+                    low.append(neighbour)
+
+    # Without a preference, RA (the LDI target) is the last register picked.
+    default_order = [reg for reg in registers if reg != IMMEDIATE_REGISTER_STR] + [IMMEDIATE_REGISTER_STR]
+    colours: dict[str, str] = {reg: reg for reg in graph.precoloured}
+    spilled = set()
+    while stack:
+        node = stack.pop()
+        taken = {colours[n] for n in graph.adjacency[node] if n in colours}
+        free = [reg for reg in default_order if reg not in taken]
+        if not free:
+            spilled.add(node)
+            continue
+        preference = dict(graph.hints.get(node, {}))
+        for partner in move_partners.get(node, ()):
+            if partner in colours:
+                preference[colours[partner]] = preference.get(colours[partner], 0) + 1
+        colours[node] = max(free, key=lambda reg: (preference.get(reg, 0), -default_order.index(reg)))
+    return colours, spilled
+
+def allocate_registers(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, block_weight:Callable[[BasicBlock], int]|None = None) -> RegisterAllocation:
+    registers = GENERAL_PURPOSE_REGISTERS_STR
+    cfg = ControlFlowGraph(hir_lines)
+    if block_weight is None:
+        # Uses inside a loop count once per iteration.
+        depths = cfg.loop_depths()
+        block_weight = lambda block: LOOP_WEIGHT ** depths[block]
+    liveness = Liveness(cfg)
+    fused = find_fused_conditions(hir_lines)
+    candidates = get_allocation_candidates(hir_lines, symbol_table)
+    allocation = RegisterAllocation()
+
+    # Spilling a candidate moves it to memory, which can change the scratch
+    # registers other lines need, so rebuild until nothing new spills.
+    while True:
+        allocation.rounds += 1
+        graph = build_interference_graph(cfg, liveness, candidates, fused, block_weight)
+        move_partners: dict[str, set[str]] = {}
+        for a, b in graph.moves:
+            move_partners.setdefault(a, set()).add(b)
+            move_partners.setdefault(b, set()).add(a)
+        alias = coalesce(graph, len(registers))
+        colours, spilled = colour_graph(graph, registers, move_partners)
+        if not spilled:
+            break
+        spilled_vars = {var for var in candidates if _find(alias, var) in spilled}
+        allocation.spilled |= spilled_vars
+        candidates -= spilled_vars
+
+    allocation.coalesced_moves = len(alias)
+    for var in candidates:
+        allocation.registers[var] = colours[_find(alias, var)]
+    return allocation
@@ -11,9 +11,10 @@ class RegisterContent:
     def __init__(self, content_type:RegisterContentType, value:int|None = None, variable_name:str|None = None):
         if content_type == RegisterContentType.EMPTY:
             self.content_type = RegisterContentType.EMPTY
-            value = None
+            self.value = None
+            self.variable_name = None
         elif content_type == RegisterContentType.CONSTANT:
-            if not value:
+            if value is None:
                 raise ValueError("Constant register content must have a value.")
             if value > REGISTER_MAX_VALUE:
                 raise ValueError(f"Constant value {value} exceeds max register value {REGISTER_MAX_VALUE}.")
@@ -42,6 +43,14 @@ class RegisterContent:
         else:
             raise ValueError("Invalid register content type.")
 
+    def __eq__(self, other):
+        if not isinstance(other, RegisterContent):
+            return NotImplemented
+        return (self.content_type, self.value, self.variable_name) == (other.content_type, other.value, other.variable_name)
+
+    def __hash__(self):
+        return hash((self.content_type, self.value, self.variable_name))
+
 
 class Register():
     def __init__(self, name:str):
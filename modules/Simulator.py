@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+from entities.LirLine import LirLine, LirLineType, ALU_OPCODES, JUMP_OPCODES
+from helpers.ArchitectureHelper import ALL_REGISTERS_STR, IMMEDIATE_REGISTER_STR, ALU_LEFT_REGISTER_STR, ALU_RESULT_REGISTER_STR, INSTRUCTION_CYCLES, JCC_NOT_TAKEN_CYCLES, INSTRUCTION_BYTES, DATA_MEMORY_SIZE
+from modules.MemoryManager import VariableManager
+
+_REGISTER_INDEX = {name: i for i, name in enumerate(ALL_REGISTERS_STR)}
+_RA = _REGISTER_INDEX[IMMEDIATE_REGISTER_STR]
+_RD = _REGISTER_INDEX[ALU_LEFT_REGISTER_STR]
+_ACC = _REGISTER_INDEX[ALU_RESULT_REGISTER_STR]
+_MARL, _MARH = _REGISTER_INDEX['MARL'], _REGISTER_INDEX['MARH']
+_PRL, _PRH = _REGISTER_INDEX['PRL'], _REGISTER_INDEX['PRH']
+_PCL, _PCH = _REGISTER_INDEX['PCL'], _REGISTER_INDEX['PCH']
+
+_ALU_FUNCTIONS = {
+    LirLineType.ADD: lambda a, b: (a + b) & 0xFF,
+    LirLineType.SUB: lambda a, b: (a - b) & 0xFF,
+    LirLineType.AND: lambda a, b: a & b,
+    LirLineType.OR: lambda a, b: a | b,
+    LirLineType.XOR: lambda a, b: a ^ b,
+}
+
+# Jump condition on the signed difference RD - source left by CMP.
+_JUMP_CONDITIONS = {
+    LirLineType.JMP: None,
+    LirLineType.JEQ: lambda d: d == 0,
+    LirLineType.JNE: lambda d: d != 0,
+    LirLineType.JLT: lambda d: d < 0,
+    LirLineType.JGT: lambda d: d > 0,
+    LirLineType.JLE: lambda d: d <= 0,
+    LirLineType.JGE: lambda d: d >= 0,
+}
+
+def get_variable_addresses(vm:VariableManager) -> dict[str, int]:
+    return {name: var.address.address for name, var in vm.variables.items()}
+
+
+class DecodedInstruction:
+    __slots__ = ('text', 'kind', 'address', 'size')
+
+    def __init__(self, text:str, kind:str, address:int):
+        self.text = text
+        self.kind = kind
+        self.address = address
+        self.size = INSTRUCTION_BYTES[kind]
+
+
+class SimulationResult:
+    def __init__(self, program:list[DecodedInstruction], counts:list[int], taken:list[int], registers:list[int], memory:bytearray, addresses:dict[str, int]):
+        self.program = program
+        self.counts = counts
+        self.taken = taken
+        self.registers = {name: registers[i] for name, i in _REGISTER_INDEX.items()}
+        self.memory = memory
+        self.addresses = addresses
+
+    @property
+    def steps(self) -> int:
+        return sum(self.counts)
+
+    def instruction_cycles(self) -> list[int]:
+        cycles = []
+        for instruction, count, taken in zip(self.program, self.counts, self.taken):
+            if instruction.kind == 'JCC':
+                cycles.append(taken * INSTRUCTION_CYCLES['JCC'] + (count - taken) * JCC_NOT_TAKEN_CYCLES)
+            else:
+                cycles.append(count * INSTRUCTION_CYCLES[instruction.kind])
+        return cycles
+
+    @property
+    def cycles(self) -> int:
+        return sum(self.instruction_cycles())
+
+    @property
+    def loads(self) -> int:
+        return sum(count for instruction, count in zip(self.program, self.counts) if instruction.kind == 'LOAD')
+
+    @property
+    def stores(self) -> int:
+        return sum(count for instruction, count in zip(self.program, self.counts) if instruction.kind == 'STORE')
+
+    @property
+    def code_size(self) -> int:
+        return sum(instruction.size for instruction in self.program)
+
+    @property
+    def variables(self) -> dict[str, int]:
+        return {name: self.memory[address] for name, address in self.addresses.items()}
+
+    def profile(self) -> list[dict]:
+        return [{
+            'address': instruction.address,
+            'instruction': instruction.text,
+            'executions': count,
+            'cycles': cycles,
+        } for instruction, count, cycles in zip(self.program, self.counts, self.instruction_cycles())]
+
+    def as_dict(self):
+        return {
+            'steps': self.steps,
+            'cycles': self.cycles,
+            'loads': self.loads,
+            'stores': self.stores,
+            'code_size': self.code_size,
+            'registers': self.registers,
+            'variables': self.variables,
+        }
+
+
+class Simulator:
+    """Cycle counting simulator for LIR and assembled ArniComp code.
+
+    The program is decoded once into one closure per instruction, so a step
+    is a list lookup and a call. Memory operands are either `var:name`
+    (LIR, resolved through `addresses`) or a direct `[address]`; accessing
+    memory leaves the address in MARL/MARH and taking a jump leaves the
+    target in PRL/PRH.
+    """
+    def __init__(self, lines:list[LirLine|str], addresses:dict[str, int]|None = None, memory_size:int = DATA_MEMORY_SIZE):
+        self.addresses: dict[str, int] = dict(addresses) if addresses is not None else {}
+        self._auto_addresses = addresses is None
+        self.memory_size = memory_size
+        self.registers = [0] * len(ALL_REGISTERS_STR)
+        self.memory = bytearray(memory_size)
+        self.flags = [0]
+        self.program: list[DecodedInstruction] = []
+        self.ops: list = []
+        self.taken: list[int] = []
+        self._decode([str(line) for line in lines])
+
+    def _memory_address(self, operand:str) -> int | None:
+        if operand.startswith('var:'):
+            name = operand[4:]
+            if name not in self.addresses:
+                if not self._auto_addresses:
+                    raise ValueError(f"No address for variable '{name}'.")
+                self.addresses[name] = len(self.addresses)
+            return self.addresses[name]
+        if operand.startswith('[') and operand.endswith(']'):
+            return int(operand[1:-1], 0)
+        return None
+
+    def _register(self, operand:str) -> int:
+        if operand not in _REGISTER_INDEX:
+            raise ValueError(f"Unknown register '{operand}'.")
+        return _REGISTER_INDEX[operand]
+
+    def _decode(self, lines:list[str]):
+        instructions: list[list[str]] = []
+        labels: dict[str, int] = {}
+        for line in lines:
+            line = line.split(';', 1)[0].strip()
+            if not line:
+                continue
+            if line.endswith(':') and len(line.split()) == 1:
+                labels[line[:-1]] = len(instructions)
+                continue
+            instructions.append(line.split())
+
+        address = 0
+        for splitted in instructions:
+            kind = self._kind(splitted)
+            self.program.append(DecodedInstruction(' '.join(splitted), kind, address))
+            address += INSTRUCTION_BYTES[kind]
+        end_address = address
+        self.end_address = end_address
+        self.taken = [0] * len(instructions)
+        for index, splitted in enumerate(instructions):
+            self.ops.append(self._compile(index, splitted, labels))
+
+    def _kind(self, splitted:list[str]) -> str:
+        opcode = splitted[0]
+        if opcode == LirLineType.LDI:
+            return 'LDI'
+        if opcode == LirLineType.MOV:
+            if self._memory_address(splitted[1]) is not None:
+                return 'STORE'
+            if self._memory_address(splitted[2]) is not None:
+                return 'LOAD'
+            return 'MOV'
+        if opcode in ALU_OPCODES:
+            return 'ALU'
+        if opcode == LirLineType.CMP:
+            return 'CMP'
+        if opcode == LirLineType.JMP:
+            return 'JMP'
+        if opcode in JUMP_OPCODES:
+            return 'JCC'
+        raise NotImplementedError(f"Simulation of '{' '.join(splitted)}' not implemented.")
+
+    def _compile(self, index:int, splitted:list[str], labels:dict[str, int]):
+        regs = self.registers
+        memory = self.memory
+        flags = self.flags
+        kind = self.program[index].kind
+        next_index = index + 1
+        opcode = splitted[0]
+
+        if kind == 'LDI':
+            value = int(splitted[1], 0) & 0xFF
+            def op():
+                regs[_RA] = value
+                return next_index
+        elif kind == 'MOV':
+            destination = self._register(splitted[1])
+            if splitted[2] in ('PCL', 'PCH'):
+                pc = self.program[index].address
+                value = pc & 0xFF if splitted[2] == 'PCL' else (pc >> 8) & 0xFF
+                def op():
+                    regs[destination] = value
+                    return next_index
+            else:
+                source = self._register(splitted[2])
+                def op():
+                    regs[destination] = regs[source]
+                    return next_index
+        elif kind == 'LOAD':
+            destination = self._register(splitted[1])
+            address = self._memory_address(splitted[2])
+            low, high = address & 0xFF, (address >> 8) & 0xFF
+            def op():
+                regs[destination] = memory[address]
+                regs[_MARL] = low
+                regs[_MARH] = high
+                return next_index
+        elif kind == 'STORE':
+            source = self._register(splitted[2])
+            address = self._memory_address(splitted[1])
+            low, high = address & 0xFF, (address >> 8) & 0xFF
+            def op():
+                memory[address] = regs[source]
+                regs[_MARL] = low
+                regs[_MARH] = high
+                return next_index
+        elif kind == 'ALU':
+            function = _ALU_FUNCTIONS[opcode]
+            source = self._register(splitted[1])
+            def op():
+                regs[_ACC] = function(regs[_RD], regs[source])
+                return next_index
+        elif kind == 'CMP':
+            source = self._register(splitted[1])
+            def op():
+                flags[0] = regs[_RD] - regs[source]
+                return next_index
+        else:
+            target_label = splitted[1]
+            if target_label not in labels:
+                raise ValueError(f"Unknown jump target '{target_label}'.")
+            target = labels[target_label]
+            target_address = self.program[target].address if target < len(self.program) else self.end_address
+            low, high = target_address & 0xFF, (target_address >> 8) & 0xFF
+            taken = self.taken
+            condition = _JUMP_CONDITIONS[opcode]
+            if condition is None:
+                def op():
+                    regs[_PRL] = low
+                    regs[_PRH] = high
+                    return target
+            else:
+                def op():
+                    regs[_PRL] = low
+                    regs[_PRH] = high
+                    if condition(flags[0]):
+                        taken[index] += 1
+                        return target
+                    return next_index
+        return op
+
+    def load_variables(self, values:dict[str, int]):
+        for name, value in values.items():
+            if name not in self.addresses:
+                if not self._auto_addresses:
+                    raise ValueError(f"No address for variable '{name}'.")
+                self.addresses[name] = len(self.addresses)
+            self.memory[self.addresses[name]] = value & 0xFF
+
+    def run(self, max_steps:int = 1_000_000) -> SimulationResult:
+        ops = self.ops
+        count = len(ops)
+        counts = [0] * count
+        self.taken[:] = [0] * count
+        pc = 0
+        steps = 0
+        while pc < count:
+            counts[pc] += 1
+            pc = ops[pc]()
+            steps += 1
+            if steps >= max_steps:
+                raise RuntimeError(f"Simulation did not finish within {max_steps} steps.")
+        final_address = self.program[pc].address if pc < count else self.end_address
+        self.registers[_PCL] = final_address & 0xFF
+        self.registers[_PCH] = (final_address >> 8) & 0xFF
+        return SimulationResult(self.program, counts, list(self.taken), self.registers, self.memory, self.addresses)
+
+
+if __name__ == '__main__':
+    program = [
+        "LDI 5",
+        "MOV RD RA",
+        "LDI 3",
+        "ADD RA",
+        "MOV var:x ACC",
+    ]
+    result = Simulator(program).run()
+    print(result.as_dict())
+    for row in result.profile():
+        print(row)
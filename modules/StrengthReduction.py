@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import count
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.Config import REGISTER_MAX_VALUE
+
+# Leaves of a multiplication chain: the multiplicand and the constant 0.
+CHAIN_OPERAND = ('x',)
+CHAIN_ZERO = ('0',)
+
+ChainNode = tuple
+
+@lru_cache(maxsize=None)
+def multiplication_chain(factor:int) -> tuple[int, ChainNode]:
+    """Cheapest tree of + and - computing x * factor in 8 bits, as
+    (operation count, tree). Doubling is t + t, so shifts are included.
+
+    The search is memoized over the 256 factors and tries, for each one,
+    the binary step (factor/2 doubled, factor-1 plus x, factor+1 minus x),
+    factoring out 2^k+1 or 2^k-1 and, above 128, negating 256-factor.
+    Every candidate recurses towards a smaller factor or into the lower
+    half, so there are no cycles.
+    """
+    factor &= REGISTER_MAX_VALUE
+    if factor == 0:
+        return 0, CHAIN_ZERO
+    if factor == 1:
+        return 0, CHAIN_OPERAND
+    candidates = []
+    if factor % 2 == 0:
+        cost, node = multiplication_chain(factor // 2)
+        candidates.append((cost + 1, ('+', node, node)))
+    else:
+        cost, node = multiplication_chain(factor - 1)
+        candidates.append((cost + 1, ('+', node, CHAIN_OPERAND)))
+        if factor == REGISTER_MAX_VALUE:
+            candidates.append((1, ('-', CHAIN_ZERO, CHAIN_OPERAND)))
+        else:
+            cost, node = multiplication_chain(factor + 1)
+            candidates.append((cost + 1, ('-', node, CHAIN_OPERAND)))
+        for shift in range(1, 8):
+            for divisor, operator in ((1 << shift) + 1, '+'), ((1 << shift) - 1, '-'):
+                if divisor > 1 and factor != divisor and factor % divisor == 0:
+                    cost, node = multiplication_chain(factor // divisor)
+                    shifted = node
+                    for _ in range(shift):
+                        shifted = ('+', shifted, shifted)
+                    candidates.append((cost + shift + 1, (operator, shifted, node)))
+    if factor > 128:
+        cost, node = multiplication_chain(256 - factor)
+        candidates.append((cost + 1, ('-', CHAIN_ZERO, node)))
+    return min(candidates, key=lambda candidate: candidate[0])
+
+def _is_power_of_two(value:int) -> bool:
+    return value > 0 and value & (value - 1) == 0
+
+
+class StrengthReducer:
+    """Rewrites *, /, %, << and >> with a constant operand into +, -, & and
+    compares, since the ALU has neither a multiplier nor a shifter.
+
+    Multiplications and left shifts become the chain from
+    `multiplication_chain`. Modulo by a power of two is a mask. Other
+    divisions are unrolled restoring division: one compare and subtract
+    per quotient bit the divisor leaves room for, from the highest down.
+    Values are unsigned 8-bit, as everywhere else in the backend.
+    """
+    def __init__(self, hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, label_prefix:str = '.L'):
+        self.hir_lines = hir_lines
+        self.symbol_table = symbol_table
+        self.label_prefix = label_prefix
+        temps = [0]
+        self.labels: set[str] = set()
+        for hir in hir_lines:
+            for var in (hir.defined_var(), *hir.used_vars()):
+                if var is not None and var.startswith('.t') and var[2:].isdigit():
+                    temps.append(int(var[2:]) + 1)
+            if isinstance(hir, LabelHirLine):
+                self.labels.add(hir.label_name)
+        self._temps = count(max(temps))
+        self._labels = count()
+
+    def is_volatile(self, var_name:str) -> bool:
+        if self.symbol_table is None:
+            return False
+        symbol = self.symbol_table.get(var_name)
+        return symbol is not None and symbol.qualifier == SymbolQualifier.VOLATILE
+
+    def new_temp(self) -> str:
+        return f".t{next(self._temps)}"
+
+    def new_label(self) -> str:
+        label = f"{self.label_prefix}div{next(self._labels)}"
+        while label in self.labels:
+            label = f"{self.label_prefix}div{next(self._labels)}"
+        self.labels.add(label)
+        return label
+
+    def multiply(self, result:str, operand:Operand, factor:int) -> list[HirLine]:
+        _, tree = multiplication_chain(factor)
+        lines: list[HirLine] = []
+        if isinstance(operand, str) and self.is_volatile(operand):
+            # The chain reads its operand more than once.
+            copy = self.new_temp()
+            lines.append(AssignmentHirLine(copy, operand))
+            operand = copy
+        values: dict[ChainNode, Operand] = {CHAIN_OPERAND: operand, CHAIN_ZERO: 0}
+
+        def emit(node:ChainNode) -> Operand:
+            value = values.get(node)
+            if value is None:
+                operator, left, right = node
+                left, right = emit(left), emit(right)
+                value = values[node] = self.new_temp()
+                lines.append(ArithmeticOpHirLine(value, left, operator, right))
+            return value
+
+        value = emit(tree)
+        if lines and lines[-1].defined_var() == value:
+            lines[-1] = lines[-1].rename({value: result})
+        else:
+            lines.append(AssignmentHirLine(result, value))
+        return lines
+
+    def divide(self, result:str, dividend:Operand, divisor:int, remainder_only:bool) -> list[HirLine]:
+        divisor &= REGISTER_MAX_VALUE
+        if divisor == 0:
+            # Matches constant folding, which defines x / 0 and x % 0 as 0.
+            return [AssignmentHirLine(result, 0)]
+        if divisor == 1:
+            return [AssignmentHirLine(result, 0 if remainder_only else dividend)]
+        if remainder_only and _is_power_of_two(divisor):
+            return [ArithmeticOpHirLine(result, dividend, '&', divisor - 1)]
+        remainder = self.new_temp()
+        lines: list[HirLine] = [AssignmentHirLine(remainder, dividend)]
+        quotient = None
+        if not remainder_only:
+            quotient = self.new_temp()
+            lines.append(AssignmentHirLine(quotient, 0))
+        shift = 0
+        while divisor << (shift + 1) <= REGISTER_MAX_VALUE:
+            shift += 1
+        for bit in range(shift, -1, -1):
+            step = divisor << bit
+            below = self.new_temp()
+            skip = self.new_label()
+            lines.append(ConditionalOpHirLine(below, remainder, '<', step))
+            lines.append(IfOpHirLine(below, skip))
+            lines.append(ArithmeticOpHirLine(remainder, remainder, '-', step))
+            if quotient is not None:
+                lines.append(ArithmeticOpHirLine(quotient, quotient, '+', 1 << bit))
+            lines.append(LabelHirLine(skip))
+        lines.append(AssignmentHirLine(result, remainder if remainder_only else quotient))
+        return lines
+
+    def reduce_line(self, hir:HirLine) -> list[HirLine] | None:
+        if not isinstance(hir, ArithmeticOpHirLine):
+            return None
+        left, operator, right = hir.left_operand, hir.operator, hir.right_operand
+        if operator == '*':
+            if isinstance(right, int):
+                return self.multiply(hir.result_var, left, right)
+            if isinstance(left, int):
+                return self.multiply(hir.result_var, right, left)
+        elif not isinstance(right, int):
+            return None
+        elif operator == '<<':
+            return self.multiply(hir.result_var, left, 1 << right if 0 <= right < 8 else 0)
+        elif operator == '>>':
+            return self.divide(hir.result_var, left, 1 << right if 0 <= right < 8 else 256, False)
+        elif operator in ('/', '%'):
+            return self.divide(hir.result_var, left, right, operator == '%')
+        return None
+
+    def run(self) -> list[HirLine]:
+        reduced = []
+        for hir in self.hir_lines:
+            lines = self.reduce_line(hir)
+            if lines is None:
+                reduced.append(hir)
+            else:
+                reduced.extend(lines)
+        return reduced
+
+
+def reduce_strength(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, label_prefix:str = '.L') -> list[HirLine]:
+    return StrengthReducer(hir_lines, symbol_table, label_prefix).run()
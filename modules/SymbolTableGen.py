@@ -1,7 +1,11 @@
 from enum import StrEnum
+from pycparser import c_ast
 from pycparser.c_ast import FileAST,FuncDef, Decl, Constant
 
 from entities.SymbolTable import *
+from helpers.TraceHelper import get_tracer, TraceLevel, TraceCategory
+
+_trace = get_tracer(TraceCategory.SYMBOLS)
 
 def get_function_return_type(func_def:FuncDef) -> SymbolType:
     type_str = func_def.decl.type.type.type.names[0]
@@ -31,22 +35,157 @@ def create_variable_symbol(decl:Decl, scope:SymbolScope) -> Symbol:
     )
     return var_symbol
 
+class _LocalNameResolver:
+    """Walks the statements of a function with its block scopes and
+    collects the local declarations, nested blocks and for-loop headers
+    included.
+
+    With `reserved` (the global names) it also resolves them: the HIR has
+    no scopes, so a local that would shadow a global or another local of
+    the function is renamed to `name.N`, along with every identifier bound
+    to it. Expressions are only walked while such a local is in scope.
+    """
+    def __init__(self, reserved:set[str]|None = None):
+        self.reserved = reserved
+        self.decls: list[Decl] = []
+        self.used: set[str] = set()
+        self.scopes: list[dict[str, str]] = []
+        self.renamed = 0
+
+    def lookup(self, name:str) -> str | None:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def push(self):
+        self.scopes.append({})
+
+    def pop(self):
+        scope = self.scopes.pop()
+        if self.renamed:
+            self.renamed -= sum(1 for name, unique in scope.items() if name != unique)
+
+    def declare(self, decl:Decl):
+        if not isinstance(decl.type, c_ast.TypeDecl):
+            return
+        self.decls.append(decl)
+        if self.reserved is None:
+            return
+        name = unique = decl.name
+        counter = 0
+        while unique in self.used or unique in self.reserved:
+            counter += 1
+            unique = f"{name}.{counter}"
+        self.used.add(unique)
+        self.scopes[-1][name] = unique
+        if unique != name:
+            decl.name = decl.type.declname = unique
+            self.renamed += 1
+        self.expression(decl.init)
+
+    def expression(self, node:c_ast.Node|None):
+        if node is None or not self.renamed:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, c_ast.ID):
+                unique = self.lookup(node.name)
+                if unique is not None:
+                    node.name = unique
+            else:
+                stack.extend(child for _, child in node.children())
+
+    def statement(self, node:c_ast.Node|None):
+        if node is None:
+            return
+        handler = _STATEMENT_HANDLERS.get(type(node))
+        if handler is None:
+            self.expression(node)
+        else:
+            handler(self, node)
+
+    def compound(self, node:c_ast.Compound):
+        self.push()
+        for item in node.block_items or []:
+            self.statement(item)
+        self.pop()
+
+    def decl_list(self, node:c_ast.DeclList):
+        for decl in node.decls:
+            self.declare(decl)
+
+    def if_statement(self, node:c_ast.If):
+        self.expression(node.cond)
+        self.statement(node.iftrue)
+        self.statement(node.iffalse)
+
+    def loop(self, node:c_ast.While|c_ast.DoWhile|c_ast.Switch):
+        self.expression(node.cond)
+        self.statement(node.stmt)
+
+    def for_loop(self, node:c_ast.For):
+        # Names declared in the header are scoped to the loop.
+        self.push()
+        self.statement(node.init)
+        self.expression(node.cond)
+        self.expression(node.next)
+        self.statement(node.stmt)
+        self.pop()
+
+    def case(self, node:c_ast.Case|c_ast.Default):
+        self.expression(getattr(node, 'expr', None))
+        for item in node.stmts or []:
+            self.statement(item)
+
+    def label(self, node:c_ast.Label):
+        self.statement(node.stmt)
+
+    def function(self, func_def:FuncDef) -> list[Decl]:
+        self.statement(func_def.body)
+        return self.decls
+
+_STATEMENT_HANDLERS = {
+    c_ast.Compound: _LocalNameResolver.compound,
+    c_ast.Decl: _LocalNameResolver.declare,
+    c_ast.DeclList: _LocalNameResolver.decl_list,
+    c_ast.If: _LocalNameResolver.if_statement,
+    c_ast.While: _LocalNameResolver.loop,
+    c_ast.DoWhile: _LocalNameResolver.loop,
+    c_ast.Switch: _LocalNameResolver.loop,
+    c_ast.For: _LocalNameResolver.for_loop,
+    c_ast.Case: _LocalNameResolver.case,
+    c_ast.Default: _LocalNameResolver.case,
+    c_ast.Label: _LocalNameResolver.label,
+}
+
+def get_local_declarations(func_def:FuncDef) -> list[Decl]:
+    return _LocalNameResolver().function(func_def)
+
+def resolve_local_names(func_def:FuncDef, global_names:set[str]) -> list[Decl]:
+    """Renames the function's shadowing locals in place, see
+    `_LocalNameResolver`, and returns its local declarations.
+    """
+    return _LocalNameResolver(global_names).function(func_def)
+
 def generate_symbol_table(ast:FileAST)  -> SymbolTable:
+    """Builds the global scope and one scope per function. Locals are
+    resolved first, so their names in the AST, and in the HIR generated
+    from it, are unique within the function.
+    """
     symbol_table = SymbolTable()
+    func_defs = []
     for ext in ast.ext:
         if isinstance(ext, FuncDef):
             func_name = ext.decl.name
-
-            body = ext.body
-            for stmt in body.block_items:
-                if isinstance(stmt, Decl):
-                    var_symbol = create_variable_symbol(stmt, SymbolScope.GLOBAL if func_name == 'main' else SymbolScope.LOCAL)
-                    symbol_table.add_symbol(var_symbol)
+            func_defs.append(ext)
 
             if func_name == 'main':
                 continue
             func_return_type =  get_function_return_type(ext)
-            print("return type", func_return_type)
+            if _trace.info:
+                _trace.emit(TraceLevel.INFO, 'function', name=func_name, return_type=func_return_type.value)
             func_symbol = Symbol(
                 name=func_name,
                 kind=SymbolKind.FUNCTION,
@@ -58,9 +197,17 @@ def generate_symbol_table(ast:FileAST)  -> SymbolTable:
         elif isinstance(ext, Decl):
             var_symbol = create_variable_symbol(ext, SymbolScope.GLOBAL)
             symbol_table.add_symbol(var_symbol)
-            print(f"Variable: {var_symbol.name}")
+            if _trace.info:
+                _trace.emit(TraceLevel.INFO, 'variable', name=var_symbol.name, type=var_symbol.type.value)
         else:
-            print("Unknown external declaration")
-            print(type(ext))
+            if _trace.warning:
+                _trace.emit(TraceLevel.WARNING, 'unknown_external', node=type(ext).__name__)
+
+    # Function scopes come after every global, see SymbolTable.
+    global_names = set(symbol_table.table) | {func_def.decl.name for func_def in func_defs}
+    for func_def in func_defs:
+        function_scope = symbol_table.enter_scope(func_def.decl.name)
+        for decl in resolve_local_names(func_def, global_names):
+            function_scope.add_symbol(create_variable_symbol(decl, SymbolScope.LOCAL))
         
     return symbol_table
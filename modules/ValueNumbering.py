@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from itertools import count
+
+from entities.HirLine import *
+from entities.SymbolTable import SymbolTable, SymbolQualifier
+from modules.ControlFlowGraph import ControlFlowGraph, BasicBlock
+from modules.DefUseIndex import DefUseIndex
+
+_COMMUTATIVE_OPERATORS = frozenset(['+', '*', '&', '|', '^'])
+_MISSING = object()
+
+ValueNumber = int | tuple
+
+class ValueNumbering:
+    """Dominator-tree value numbering over non-SSA HIR.
+
+    Blocks are visited in dominator-tree preorder with scoped tables: one
+    from variables to the value number they currently hold, one from
+    expressions over value numbers to the value number and variable that
+    computed it. A block whose only predecessor is its immediate dominator
+    continues from the dominator's state; any other block first gives
+    fresh numbers to every variable assigned on a path from its dominator,
+    since those assignments are not on the dominator chain.
+
+    Volatile variables get a fresh number on every read, so expressions
+    over them never match.
+    """
+    def __init__(self, cfg:ControlFlowGraph, symbol_table:SymbolTable|None = None):
+        self.cfg = cfg
+        self.symbol_table = symbol_table
+        self._counter = count()
+        self.values: dict[str, ValueNumber] = {}
+        self.expressions: dict[tuple, tuple[ValueNumber, str]] = {}
+        self._entry_values: dict[str, ValueNumber] = {}
+        self._undo: list[tuple[dict, object, object]] = []
+        self.block_defs: dict[BasicBlock, set[str]] = {}
+        self.block_calls: set[BasicBlock] = set()
+        self.variables: set[str] = set()
+        for block in cfg.blocks:
+            defs = set()
+            for hir in block.lines:
+                defined = hir.defined_var()
+                if defined is not None:
+                    defs.add(defined)
+                self.variables.update(hir.used_vars())
+                if isinstance(hir, CallHirLine):
+                    self.block_calls.add(block)
+            self.block_defs[block] = defs
+            self.variables |= defs
+        self.redundant: dict[int, str] = {}
+
+    def is_volatile(self, var_name:str) -> bool:
+        if self.symbol_table is None:
+            return False
+        symbol = self.symbol_table.get(var_name)
+        return symbol is not None and symbol.qualifier == SymbolQualifier.VOLATILE
+
+    def fresh(self) -> ValueNumber:
+        return next(self._counter)
+
+    def _set(self, table:dict, key, value):
+        self._undo.append((table, key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def value_of(self, operand:Operand) -> ValueNumber:
+        if isinstance(operand, int):
+            return ('const', operand)
+        if self.is_volatile(operand):
+            return self.fresh()
+        value = self.values.get(operand)
+        if value is None:
+            # Not assigned on any path seen so far: the value it entered with.
+            value = self._entry_values.get(operand)
+            if value is None:
+                value = self._entry_values[operand] = self.fresh()
+        return value
+
+    def expression_key(self, hir:HirLine) -> tuple | None:
+        if isinstance(hir, ArithmeticOpHirLine):
+            operands = [hir.left_operand, hir.right_operand]
+        elif isinstance(hir, UnaryOpHirLine) and hir.operator != 'not':
+            operands = [hir.operand]
+        else:
+            # Comparisons are left alone: they lower into a CMP fused with
+            # the following jump, which is cheaper than keeping a 0/1 value.
+            return None
+        if any(isinstance(operand, str) and self.is_volatile(operand) for operand in operands):
+            return None
+        values = [self.value_of(operand) for operand in operands]
+        if hir.operator in _COMMUTATIVE_OPERATORS:
+            values.sort(key=repr)
+        return (hir.operator, *values)
+
+    def assign(self, var_name:str, value:ValueNumber):
+        self._set(self.values, var_name, value)
+
+    def clobber(self, variables:set[str]):
+        for var_name in variables:
+            self.assign(var_name, self.fresh())
+
+    def _region_defs(self, block:BasicBlock, idom:BasicBlock) -> set[str]:
+        # Variables assigned on some path idom -> block that avoids idom.
+        defs: set[str] = set()
+        calls = False
+        seen = {idom}
+        stack = list(block.predecessors)
+        while stack:
+            pred = stack.pop()
+            if pred in seen:
+                continue
+            seen.add(pred)
+            defs |= self.block_defs[pred]
+            calls |= pred in self.block_calls
+            stack.extend(pred.predecessors)
+        if calls:
+            defs |= self._call_clobbers()
+        return defs
+
+    def _call_clobbers(self) -> set[str]:
+        return {var for var in self.variables if not var.startswith('.t')}
+
+    def visit_block(self, block:BasicBlock):
+        for hir in block.lines:
+            defined = hir.defined_var()
+            if defined is None:
+                continue
+            key = self.expression_key(hir)
+            if key is not None:
+                entry = self.expressions.get(key)
+                if entry is not None and self.values.get(entry[1]) == entry[0] and entry[1] != defined:
+                    self.redundant[id(hir)] = entry[1]
+                    self.assign(defined, entry[0])
+                    continue
+                value = self.fresh()
+                self.assign(defined, value)
+                if not self.is_volatile(defined):
+                    self._set(self.expressions, key, (value, defined))
+            elif isinstance(hir, AssignmentHirLine) and not self.is_volatile(defined):
+                self.assign(defined, self.value_of(hir.value))
+            else:
+                if isinstance(hir, CallHirLine):
+                    # The callee may assign any global.
+                    self.clobber(self._call_clobbers())
+                self.assign(defined, self.fresh())
+
+    def run(self) -> dict[int, str]:
+        """Returns id(line) -> variable already holding the line's value."""
+        idom = self.cfg.immediate_dominators()
+        tree = self.cfg.dominator_tree()
+        entry = self.cfg.entry
+        # Blocks to visit, interleaved with undo-log marks to roll back to
+        # once a block's dominator subtree is done.
+        stack: list[BasicBlock | int] = [entry]
+        while stack:
+            block = stack.pop()
+            if isinstance(block, int):
+                self._rollback(block)
+                continue
+            stack.append(len(self._undo))
+            if block is not entry and block.predecessors != [idom[block]]:
+                self.clobber(self._region_defs(block, idom[block]))
+            self.visit_block(block)
+            stack.extend(reversed(tree[block]))
+        return self.redundant
+
+    def _rollback(self, mark:int):
+        while len(self._undo) > mark:
+            table, key, old = self._undo.pop()
+            if old is _MISSING:
+                del table[key]
+            else:
+                table[key] = old
+
+
+def eliminate_common_subexpressions(hir_lines:list[HirLine], symbol_table:SymbolTable|None = None, index:DefUseIndex|None = None, cfg:ControlFlowGraph|None = None) -> list[HirLine]:
+    """Replaces recomputed expressions with a copy of the variable that
+    already holds their value; copy propagation then removes the copy.
+    """
+    index = index if index is not None else DefUseIndex(hir_lines)
+    cfg = cfg if cfg is not None else ControlFlowGraph(hir_lines)
+    redundant = ValueNumbering(cfg, symbol_table).run()
+    if not redundant:
+        return hir_lines
+    for i, hir in list(index.items()):
+        holder = redundant.get(id(hir))
+        if holder is not None:
+            index.update_line(i, AssignmentHirLine(hir.defined_var(), holder))
+    return index.compact()
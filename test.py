@@ -1,17 +1,22 @@
 from __future__ import annotations
-import pycparser as pcp
 from pycparser.c_ast import FileAST
 
 from helpers.FileHelper import read_file
+from modules.FrontEnd import FrontEndService
+from modules.CompilationContext import CompilationContext
 from modules.SymbolTableGen import generate_symbol_table, SymbolTable
 from modules.MemoryManager import VariableManager
-from modules.HIRGen import generate_ir_high
+from modules.HIRGen import generate_ir_high, generate_functions_ir_high
+from modules.MemoryOverlay import plan_overlay
 from modules.LIRGen import generate_ir_low
+from modules.RegisterAllocator import allocate_registers
+from modules.AssemblyGen import generate_assembly
 
 from modules.HIROptimizer import optimize_hir
 from entities.HirLine import HirLine
 FILE_NAME = 'tests/define.c'
 PARSER_DEBUG = False
+EMIT_ASSEMBLY = True
 
 def create_symbol_table():
     pass
@@ -19,32 +24,46 @@ def create_symbol_table():
 
 
 def main():
-    parser = pcp.CParser(lex_optimize=True, yacc_optimize=True)
-    vm = VariableManager()
+    front_end = FrontEndService(debug=PARSER_DEBUG)
+    context = CompilationContext()
+    vm = context.variable_manager
     code = read_file(FILE_NAME)
     print(code)
-    ast:FileAST = parser.parse(code, debug=PARSER_DEBUG)
+    ast:FileAST = front_end.parse(code, FILE_NAME)
 
     symbol_table = generate_symbol_table(ast)
+    context.symbol_table = symbol_table
     vm.load_symbol_table(symbol_table)
     vm.print_variables()
     print(symbol_table.as_dict())
-    hir_lines =  generate_ir_high(ast)
+    hir_lines =  generate_ir_high(ast, context)
     print("---- HIR Lines ----")
     for line in hir_lines:
         print(line)
 
 
-    optimized_hir_lines = optimize_hir(hir_lines, symbol_table)
+    main_scope = symbol_table.scope('main')
+    optimized_hir_lines = optimize_hir(hir_lines, main_scope)
 
-    lir_lines = generate_ir_low(optimized_hir_lines)
+    allocation = allocate_registers(optimized_hir_lines, main_scope)
+    vm.load_spilled_variables(allocation.spilled)
+    lir_lines = generate_ir_low(optimized_hir_lines, allocation, main_scope)
     
     print("---- Optimized HIR Lines With Removed Temporaries ----")
     for line in optimized_hir_lines:
         print(line,'|', str(line.type))
     
-    
-    #lir_lines = generate_ir_low(optimized_hir_lines)
+    print("---- Register Allocation ----")
+    print(allocation.as_dict())
+    print("---- LIR Lines ----")
+    for line in lir_lines:
+        print(line)
+
+    if EMIT_ASSEMBLY:
+        addresses = {name: var.address.address for name, var in vm.variables.items()}
+        print("---- Assembly ----")
+        for line in generate_assembly(lir_lines, addresses, main_scope):
+            print(line)
 
 
 def lir_test():
@@ -57,5 +76,19 @@ def lir_test():
     for lir in lir_lines:
         print(lir)
 
+def overlay_test():
+    ast:FileAST = FrontEndService(debug=PARSER_DEBUG).parse_file(FILE_NAME)
+    symbol_table = generate_symbol_table(ast)
+
+    function_hir = {name: optimize_hir(lines, symbol_table.scope(name)) for name, lines in generate_functions_ir_high(ast).items()}
+    memory_temps = {name: allocate_registers(lines, symbol_table.scope(name)).spilled for name, lines in function_hir.items()}
+    overlay = plan_overlay(ast, function_hir, memory_temps)
+
+    vm = VariableManager()
+    vm.load_symbol_table(symbol_table, overlay)
+    vm.load_overlay(overlay)
+    vm.print_variables()
+    overlay.print_report()
+
 if __name__ == '__main__':
     lir_test()
\ No newline at end of file
@@ -0,0 +1,62 @@
+from modules.BatchDriver import compile_source, compile_files
+from modules.CompilationCache import FunctionCache
+from modules.CompilationContext import CompilationContext
+
+CODE = """char a;
+char b;
+void main(){
+    if(a >= 3){
+        b = a + 1;
+    }else{
+        b = a - 1;
+    }
+}
+"""
+
+
+def test_context_counters_are_per_instance():
+    first, second = CompilationContext(), CompilationContext()
+    assert [first.new_temp(), first.new_temp(), first.new_else_label(), first.new_if_label()] == ['.t0', '.t1', '.Lelse0', '.Lif0']
+    assert (second.new_temp(), second.new_else_label()) == ('.t0', '.Lelse0')
+
+def test_output_does_not_depend_on_earlier_units():
+    fresh = compile_source(CODE)
+    compile_source(CODE.replace("a >= 3", "a >= 4").replace("b = a - 1;", "b = a - 2;"))
+    again = compile_source(CODE)
+    assert again.hir == fresh.hir and again.lir == fresh.lir and again.variables == fresh.variables
+
+def test_given_context_receives_the_unit():
+    context = CompilationContext()
+    result = compile_source(CODE, context=context)
+    assert context.symbol_table.get('a') is not None
+    assert set(result.variables) <= set(context.variable_manager.variables)
+
+def test_given_context_names_the_temps_and_labels():
+    context = CompilationContext()
+    context.temp_counter = 40
+    result = compile_source(CODE, context=context, cache=FunctionCache())
+    assert context.temp_counter > 40
+    assert context.label_counters == {'else': 1, 'if': 1}
+    # Cached HIR is canonicalized, so the names do not leak into the output.
+    assert result.hir == compile_source(CODE, cache=FunctionCache()).hir
+
+def test_cached_functions_leave_the_context_untouched():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    context = CompilationContext()
+    compile_source(CODE, context=context, cache=cache)
+    assert context.temp_counter == 0 and context.label_counters == {}
+
+def test_batch_keeps_input_order_and_captures_errors(tmp_path):
+    paths = []
+    for i, code in enumerate([CODE, "void f(){}\n", CODE.replace("a + 1", "a + 5"), "void main({\n"]):
+        path = tmp_path / f"unit{i}.c"
+        path.write_text(code)
+        paths.append(str(path))
+    for max_workers in (1, 2):
+        results = compile_files(paths, max_workers=max_workers)
+        assert [result.filename for result in results] == paths
+        assert [result.ok for result in results] == [True, False, True, False]
+        assert results[1].error == "ValueError: No main function found."
+        assert results[0].lir == compile_source(CODE).lir
+        assert results[0].lir != results[2].lir
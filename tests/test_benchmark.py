@@ -0,0 +1,64 @@
+import pytest
+
+from modules.BatchDriver import compile_source
+from modules.Benchmark import ProgramShape, ProgramGenerator, STAGES, benchmark_shape, compare_to_baseline, fit_exponent, scale_shape
+
+
+def curve(exponent:float, timings:dict[str, float]) -> dict:
+    return {
+        'exponents': {stage: exponent for stage in STAGES},
+        'points': [{'factor': 4, 'timings': timings}],
+    }
+
+def test_generator_is_reproducible_and_seeded():
+    shape = ProgramShape(seed=3)
+    assert ProgramGenerator(shape).generate() == ProgramGenerator(shape).generate()
+    assert ProgramGenerator(ProgramShape(seed=4)).generate() != ProgramGenerator(shape).generate()
+
+def test_generated_program_has_the_requested_shape_and_compiles():
+    code = ProgramGenerator(ProgramShape(globals=3, ifs=2, functions=3, statements=2)).generate()
+    assert code.count("\nvoid ") == 3 and code.startswith("char g0 = ")
+    assert "void main(){" in code and code.count("if (") == 2 * 3
+    result = compile_source(code)
+    assert set(result.functions) == {'main', 'f0', 'f1'}
+
+def test_scale_shape():
+    shape = ProgramShape()
+    assert scale_shape(shape, 'functions', 3).functions == shape.functions * 3
+    grown = scale_shape(shape, 'size', 2)
+    assert (grown.ifs, grown.statements, grown.globals, grown.functions) == (shape.ifs * 2, shape.statements * 2, shape.globals * 2, shape.functions)
+
+def test_fit_exponent():
+    xs = [1, 2, 4, 8]
+    assert fit_exponent(xs, [3 * x for x in xs]) == pytest.approx(1.0)
+    assert fit_exponent(xs, [x * x for x in xs]) == pytest.approx(2.0)
+    assert fit_exponent([2], [4]) is None
+    assert fit_exponent([2, 2], [4, 5]) is None
+
+def test_baseline_comparison_flags_code_growth():
+    timings = {stage: 0.01 for stage in STAGES}
+    baseline = curve(1.0, timings)
+    baseline['points'][0].update(hir_lines=100, lir_lines=80, instructions=70, code_bytes=120)
+    result = curve(1.0, timings)
+    result['points'][0].update(hir_lines=90, lir_lines=80, instructions=72, code_bytes=120)
+    assert compare_to_baseline(result, baseline) == ["instructions: 72 vs baseline 70 at x4"]
+
+def test_baseline_comparison_ignores_timings_by_default():
+    timings = {stage: 0.01 for stage in STAGES}
+    baseline = curve(1.0, timings)
+    assert compare_to_baseline(curve(1.5, {**timings, 'optimize_hir': 0.05}), baseline) == []
+
+def test_baseline_comparison_flags_exponent_and_time():
+    timings = {stage: 0.01 for stage in STAGES}
+    baseline = curve(1.0, timings)
+    assert compare_to_baseline(curve(1.2, timings), baseline, check_timings=True) == []
+    steeper = compare_to_baseline(curve(1.5, timings), baseline, check_timings=True)
+    assert len(steeper) == len(STAGES) and steeper[0].startswith("parse: scaling exponent 1.50")
+    slower = compare_to_baseline(curve(1.0, {**timings, 'optimize_hir': 0.02}), baseline, check_timings=True)
+    assert slower == ["optimize_hir: 20.00ms vs baseline 10.00ms at x4"]
+
+def test_benchmark_point_counts_every_stage():
+    point = benchmark_shape(ProgramShape(ifs=1, functions=1, statements=1, globals=2), repeat=1)
+    assert set(point.timings) == set(STAGES)
+    assert point.hir_lines > 0 and point.lir_lines > 0 and point.peak_memory > 0
+    assert 0 < point.instructions <= point.lir_lines and point.code_bytes >= point.instructions
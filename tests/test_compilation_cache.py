@@ -0,0 +1,71 @@
+from modules.BatchDriver import compile_source
+from modules.CompilationCache import FunctionCache
+
+CODE = """char a = 1;
+char b = 2;
+void f0(){
+    char x = a;
+    a = x + 3;
+}
+void f1(){
+    b = b ^ 5;
+}
+void main(){
+    a = a + b;
+}
+"""
+
+
+def recompiled(code:str, cache:FunctionCache) -> dict[str, list[str]]:
+    return {name: function.recompiled for name, function in compile_source(code, cache=cache).functions.items()}
+
+def test_unchanged_unit_is_not_recompiled():
+    cache = FunctionCache()
+    first = compile_source(CODE, cache=cache)
+    assert all(function.recompiled == ['hir', 'lir', 'opt'] for function in first.functions.values())
+    second = compile_source(CODE, cache=cache)
+    assert all(function.recompiled == [] for function in second.functions.values())
+    for name in first.functions:
+        assert second.functions[name].lir == first.functions[name].lir
+    assert second.variables == first.variables
+
+def test_editing_one_function_only_recompiles_it():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    changes = recompiled(CODE.replace("b ^ 5", "b ^ 6"), cache)
+    assert changes == {'main': [], 'f0': [], 'f1': ['hir', 'lir', 'opt']}
+
+def test_moving_and_reformatting_functions_keeps_their_entries():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    f1 = CODE[CODE.index("void f1"):CODE.index("void main")]
+    moved = CODE.replace(f1, '').replace("void f0(){", f1.replace("    ", "  ") + "\nvoid f0(){")
+    assert recompiled(moved, cache) == {'main': [], 'f0': [], 'f1': []}
+
+def test_change_that_keeps_the_hir_stops_at_the_hir_stage():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    assert recompiled(CODE.replace("b = b ^ 5;", "b ^= 5;"), cache)['f1'] == ['hir']
+
+def test_global_qualifier_invalidates_its_readers():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    changes = recompiled(CODE.replace("char b = 2;", "volatile char b = 2;"), cache)
+    # f0 does not read b; main also holds the global initializers.
+    assert changes['f0'] == []
+    assert changes['f1'] == ['hir', 'lir', 'opt']
+    assert 'hir' in changes['main']
+
+def test_global_initializer_only_invalidates_main():
+    cache = FunctionCache()
+    compile_source(CODE, cache=cache)
+    changes = recompiled(CODE.replace("char a = 1;", "char a = 7;"), cache)
+    assert changes['f0'] == [] and changes['f1'] == []
+    assert 'hir' in changes['main']
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    compile_source(CODE, cache=FunctionCache(str(tmp_path)))
+    assert any(name.endswith('.json') for name in (path.name for path in tmp_path.iterdir()))
+    cache = FunctionCache(str(tmp_path))
+    assert all(stages == [] for stages in recompiled(CODE, cache).values())
+    assert cache.stats()['misses'] == {}
@@ -0,0 +1,60 @@
+import pycparser as pcp
+
+from entities.HirLine import HirLine
+from modules.BatchDriver import compile_source
+from modules.ConstantPropagation import propagate_constants
+from modules.Simulator import Simulator
+from modules.SymbolTableGen import generate_symbol_table
+
+IF_ELSE = ["c = x >= 3", "IF c GOTO .Lelse0", "y = 1", "GOTO .Lif0", ".Lelse0:", "y = 2", ".Lif0:", "z = y + 1"]
+
+
+def propagate(lines:list[str], symbol_table=None) -> list[str]:
+    return [str(hir) for hir in propagate_constants(HirLine.parse_hir_lines(lines), symbol_table)]
+
+def test_straight_line_folding_wraps_to_8_bits():
+    assert propagate(["x = 200", ".t0 = x + 100", "y = 3 < .t0", "z = neg 1"]) == ["x = 200", ".t0 = 44", "y = 1", "z = 255"]
+
+def test_constant_branch_removes_the_unreachable_block():
+    assert propagate(["x = 3", *IF_ELSE]) == ["x = 3", "c = 1", ".Lelse0:", "y = 2", ".Lif0:", "z = 3"]
+    assert propagate(["x = 1", *IF_ELSE]) == ["x = 1", "c = 0", "y = 1", ".Lif0:", "z = 2"]
+
+def test_join_keeps_only_values_equal_on_every_path():
+    assert propagate(["x = a", *IF_ELSE]) == ["x = a", *IF_ELSE]
+    same = [line.replace("y = 2", "y = 1") for line in IF_ELSE]
+    assert propagate(same)[-1] == "z = 2"
+
+def test_loop_carried_variables_are_not_constant():
+    lines = ["i = 0", "k = 4", ".Lwhile0:", "c = i >= 5", "IF c GOTO .Lend0", "i = i + 1", "j = k + 1", "GOTO .Lwhile0", ".Lend0:", "z = i", "w = k"]
+    assert propagate(lines) == [*lines[:6], "j = 5", "GOTO .Lwhile0", ".Lend0:", "z = i", "w = 4"]
+
+def test_loop_that_never_runs_is_removed():
+    lines = ["i = 9", ".Lwhile0:", "c = i >= 5", "IF c GOTO .Lend0", "i = i + 1", "GOTO .Lwhile0", ".Lend0:", "z = i"]
+    assert propagate(lines) == ["i = 9", ".Lwhile0:", "c = 1", ".Lend0:", "z = 9"]
+
+def test_calls_and_volatiles_stop_propagation():
+    assert propagate(["x = 3", "r = CALL f0(x)", "y = x"]) == ["x = 3", "r = CALL f0(3)", "y = x"]
+    ast = pcp.CParser().parse("volatile char v;\nchar y;\nvoid main(){}\n")
+    assert propagate(["v = 3", "y = v"], generate_symbol_table(ast).scope('main')) == ["v = 3", "y = v"]
+
+def test_folded_program_keeps_its_result():
+    code = """char a;
+char r;
+void main(){
+    char k = 5;
+    if(k > 3){
+        r = a + k;
+    }else{
+        r = a - k;
+    }
+    if(k == 2){
+        r = 0;
+    }
+}
+"""
+    result = compile_source(code)
+    assert not any(line.startswith('IF') for line in result.hir)
+    for a in (0, 7, 253):
+        simulator = Simulator(result.lir, result.variables)
+        simulator.load_variables({'a': a})
+        assert simulator.run().variables['r'] == (a + 5) & 0xFF
@@ -0,0 +1,65 @@
+import pytest
+
+from entities.HirLine import HirLine, GotoHirLine
+from modules.ControlFlowGraph import ControlFlowGraph
+
+# if/else followed by a while loop.
+LINES = [
+    "c = a >= 3", "IF c GOTO .Lelse0", "x = 1", "GOTO .Lif0", ".Lelse0:", "x = 2", ".Lif0:",
+    ".Lwhile0:", "d = x < 9", "IF d GOTO .Lend0", "x = x + 1", "GOTO .Lwhile0", ".Lend0:", "y = x",
+]
+
+
+def cfg(lines:list[str]) -> ControlFlowGraph:
+    return ControlFlowGraph(HirLine.parse_hir_lines(lines))
+
+def ids(blocks) -> list[int]:
+    return [block.id for block in blocks]
+
+def test_blocks_split_at_labels_and_branches():
+    graph = cfg(LINES)
+    assert [[str(hir) for hir in block.lines] for block in graph.blocks] == [
+        ["c = a >= 3", "IF c GOTO .Lelse0"], ["x = 1", "GOTO .Lif0"], [".Lelse0:", "x = 2"], [".Lif0:"],
+        [".Lwhile0:", "d = x < 9", "IF d GOTO .Lend0"], ["x = x + 1", "GOTO .Lwhile0"], [".Lend0:", "y = x"],
+    ]
+    assert [ids(block.successors) for block in graph.blocks] == [[2, 1], [3], [3], [4], [6, 5], [4], []]
+    assert ids(graph.blocks[4].predecessors) == [3, 5]
+    assert graph.block_of(graph.blocks[5].lines[0]) is graph.blocks[5]
+    assert graph.is_exit(graph.blocks[6]) and not graph.is_exit(graph.blocks[5])
+
+def test_immediate_dominators_and_tree():
+    graph = cfg(LINES)
+    blocks = graph.blocks
+    idom = graph.immediate_dominators()
+    assert {block.id: idom[block].id for block in blocks} == {0: 0, 1: 0, 2: 0, 3: 0, 4: 3, 5: 4, 6: 4}
+    tree = graph.dominator_tree()
+    assert sorted(ids(tree[blocks[0]])) == [1, 2, 3]
+    assert sorted(ids(tree[blocks[4]])) == [5, 6]
+    assert graph.dominates(blocks[3], blocks[6]) and not graph.dominates(blocks[1], blocks[3])
+    assert ids(graph.reverse_postorder())[0] == 0
+
+def test_branch_edits_invalidate_the_dominators():
+    graph = cfg(LINES)
+    assert graph.immediate_dominators()[graph.blocks[2]] is graph.entry
+    removed = graph.remove_branch(graph.entry)
+    assert str(removed) == "IF c GOTO .Lelse0"
+    assert ids(graph.entry.successors) == [1]
+    assert graph.blocks[2] not in graph.immediate_dominators()
+    with pytest.raises(ValueError):
+        graph.add_branch(graph.blocks[1], GotoHirLine(".Lend0"))
+    with pytest.raises(ValueError):
+        graph.add_branch(graph.entry, GotoHirLine(".Lmissing"))
+
+def test_unreachable_blocks_are_removed_and_lines_round_trip():
+    graph = cfg(["GOTO .L1", "x = 1", ".L1:", "y = 2"])
+    assert ids(graph.remove_unreachable_blocks()) == [1]
+    assert [str(hir) for hir in graph.to_hir_lines()] == ["GOTO .L1", ".L1:", "y = 2"]
+    assert [str(hir) for hir in cfg(LINES).to_hir_lines()] == LINES
+
+def test_natural_loop_of_the_while():
+    graph = cfg(LINES)
+    (loop,) = graph.natural_loops()
+    assert loop.header is graph.blocks[4]
+    assert sorted(block.id for block in loop.blocks) == [4, 5]
+    assert [(source.id, target.id) for source, target in loop.exits()] == [(4, 6)]
+    assert graph.loop_depths()[graph.blocks[5]] == 1
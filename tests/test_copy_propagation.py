@@ -0,0 +1,61 @@
+import pycparser as pcp
+
+from entities.HirLine import HirLine
+from modules.CopyPropagation import coalesce_temporaries, propagate_copies
+from modules.DeadCodeElimination import eliminate_dead_code, observable_variables
+from modules.SymbolTableGen import generate_symbol_table
+
+SOURCE = "char g;\nvolatile char v;\nvolatile char u;\nvoid main(){\n    char x;\n    char y;\n}\n"
+
+
+def scope():
+    return generate_symbol_table(pcp.CParser().parse(SOURCE)).scope('main')
+
+def run(fn, lines:list[str], *args) -> list[str]:
+    return [str(hir) for hir in fn(HirLine.parse_hir_lines(lines), *args)]
+
+def test_temporary_folds_into_its_copy():
+    assert run(coalesce_temporaries, [".t0 = a + b", "x = .t0"]) == ["x = a + b"]
+    kept = [
+        [".t0 = a + b", "x = 1", "x = .t0"],
+        [".t0 = a + b", "y = .t0 + 1", "x = .t0"],
+        [".t0 = a + b", "r = CALL f0()", "x = .t0"],
+        [".t0 = a + b", ".L0:", "x = .t0"],
+    ]
+    for lines in kept:
+        assert run(coalesce_temporaries, lines) == lines
+
+def test_volatile_write_does_not_pass_a_volatile_read():
+    lines = [".t0 = a + b", "y = u", "v = .t0"]
+    assert run(coalesce_temporaries, lines, scope()) == lines
+    assert run(coalesce_temporaries, lines) == ["v = a + b", "y = u"]
+
+def test_copy_is_propagated_until_either_side_changes():
+    assert run(propagate_copies, ["x = y", "z = x + 1", "y = 3", "w = x"]) == ["x = y", "z = y + 1", "y = 3", "w = x"]
+    assert run(propagate_copies, [".t0 = a", "z = .t0 + 1"]) == [".t0 = a", "z = a + 1"]
+    # A temp is not stretched into a user variable's reads.
+    assert run(propagate_copies, ["x = .t0", "z = x + 1"]) == ["x = .t0", "z = x + 1"]
+
+def test_copy_must_be_available_on_every_path():
+    both = ["c = a >= 3", "IF c GOTO .L0", "x = y", "GOTO .L1", ".L0:", "x = y", ".L1:", "z = x"]
+    assert run(propagate_copies, both)[-1] == "z = y"
+    one = ["c = a >= 3", "x = y", "IF c GOTO .L0", "x = b", ".L0:", "z = x"]
+    assert run(propagate_copies, one) == one
+
+def test_volatile_copies_are_not_propagated():
+    lines = ["x = v", "z = x + 1", "g = x"]
+    assert run(propagate_copies, lines, scope()) == lines
+
+def test_dead_code_uses_liveness_at_the_exit():
+    assert observable_variables(HirLine.parse_hir_lines(["x = g", "v = .t0", "y = a"]), scope()) == {'g', 'v', 'a'}
+    lines = [".t0 = a + 1", ".t1 = .t0 + 2", "x = 5", "x = 6", "y = x", "g = g", "g = y"]
+    assert run(eliminate_dead_code, lines, scope()) == ["x = 6", "y = x", "g = y"]
+    # Without a symbol table x and y stay observable, so only the write
+    # overwritten before any read goes.
+    assert run(eliminate_dead_code, ["x = 5", "x = 6", "y = 1"]) == ["x = 6", "y = 1"]
+
+def test_side_effects_and_loop_carried_values_survive():
+    assert run(eliminate_dead_code, [".t0 = 1", "r = CALL f0(.t0)", ".t1 = 2"]) == [".t0 = 1", "r = CALL f0(.t0)"]
+    assert run(eliminate_dead_code, ["x = v", "v = 3"], scope()) == ["x = v", "v = 3"]
+    loop = ["x = 0", ".Lwhile0:", "c = x >= 5", "IF c GOTO .Lend0", "x = x + 1", "GOTO .Lwhile0", ".Lend0:", "g = 1"]
+    assert run(eliminate_dead_code, loop, scope()) == loop
@@ -0,0 +1,60 @@
+from entities.HirLine import HirLine
+from modules.ControlFlowGraph import ControlFlowGraph
+from modules.DataFlow import BitIndex, Liveness, ReachingDefinitions, AvailableExpressions
+
+# if/else that both assign x, then a loop that reads it.
+LINES = [
+    "c = a >= 3", "IF c GOTO .Lelse0", "x = 1", ".t0 = a + b", "GOTO .Lif0", ".Lelse0:", "x = 2", ".t1 = a + b", ".Lif0:",
+    ".Lwhile0:", "d = x < 9", "IF d GOTO .Lend0", "x = x + 1", "GOTO .Lwhile0", ".Lend0:", "y = a + b",
+]
+
+
+def analyze(lines:list[str]):
+    hir = HirLine.parse_hir_lines(lines)
+    return hir, ControlFlowGraph(hir)
+
+def test_bit_index_round_trips_sets():
+    index = BitIndex(['a', 'b'])
+    bits = index.mask(['c', 'a'])
+    assert index.keys_of(bits) == ['a', 'c']
+    assert index.universe == 0b111 and 'c' in index and 'd' not in index
+
+def test_liveness_by_block_and_line():
+    hir, cfg = analyze(LINES)
+    liveness = Liveness(cfg, exit_live=['y'])
+    header = cfg.label_to_block['.Lwhile0']
+    assert liveness.live_in(cfg.entry) == {'a', 'b'}
+    assert liveness.live_in(header) == {'a', 'b', 'x'}
+    assert liveness.live_out(cfg.label_to_block['.Lend0']) == {'y'}
+    assert liveness.is_live_after(hir[0], 'c')
+    assert not liveness.is_live_after(hir[2], 'c')
+    assert liveness.is_live_after(hir[10], 'x') and liveness.is_live_after(hir[12], 'x')
+    # The temps are never read, and only y is observable at the exit.
+    assert not liveness.is_live_after(hir[3], '.t0')
+    assert not liveness.is_live_after(hir[15], 'x')
+
+def test_liveness_defaults_to_every_named_variable_at_exit():
+    hir, cfg = analyze(["x = 1", ".t0 = 2"])
+    assert Liveness(cfg).live_out(cfg.entry) == {'x'}
+
+def test_reaching_definitions_merge_at_joins():
+    hir, cfg = analyze(LINES)
+    reaching = ReachingDefinitions(cfg)
+    assert reaching.definition_count('x') == 3
+    assert [str(line) for line in reaching.reaching(hir[10], 'x')] == ["x = 1", "x = 2", "x = x + 1"]
+    assert [str(line) for line in reaching.reaching(hir[12], 'x')] == ["x = 1", "x = 2", "x = x + 1"]
+    assert [str(line) for line in reaching.reaching(hir[7], 'x')] == ["x = 2"]
+    assert reaching.reaching(hir[0], 'x') == []
+
+def test_available_expressions_need_every_path():
+    hir, cfg = analyze(LINES)
+    available = AvailableExpressions(cfg)
+    assert ('+', 'a', 'b') in available.available_at(hir[15])
+    assert ('+', 'a', 'b') not in available.available_at(hir[2])
+    # x is reassigned in the loop, so x + 1 never reaches the header.
+    assert ('+', 'x', 1) not in available.available_at(hir[10])
+    assert ('<', 'x', 9) in available.available_at(hir[11])
+
+def test_assignment_kills_available_expressions():
+    hir, cfg = analyze(["x = a + b", "a = 3", "y = a + b"])
+    assert AvailableExpressions(cfg).available_at(hir[2]) == []
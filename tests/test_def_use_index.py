@@ -0,0 +1,51 @@
+from entities.HirLine import HirLine
+from modules.DefUseIndex import DefUseIndex
+
+LINES = ["a = 1", "b = a + 2", "a = b", "c = a * b", "IF c GOTO .L0", ".L0:"]
+
+
+def index(lines:list[str]) -> DefUseIndex:
+    return DefUseIndex(HirLine.parse_hir_lines(lines))
+
+def test_positions_and_counts():
+    du = index(LINES)
+    assert du.defs_of('a') == (0, 2) and du.uses_of('a') == (1, 3)
+    assert du.def_count('b') == 1 and du.use_count('b') == 2
+    assert du.def_count('missing') == 0 and du.uses_of('missing') == ()
+    assert len(du) == len(LINES)
+
+def test_update_line_relinks_the_position():
+    du = index(LINES)
+    du.update_line(3, HirLine.parse_hir_line("d = b + 1"))
+    assert du.uses_of('a') == (1,)
+    assert du.defs_of('c') == () and du.defs_of('d') == (3,)
+    assert du.uses_of('b') == (2, 3)
+    assert 'c' not in du.defs
+
+def test_update_uses_the_indexed_snapshot():
+    du = index(LINES)
+    hir = du.lines[1]
+    hir.set_left_operand('z')
+    du.update_line(1, hir)
+    assert du.uses_of('a') == (3,) and du.uses_of('z') == (1,)
+
+def test_removed_lines_are_skipped_until_compact():
+    du = index(LINES)
+    du.remove_line(2)
+    du.remove_line(2)
+    assert du.defs_of('a') == (0,) and du.uses_of('b') == (3,)
+    assert [i for i, _ in du.items()] == [0, 1, 3, 4, 5]
+    compacted = du.compact()
+    assert [str(hir) for hir in compacted] == ["a = 1", "b = a + 2", "c = a * b", "IF c GOTO .L0", ".L0:"]
+    assert du.uses_of('a') == (1, 2) and len(du) == 5
+
+def test_edits_match_a_rebuilt_index():
+    du = index(LINES)
+    du.update_line(1, HirLine.parse_hir_line("b = c + a"))
+    du.update_line(3, HirLine.parse_hir_line("c = b"))
+    du.remove_line(0)
+    rebuilt = DefUseIndex([hir for _, hir in du.items()])
+    positions = [i for i, _ in du.items()]
+    for var in ('a', 'b', 'c'):
+        assert du.defs_of(var) == tuple(positions[i] for i in rebuilt.defs_of(var))
+        assert du.uses_of(var) == tuple(positions[i] for i in rebuilt.uses_of(var))
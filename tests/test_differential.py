@@ -0,0 +1,315 @@
+"""Differential tests: C source goes through compile_source, main's LIR and
+assembly run in the Simulator, and the globals they leave must match a
+reference evaluator that walks the pycparser AST directly.
+
+Globals declared without an initializer are the inputs: the compiler
+cannot assume their value, so both sides start them from the same random
+bytes.
+"""
+import random
+import re
+
+import pycparser as pcp
+import pytest
+
+from modules.Benchmark import ProgramGenerator, ProgramShape
+from modules.BatchDriver import compile_source
+from modules.Simulator import Simulator
+
+_BINARY = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    # Division by zero yields 0, as the compiler folds it.
+    '/': lambda a, b: a // b if b else 0,
+    '%': lambda a, b: a % b if b else 0,
+    '<<': lambda a, b: a << b,
+    '>>': lambda a, b: a >> b,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+    '<': lambda a, b: int(a < b),
+    '>': lambda a, b: int(a > b),
+    '<=': lambda a, b: int(a <= b),
+    '>=': lambda a, b: int(a >= b),
+    '==': lambda a, b: int(a == b),
+    '!=': lambda a, b: int(a != b),
+}
+
+class _Break(Exception):
+    pass
+
+class _Continue(Exception):
+    pass
+
+
+class ReferenceEvaluator:
+    """Runs the global declarations and then main with 8-bit unsigned
+    arithmetic, the only type the compiler supports.
+    """
+    def __init__(self, inputs:dict[str, int]):
+        self.inputs = inputs
+        self.globals: dict[str, int] = {}
+        self.scopes: list[dict[str, int]] = []
+
+    def lookup(self, name:str) -> dict[str, int]:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope
+        return self.globals
+
+    def declare(self, scope:dict[str, int], decl:pcp.c_ast.Decl):
+        if decl.init is not None:
+            scope[decl.name] = self.expression(decl.init)
+        else:
+            scope[decl.name] = self.inputs.get(decl.name, 0)
+
+    def run(self, code:str) -> dict[str, int]:
+        ast = pcp.CParser().parse(code)
+        for ext in ast.ext:
+            if isinstance(ext, pcp.c_ast.Decl) and not isinstance(ext.type, pcp.c_ast.FuncDecl):
+                self.declare(self.globals, ext)
+        main = next(ext for ext in ast.ext if isinstance(ext, pcp.c_ast.FuncDef) and ext.decl.name == 'main')
+        self.statement(main.body)
+        return self.globals
+
+    def assign(self, name:str, value:int) -> int:
+        value &= 0xFF
+        self.lookup(name)[name] = value
+        return value
+
+    def expression(self, node) -> int:
+        if isinstance(node, pcp.c_ast.Constant):
+            return int(node.value, 0) & 0xFF
+        if isinstance(node, pcp.c_ast.ID):
+            return self.lookup(node.name)[node.name]
+        if isinstance(node, pcp.c_ast.Assignment):
+            value = self.expression(node.rvalue)
+            if node.op != '=':
+                value = _BINARY[node.op[:-1]](self.expression(node.lvalue), value)
+            return self.assign(node.lvalue.name, value)
+        if isinstance(node, pcp.c_ast.BinaryOp):
+            left = self.expression(node.left)
+            if node.op == '&&':
+                return int(bool(left) and bool(self.expression(node.right)))
+            if node.op == '||':
+                return int(bool(left) or bool(self.expression(node.right)))
+            return _BINARY[node.op](left, self.expression(node.right)) & 0xFF
+        if isinstance(node, pcp.c_ast.UnaryOp):
+            if node.op == '!':
+                return int(not self.expression(node.expr))
+            if node.op == '-':
+                return -self.expression(node.expr) & 0xFF
+            if node.op == '~':
+                return ~self.expression(node.expr) & 0xFF
+            old = self.expression(node.expr)
+            new = self.assign(node.expr.name, old + (1 if node.op in ('++', 'p++') else -1))
+            return old if node.op.startswith('p') else new
+        raise NotImplementedError(type(node).__name__)
+
+    def statement(self, node):
+        if node is None:
+            return
+        if isinstance(node, pcp.c_ast.Compound):
+            self.scopes.append({})
+            try:
+                for item in node.block_items or []:
+                    self.statement(item)
+            finally:
+                self.scopes.pop()
+        elif isinstance(node, pcp.c_ast.Decl):
+            self.declare(self.scopes[-1], node)
+        elif isinstance(node, pcp.c_ast.If):
+            self.statement(node.iftrue if self.expression(node.cond) else node.iffalse)
+        elif isinstance(node, pcp.c_ast.While):
+            while self.expression(node.cond):
+                if not self.body(node.stmt):
+                    break
+        elif isinstance(node, pcp.c_ast.DoWhile):
+            while self.body(node.stmt) and self.expression(node.cond):
+                pass
+        elif isinstance(node, pcp.c_ast.For):
+            self.statement(node.init)
+            while node.cond is None or self.expression(node.cond):
+                if not self.body(node.stmt):
+                    break
+                self.statement(node.next)
+        elif isinstance(node, pcp.c_ast.Break):
+            raise _Break()
+        elif isinstance(node, pcp.c_ast.Continue):
+            raise _Continue()
+        else:
+            self.expression(node)
+
+    def body(self, node) -> bool:
+        # False when the loop has to stop.
+        try:
+            self.statement(node)
+        except _Break:
+            return False
+        except _Continue:
+            pass
+        return True
+
+
+def drop_initializers(code:str, names:list[str]) -> str:
+    for name in names:
+        code = re.sub(rf"^char {name} = \d+;$", f"char {name};", code, flags=re.MULTILINE)
+    return code
+
+def check(code:str, inputs:list[dict[str, int]]):
+    result = compile_source(code, assemble=True)
+    reference_globals = ReferenceEvaluator({}).run(code)
+    for values in inputs:
+        expected = ReferenceEvaluator(values).run(code)
+        for lines in (result.lir, result.assembly):
+            simulator = Simulator(lines, result.variables)
+            simulator.load_variables(values)
+            variables = simulator.run().variables
+            for name in reference_globals:
+                assert variables[name] == expected[name], (name, values, code, lines)
+
+def random_inputs(rng:random.Random, names:list[str], count:int = 4) -> list[dict[str, int]]:
+    edges = [0, 1, 127, 128, 255]
+    return [{name: rng.choice(edges) if rng.random() < 0.3 else rng.randint(0, 255) for name in names} for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_generated_programs(seed):
+    shape = ProgramShape(globals=4, ifs=3, depth=2, functions=2, statements=3, seed=seed)
+    rng = random.Random(seed)
+    inputs = ['g0', 'g1', 'g2']
+    code = drop_initializers(ProgramGenerator(shape).generate(), inputs)
+    check(code, random_inputs(rng, inputs))
+
+@pytest.mark.parametrize('seed', range(20))
+def test_generated_programs_with_constant_operators(seed):
+    shape = ProgramShape(globals=4, ifs=3, depth=2, functions=1, statements=3, seed=seed, constant_operators=True)
+    rng = random.Random(seed)
+    inputs = ['g0', 'g1', 'g2']
+    code = drop_initializers(ProgramGenerator(shape).generate(), inputs)
+    check(code, random_inputs(rng, inputs))
+
+LOOP_PROGRAMS = [
+    # Counted loop with a running sum that wraps.
+    """char a;
+char b;
+char sum = 0;
+void main(){
+    char i;
+    for(i = 0; i < a; i++){
+        sum += b;
+    }
+}
+""",
+    # while/do-while with break and continue.
+    """char a;
+char b;
+char r = 0;
+void main(){
+    char i = 0;
+    while(i < 20){
+        i += 1;
+        if(i == a) continue;
+        if(r > b) break;
+        r = r + i;
+    }
+    do {
+        r ^= i;
+        i -= 3;
+    } while(i > 3 && r != b);
+}
+""",
+    # Logical operators, ! and comparisons as values.
+    """char a;
+char b;
+char c;
+char r = 0;
+void main(){
+    if(!(a < b) || (b == c && a != 0)){
+        r = (a >= c);
+    } else {
+        r = (a <= b) + (b > c);
+    }
+    if(!a) r |= 128;
+}
+""",
+    # A local shadows a global inside a nested block.
+    """char a;
+char b;
+char r = 0;
+void main(){
+    char t = a;
+    {
+        char a = b + 1;
+        t = t - a;
+    }
+    r = t + a;
+}
+""",
+    # Nested loops with a data-dependent branch.
+    """char a;
+char b;
+char r = 1;
+void main(){
+    char i;
+    char j;
+    for(i = 0; i < 4; i++){
+        for(j = i; j < 6; j++){
+            if((a & j) == 0) r = r + b;
+            else r = r - i;
+        }
+    }
+}
+""",
+    # Strength-reduced division, modulo and shifts by constants inside a
+    # loop, next to a branch and a compound assignment.
+    """char a;
+char b;
+char q = 0;
+char m = 0;
+char s = 0;
+void main(){
+    char i;
+    for(i = 0; i < 5; i++){
+        q = q + a / 3;
+        m = (m + b) % 7;
+        if((a >> 2) > i) s = s + (b << 1);
+        else s ^= i << 5;
+        a = a / 2 + b % 16;
+        b >>= 1;
+    }
+    q = q + (a / 0) + (b % 0) + (a << 9);
+}
+""",
+]
+
+@pytest.mark.parametrize('index', range(len(LOOP_PROGRAMS)))
+def test_loop_programs(index):
+    code = LOOP_PROGRAMS[index]
+    names = re.findall(r"^char (\w+);$", code, flags=re.MULTILINE)
+    check(code, random_inputs(random.Random(index), names, 8))
+
+@pytest.mark.parametrize('expression, expected', [
+    ('(3 - 5) < 1', 0),
+    ('(200 + 100) > 255', 0),
+    ('-1 == 255', 1),
+    ('~0 > 254', 1),
+])
+def test_constant_folds_wrap_like_the_registers(expression, expected):
+    code = f"char r0 = 0;\nvoid main(){{\n    r0 = ({expression});\n}}\n"
+    assert ReferenceEvaluator({}).run(code)['r0'] == expected
+    check(code, [{}])
+
+def test_volatile_globals_are_reloaded():
+    code = """volatile char a;
+char r = 0;
+void main(){
+    r = a + 1;
+    a = 3;
+    r = r + a;
+}
+"""
+    check(code, random_inputs(random.Random(0), ['a']))
+    loads = [line for line in compile_source(code).lir if line.startswith('MOV R') and line.endswith('var:a')]
+    assert len(loads) == 2
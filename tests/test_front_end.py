@@ -0,0 +1,60 @@
+import os
+
+from helpers.FileHelper import get_cache_dir
+from modules.Config import CACHE_DIR_ENV_VAR
+from modules.FrontEnd import FrontEndService, AstCache, get_source_key
+
+CODE = "char a = 1;\nvoid main(){\n    a = a + 1;\n}\n"
+
+
+def test_memory_hit_returns_a_fresh_copy():
+    service = FrontEndService(AstCache())
+    first = service.parse(CODE)
+    first.ext[0].name = 'renamed'
+    second = service.parse(CODE)
+    assert service.cache.hits == 1 and service.cache.misses == 1
+    assert second is not first
+    assert second.ext[0].name == 'a'
+
+def test_filename_is_part_of_the_key():
+    assert get_source_key(CODE, 'a.c') != get_source_key(CODE, 'b.c')
+    service = FrontEndService(AstCache())
+    assert service.parse(CODE, 'a.c').ext[0].coord.file == 'a.c'
+    assert service.parse(CODE, 'b.c').ext[0].coord.file == 'b.c'
+    assert service.cache.misses == 2
+
+def test_no_disk_writes_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    FrontEndService().parse(CODE)
+    assert os.listdir(tmp_path) == []
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    FrontEndService(AstCache(str(tmp_path))).parse(CODE)
+    assert [name.endswith('.ast') for name in os.listdir(tmp_path)] == [True]
+    cache = AstCache(str(tmp_path))
+    ast = FrontEndService(cache).parse(CODE)
+    assert (cache.disk_hits, cache.misses) == (1, 0)
+    assert ast.ext[0].name == 'a'
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = AstCache(str(tmp_path))
+    key = get_source_key(CODE)
+    (tmp_path / f"{key}.ast").write_bytes(b'not a pickle')
+    assert cache.get(key) is None
+    assert cache.misses == 1
+
+def test_eviction_runs_every_interval_writes(tmp_path):
+    cache = AstCache(str(tmp_path), max_entries=2, evict_interval=3)
+    service = FrontEndService(cache)
+    for i in range(5):
+        service.parse(CODE.replace('1', str(i)))
+    # Evicted down to 2 on the third write, then two more were added.
+    assert len(os.listdir(tmp_path)) == 4
+    service.parse(CODE.replace('1', '5'))
+    assert len(os.listdir(tmp_path)) == 2
+
+def test_cache_dir_comes_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv(CACHE_DIR_ENV_VAR, raising=False)
+    assert get_cache_dir('ast') is None
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(tmp_path))
+    assert get_cache_dir('ast') == os.path.join(str(tmp_path), 'ast')
@@ -0,0 +1,89 @@
+import pycparser as pcp
+import pytest
+
+import entities.HirArray as hir_array_module
+from entities.HirArray import HirArray, NO_OPERAND, CALL
+from entities.HirLine import HirLine
+from modules.CopyPropagation import coalesce_temporaries
+from modules.SymbolTableGen import generate_symbol_table
+
+LINES = [
+    "a = 1",
+    ".t0 = a + b",
+    ".t1 = .t0 < 3",
+    ".t2 = not .t1",
+    "IF .t2 GOTO .L0",
+    ".t3 = CALL f(a, 4, .t0)",
+    "a = .t3",
+    "GOTO .L1",
+    ".L0:",
+    "b = a & a",
+    ".L1:",
+]
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def scan(request, monkeypatch):
+    # Both scan paths give the same positions.
+    if request.param == 'numpy':
+        if hir_array_module.numpy is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(hir_array_module, 'numpy', None)
+    return request.param
+
+def columns(lines:list[str] = LINES) -> HirArray:
+    return HirArray.from_lines(HirLine.parse_hir_lines(lines))
+
+def test_round_trip():
+    hir_array = columns()
+    assert [str(hir) for hir in hir_array.to_lines()] == LINES
+    assert hir_array.kinds[5] == CALL and list(hir_array.args) == [hir_array.operands.find(x) for x in ('a', 4, '.t0')]
+    assert hir_array == columns() and hir_array != columns(LINES[:-1])
+
+def test_variable_ids_are_symbol_ids():
+    source = "char g;\nvoid main(){\n    char g = 1;\n    char x;\n}\n"
+    symbol_table = generate_symbol_table(pcp.CParser().parse(source)).scope('main')
+    hir_array = HirArray.from_lines(HirLine.parse_hir_lines(["x = g + 1"]), symbol_table)
+    assert hir_array.results[0] == symbol_table.id_of('x')
+    assert hir_array.lefts[0] == symbol_table.id_of('g')
+
+def test_use_and_def_scans(scan):
+    hir_array = columns()
+    assert hir_array.uses_of('a') == [1, 5, 9] and hir_array.defs_of('a') == [0, 6]
+    assert hir_array.uses_of('.t0') == [2, 5] and hir_array.uses_of('.t3') == [6]
+    assert hir_array.use_count('a') == 4 and hir_array.def_count('b') == 1
+    assert hir_array.uses_of('.L0') == [] and hir_array.uses_of('missing') == []
+    assert hir_array.temps() == {'.t0', '.t1', '.t2', '.t3'}
+
+def test_edits_keep_scans_and_counts_current(scan):
+    hir_array = columns()
+    hir_array.set_line(5, HirLine.parse_hir_line(".t3 = CALL f(b)"))
+    assert hir_array.uses_of('a') == [1, 9] and hir_array.uses_of('b') == [1, 5]
+    assert hir_array.uses_of('.t0') == [2] and hir_array.use_count('.t0') == 1
+    hir_array.remove(9)
+    hir_array.remove(9)
+    assert hir_array.results[9] == NO_OPERAND and hir_array.def_count('b') == 0
+    assert hir_array.uses_of('a') == [1] and hir_array[9] is None
+
+    compacted = hir_array.compact()
+    assert [str(hir) for hir in compacted] == [str(hir) for hir in hir_array]
+    assert compacted.uses_of('b') == [1, 5] and compacted.uses_of('.L1') == []
+    assert compacted.use_count('b') == 2 and compacted.defs_of('a') == [0, 6]
+
+def test_to_lines_reuses_the_unedited_lines(scan):
+    lines = HirLine.parse_hir_lines(LINES)
+    hir_array = HirArray.from_lines(lines)
+    hir_array.set_result(0, hir_array.operands.id_of('c'))
+    hir_array.remove(9)
+    result = hir_array.to_lines(lines)
+    assert [str(hir) for hir in result] == ["c = 1"] + LINES[1:9] + LINES[10:]
+    assert result[0] is not lines[0] and all(new is old for new, old in zip(result[1:9], lines[1:9]))
+    assert hir_array.def_count('a') == 1 and hir_array.def_count('c') == 1
+
+def test_coalescing_runs_on_the_columns(scan):
+    lines = HirLine.parse_hir_lines([".t0 = a + b", "x = .t0", ".t1 = CALL f(x)", "y = .t1", "IF y GOTO .L0", ".L0:"])
+    result = coalesce_temporaries(lines)
+    assert [str(hir) for hir in result] == ["x = a + b", "y = CALL f(x)", "IF y GOTO .L0", ".L0:"]
+    assert result[2] is lines[4] and result[3] is lines[5]
+    assert coalesce_temporaries(result) == result
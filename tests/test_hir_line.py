@@ -0,0 +1,71 @@
+import pytest
+
+from entities.HirLine import *
+
+LINES = [
+    "x = 5",
+    "x = -3",
+    ".t0 = a + b",
+    ".t1 = a >= 3",
+    ".t2 = neg a",
+    "r = CALL f0(a, 2)",
+    "r = CALL f1()",
+    "IF .t1 GOTO .Lelse0",
+    "GOTO .Lif0",
+    ".Lelse0:",
+]
+
+
+@pytest.mark.parametrize('line', LINES)
+def test_parse_render_round_trip(line):
+    hir = HirLine.parse_hir_line(line)
+    assert str(hir) == hir.line == line
+
+def test_parser_picks_the_typed_class():
+    classes = [type(hir) for hir in HirLine.parse_hir_lines(LINES)]
+    assert classes == [
+        AssignmentHirLine, AssignmentHirLine, ArithmeticOpHirLine, ConditionalOpHirLine, UnaryOpHirLine,
+        CallHirLine, CallHirLine, IfOpHirLine, GotoHirLine, LabelHirLine,
+    ]
+
+def test_unknown_shape_is_rejected():
+    with pytest.raises(NotImplementedError):
+        HirLine.parse_hir_line("x = a ?? b")
+
+def test_lines_have_no_instance_dict():
+    for hir in HirLine.parse_hir_lines(LINES):
+        assert not hasattr(hir, '__dict__')
+
+def test_operands_are_interned_and_typed():
+    first, second = HirLine.parse_hir_lines([".t0 = a + 7", "y = a"])
+    assert first.left_operand is second.value
+    assert first.right_operand == 7 and first.right_isConstant and not first.left_isConstant
+
+def test_defined_and_used_vars():
+    hir = HirLine.parse_hir_lines(["x = a + 1", "r = CALL f0(a, b, 2)", "IF c GOTO .L0", "GOTO .L0", ".L0:", "y = 4"])
+    assert [line.defined_var() for line in hir] == ['x', 'r', None, None, None, 'y']
+    assert [tuple(line.used_vars()) for line in hir] == [('a',), ('a', 'b'), ('c',), (), (), ()]
+
+def test_substitute_returns_a_copy():
+    hir = HirLine.parse_hir_line("x = a + b")
+    substituted = hir.substitute({'a': 3, 'x': 'z'})
+    assert str(substituted) == "x = 3 + b"
+    assert str(hir) == "x = a + b"
+    assert substituted is not hir
+
+def test_rename_covers_definitions_and_labels():
+    renamed = [str(hir.rename({'x': 'x.1', 'a': 'a.2', '.L0': '.Lf0_0'})) for hir in HirLine.parse_hir_lines(
+        ["x = a + 1", "IF a GOTO .L0", "GOTO .L0", ".L0:"])]
+    assert renamed == ["x.1 = a.2 + 1", "IF a.2 GOTO .Lf0_0", "GOTO .Lf0_0", ".Lf0_0:"]
+
+def test_folding_returns_a_new_assignment():
+    hir = HirLine.parse_hir_line("x = 6 * 7")
+    folded = hir.evaluate_if_possible()
+    assert isinstance(folded, AssignmentHirLine) and str(folded) == "x = 42"
+    assert str(hir) == "x = 6 * 7"
+    assert HirLine.parse_hir_line("x = a * 7").evaluate_if_possible() is None
+    assert str(HirLine.parse_hir_line("c = 3 < 2").evaluate_if_possible()) == "c = 0"
+
+def test_folding_wraps_to_eight_bits():
+    assert str(HirLine.parse_hir_line("x = 200 + 100").evaluate_if_possible()) == "x = 44"
+    assert str(HirLine.parse_hir_line("c = 3 - 5").evaluate_if_possible()) == "c = 254"
@@ -0,0 +1,57 @@
+import pycparser as pcp
+import pytest
+
+from entities.HirLine import HirLine
+from modules.LIRGen import generate_ir_low
+from modules.Simulator import Simulator
+from modules.SymbolTableGen import generate_symbol_table
+
+GLOBALS = "char a;\nchar b;\nchar c;\nvolatile char v;\nvoid main(){}\n"
+
+
+@pytest.fixture
+def symbol_table():
+    return generate_symbol_table(pcp.CParser().parse(GLOBALS)).scope('main')
+
+def lower(hir:list[str], symbol_table) -> list[str]:
+    return [str(line) for line in generate_ir_low(HirLine.parse_hir_lines(hir), None, symbol_table)]
+
+def simulate(lir:list[str], values:dict[str, int]) -> dict[str, int]:
+    simulator = Simulator(lir, {'a': 0, 'b': 1, 'c': 2, 'v': 3})
+    simulator.load_variables(values)
+    return simulator.run().variables
+
+def test_constant_in_ra_is_not_reloaded(symbol_table):
+    assert lower(["a = 5", "b = 5"], symbol_table) == ['LDI 5', 'MOV var:a RA', 'MOV var:b RA']
+
+def test_store_of_a_constant_forwards_it_to_later_loads(symbol_table):
+    lir = lower(["a = 5", "b = 5", "c = a"], symbol_table)
+    assert lir == ['LDI 5', 'MOV var:a RA', 'MOV var:b RA', 'MOV var:c RA']
+    # Without a symbol table volatility is unknown, so memory is reread.
+    assert 'MOV RA var:a' in lower(["a = 5", "b = 5", "c = a"], None)
+
+def test_variable_still_in_a_register_is_moved_instead_of_loaded(symbol_table):
+    lir = lower(["a = b + c", "c = b"], symbol_table)
+    assert lir[-2:] == ['MOV RA RD', 'MOV var:c RA']
+    assert simulate(lir, {'b': 200, 'c': 100}) == {'a': 44, 'b': 200, 'c': 200, 'v': 0}
+
+def test_volatile_variables_are_reloaded(symbol_table):
+    lir = lower(["a = v + 1", "b = v + 1"], symbol_table)
+    assert lir.count('MOV RD var:v') == 2
+    lir = lower(["a = 5", "v = 5", "b = v"], symbol_table)
+    assert lir[-2:] == ['MOV RA var:v', 'MOV var:b RA']
+
+def test_redefinition_drops_the_known_value(symbol_table):
+    lir = lower(["a = 5", "a = c", "b = a"], symbol_table)
+    assert 'LDI 5' not in lir[1:]
+    assert simulate(lir, {'c': 9}) == {'a': 9, 'b': 9, 'c': 9, 'v': 0}
+
+def test_store_keeps_alu_result_only_for_its_own_variable(symbol_table):
+    # ACC still holds a after b is overwritten, so `a + b` reads it from there.
+    lir = lower(["a = b + c", "b = 7", "c = a + b"], symbol_table)
+    assert lir[-3:] == ['MOV RD ACC', 'ADD RA', 'MOV var:c ACC']
+    assert simulate(lir, {'b': 1, 'c': 2}) == {'a': 3, 'b': 7, 'c': 10, 'v': 0}
+
+def test_label_forgets_register_contents(symbol_table):
+    lir = lower(["a = 5", "L1:", "b = 5"], symbol_table)
+    assert lir == ['LDI 5', 'MOV var:a RA', 'L1:', 'LDI 5', 'MOV var:b RA']
@@ -0,0 +1,72 @@
+import pytest
+
+from entities.LirLine import LirLine, CmpLirLine, JumpLirLine, LirLineType
+from modules.LIROptimizer import PeepholeOptimizer, PeepholeContext, PeepholeRule, optimize_lir
+from modules.Simulator import Simulator
+
+
+def optimize(lines:list[str], volatile:set[str]|None = None) -> list[str]:
+    optimizer = PeepholeOptimizer(context=PeepholeContext(volatile))
+    return [str(lir) for lir in optimizer.optimize(LirLine.parse_lir_lines(lines))]
+
+@pytest.mark.parametrize('before, after', [
+    (["MOV RB RB", "MOV var:x RB"], ["MOV var:x RB"]),
+    (["MOV RB RD", "MOV RD RB", "MOV var:x RD"], ["MOV RB RD", "MOV var:x RD"]),
+    (["MOV var:x RB", "MOV RD var:x", "ADD RD"], ["MOV var:x RB", "MOV RD RB", "ADD RD"]),
+    (["MOV var:x RB", "MOV RB var:x", "MOV var:y RB"], ["MOV var:x RB", "MOV var:y RB"]),
+    (["MOV RB var:x", "MOV RD var:x", "ADD RB"], ["MOV RB var:x", "MOV RD RB", "ADD RB"]),
+    (["MOV var:x RB", "MOV var:x RD"], ["MOV var:x RD"]),
+    (["LDI 3", "LDI 4", "MOV var:x RA"], ["LDI 4", "MOV var:x RA"]),
+    (["MOV RB RD", "MOV RA RB", "MOV RB var:y", "MOV var:x RA"], ["MOV RA RD", "MOV RB var:y", "MOV var:x RA"]),
+    (["JMP .L1", "LDI 1", "MOV var:x RA", ".L1:", "LDI 2"], ["LDI 2"]),
+])
+def test_rules(before, after):
+    assert optimize(before) == after
+
+def test_volatile_memory_is_not_forwarded_or_merged():
+    kept = [
+        ["MOV var:v RB", "MOV RD var:v", "ADD RD"],
+        ["MOV RB var:v", "MOV RD var:v", "ADD RB"],
+        ["MOV var:v RB", "MOV var:v RD"],
+    ]
+    for lines in kept:
+        assert optimize(lines, {'v'}) == lines
+
+def test_read_of_the_overwritten_register_keeps_the_first_write():
+    lines = ["LDI 3", "ADD RA", "LDI 4", "MOV var:x ACC"]
+    assert optimize(lines) == lines
+
+def test_labels_still_targeted_are_kept():
+    lines = ["MOV RD var:x", "LDI 0", "CMP RA", "JEQ .L1", "LDI 1", "MOV var:x RA", ".L1:", "MOV var:y RD"]
+    assert optimize(lines) == lines
+
+def test_dead_label_removal_exposes_more_rewrites():
+    # Once .L2 is gone the two stores to x are adjacent.
+    assert optimize(["MOV var:x RB", ".L2:", "MOV var:x RD"]) == ["MOV var:x RD"]
+
+def test_rule_table_is_extensible():
+    def compare_before_jump(window, context):
+        # JMP ignores the flags, so a CMP right before it is dead.
+        compare, jump = window
+        if isinstance(compare, CmpLirLine) and isinstance(jump, JumpLirLine) and jump.type == LirLineType.JMP:
+            return [jump]
+        return None
+    optimizer = PeepholeOptimizer()
+    optimizer.add_rule(PeepholeRule('compare_before_jump', 2, compare_before_jump))
+    lines = LirLine.parse_lir_lines(["MOV RD var:x", "CMP RA", "JMP .L1", ".L1:", "MOV var:y RD"])
+    assert [str(lir) for lir in optimizer.optimize(lines)] == ["MOV RD var:x", "MOV var:y RD"]
+    assert optimizer.applied == {'compare_before_jump': 1, 'jump_to_next': 1}
+
+def test_rewrites_keep_the_simulated_result():
+    lines = [
+        "MOV RB var:a", "MOV RD var:a", "MOV RB RD", "MOV RD RB",
+        "MOV var:t RB", "MOV RD var:t", "LDI 3", "LDI 5", "ADD RA",
+        "MOV var:b ACC", "MOV var:b ACC", "JMP .L1", "LDI 9", ".L1:",
+    ]
+    before = Simulator(lines)
+    before.load_variables({'a': 250})
+    after = Simulator([str(lir) for lir in optimize_lir(LirLine.parse_lir_lines(lines))], before.addresses)
+    after.load_variables({'a': 250})
+    first, second = before.run(), after.run()
+    assert first.variables == second.variables == {'a': 250, 't': 250, 'b': 255}
+    assert second.cycles < first.cycles
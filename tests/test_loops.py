@@ -0,0 +1,106 @@
+import pycparser as pcp
+import pytest
+
+from entities.HirLine import HirLine
+from modules.BatchDriver import compile_source
+from modules.FrontEnd import FrontEndService
+from modules.HIRGen import generate_ir_high
+from modules.LoopInvariantCodeMotion import hoist_loop_invariants
+from modules.Simulator import Simulator
+from modules.SymbolTableGen import generate_symbol_table
+
+LOOP = ["i = 0", ".Lloop0:", ".t1 = a & b", "r = r + .t1", "i = i + 1", ".t4 = i < 5", "IF .t4 GOTO .Lloop0"]
+
+
+def hoist(lines:list[str], symbol_table=None) -> list[str]:
+    return [str(hir) for hir in hoist_loop_invariants(HirLine.parse_hir_lines(lines), symbol_table)]
+
+def hir_of(body:str) -> list[str]:
+    ast = FrontEndService().parse(f"char a;\nchar r;\nvoid main(){{\n    char i;\n{body}\n}}\n")
+    return [str(hir) for hir in generate_ir_high(ast)]
+
+def run(code:str, inputs:dict[str, int]) -> dict[str, int]:
+    result = compile_source(code)
+    simulator = Simulator(result.lir, result.variables)
+    simulator.load_variables(inputs)
+    return simulator.run().variables
+
+def test_while_is_guarded_and_tests_at_the_bottom():
+    assert hir_of("    while(i < 5){ r = r + 1; }") == [
+        ".t0 = i >= 5", "IF .t0 GOTO .Lbreak0", ".Lloop0:", ".t1 = r + 1", "r = .t1", ".t2 = i < 5", "IF .t2 GOTO .Lloop0", ".Lbreak0:",
+    ]
+
+def test_do_while_has_no_guard():
+    assert hir_of("    do { r = r + 1; } while(r < 5);") == [".Lloop0:", ".t0 = r + 1", "r = .t0", ".t1 = r < 5", "IF .t1 GOTO .Lloop0"]
+
+def test_break_and_continue_jump_to_the_loop_labels():
+    lines = hir_of("    for(i = 0; i < 3; i++){\n        if(i == 1) continue;\n        if(r == 9) break;\n    }")
+    assert "GOTO .Lcontinue0" in lines and "GOTO .Lbreak0" in lines
+    assert lines.index(".Lcontinue0:") < lines.index("IF .t5 GOTO .Lloop0") < lines.index(".Lbreak0:")
+
+def test_break_outside_a_loop_is_rejected():
+    with pytest.raises(NotImplementedError):
+        hir_of("    break;")
+
+@pytest.mark.parametrize('a', [0, 1, 4, 9, 200])
+def test_loops_compute_the_same_result(a):
+    code = """char a;
+char r;
+void main(){
+    char i;
+    r = 0;
+    for(i = 0; i < a; i++){
+        if(i == 3) continue;
+        r = r + i;
+        if(r > 40) break;
+    }
+    while(r > 20){
+        r = r - 7;
+    }
+    do {
+        r = r + 1;
+    } while(r < 2);
+}
+"""
+    r = 0
+    for i in range(a):
+        if i == 3:
+            continue
+        r += i
+        if r > 40:
+            break
+    while r > 20:
+        r -= 7
+    r += 1
+    while r < 2:
+        r += 1
+    assert run(code, {'a': a})['r'] == r
+
+def test_invariant_moves_to_the_preheader():
+    assert hoist(LOOP) == ["i = 0", ".t1 = a & b", ".Lloop0:", "r = r + .t1", "i = i + 1", ".t4 = i < 5", "IF .t4 GOTO .Lloop0"]
+
+def test_volatile_operands_are_not_hoisted():
+    symbol_table = generate_symbol_table(pcp.CParser().parse("volatile char a;\nchar b;\nchar r;\nvoid main(){}\n")).scope('main')
+    assert hoist(LOOP, symbol_table) == LOOP
+
+def test_globals_are_not_invariant_across_calls():
+    lines = ["i = 0", ".Lloop0:", ".t1 = a & b", "x = .t1", ".t0 = CALL f0()", "i = i + 1", ".t4 = i < 5", "IF .t4 GOTO .Lloop0"]
+    assert hoist(lines) == lines
+
+def test_conditional_definition_live_at_the_exit_stays():
+    lines = ["i = 0", ".Lloop0:", ".t4 = i >= 5", "IF .t4 GOTO .Lend0", "x = a + 1", "i = i + x", "GOTO .Lloop0", ".Lend0:", "r = x"]
+    assert hoist(lines) == lines
+
+def test_volatile_global_is_read_inside_the_loop():
+    code = """volatile char a;
+char r;
+void main(){
+    char i;
+    for(i = 0; i < 4; i++){
+        r = r + (a & 3);
+    }
+}
+"""
+    hir = compile_source(code).hir
+    (mask,) = [line for line in hir if '&' in line]
+    assert hir.index(mask) > hir.index('.Lmain_loop0:')
@@ -0,0 +1,59 @@
+import pytest
+
+from modules.MemoryManager import FreeListAllocator, AllocationPolicy, VariableManager, VariableTypes, AddressType
+
+
+def test_first_fit_takes_the_lowest_hole():
+    allocator = FreeListAllocator(0, 15)
+    a, b, c = allocator.allocate(4), allocator.allocate(2), allocator.allocate(4)
+    assert (a, b, c) == (0, 4, 6)
+    allocator.free(a)
+    allocator.free(c)
+    assert allocator.allocate(2) == 0
+
+def test_best_fit_takes_the_tightest_hole():
+    allocator = FreeListAllocator(0, 15, AllocationPolicy.BEST_FIT)
+    a, b, c, d = (allocator.allocate(size) for size in (4, 1, 2, 1))
+    allocator.free(a)
+    allocator.free(c)
+    assert allocator.allocate(2) == c
+
+def test_alignment_keeps_the_padding_free():
+    allocator = FreeListAllocator(0, 15)
+    assert allocator.allocate(1) == 0
+    assert allocator.allocate(2, 2) == 2
+    assert allocator.is_free(1)
+    assert allocator.allocate(1) == 1
+
+def test_freeing_merges_neighbours():
+    allocator = FreeListAllocator(0, 15)
+    addresses = [allocator.allocate(4) for _ in range(4)]
+    for address in (addresses[0], addresses[2], addresses[1]):
+        allocator.free(address)
+    stats = allocator.stats()
+    assert (stats.free_blocks, stats.largest_free_block, stats.used) == (1, 12, 4)
+    assert stats.fragmentation == 0.0
+
+def test_fragmentation_and_errors():
+    allocator = FreeListAllocator(0, 7)
+    addresses = [allocator.allocate(2) for _ in range(4)]
+    allocator.free(addresses[0])
+    allocator.free(addresses[2])
+    assert allocator.stats().fragmentation == 0.5
+    with pytest.raises(MemoryError):
+        allocator.allocate(3)
+    with pytest.raises(ValueError):
+        allocator.free(addresses[0])
+
+def test_variable_manager_reuses_freed_addresses():
+    manager = VariableManager(0, 7)
+    first = manager.create_variable('a', VariableTypes.char)
+    manager.create_variable('b', VariableTypes.int)
+    manager.free_variable('a')
+    assert manager.create_variable('c', VariableTypes.char).address.address == first.address.address
+    with pytest.raises(ValueError):
+        manager.create_variable('b', VariableTypes.char)
+    with pytest.raises(ValueError):
+        manager.free_variable('a')
+    with pytest.raises(NotImplementedError):
+        manager.create_variable('d', VariableTypes.char, AddressType.STACK)
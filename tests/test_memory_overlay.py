@@ -0,0 +1,89 @@
+import pycparser as pcp
+
+from entities.HirLine import HirLine
+from modules.MemoryManager import VariableManager, VariableTypes
+from modules.MemoryOverlay import build_call_graph, find_recursive_functions, plan_function_frame, plan_overlay
+from modules.SymbolTableGen import generate_symbol_table
+
+CODE = """char g;
+void f0(){
+    char x = g + 1;
+    g = x;
+    char y = g + 2;
+    g = y;
+}
+void f1(){
+    char z = g;
+    g = z + 3;
+}
+void f2(){
+    char w = g;
+    f0();
+    g = w;
+}
+void r0(){
+    char v = g;
+    r1();
+}
+void r1(){
+    r0();
+}
+void main(){
+    f1();
+    f2();
+}
+"""
+
+HIR = {
+    'f0': ["x = g + 1", "g = x", "y = g + 2", "g = y"],
+    'f1': ["z = g", "g = z + 3"],
+    'f2': ["w = g", ".t0 = CALL f0()", "g = w"],
+    'r0': ["v = g", ".t0 = CALL r1()"],
+    'r1': [".t0 = CALL r0()"],
+}
+
+
+def plan(memory_temps=None):
+    ast = pcp.CParser().parse(CODE)
+    return plan_overlay(ast, {name: HirLine.parse_hir_lines(lines) for name, lines in HIR.items()}, memory_temps)
+
+def test_call_graph_and_recursion():
+    call_graph = build_call_graph(pcp.CParser().parse(CODE))
+    assert call_graph['main'] == {'f1', 'f2'} and call_graph['f2'] == {'f0'}
+    assert find_recursive_functions(call_graph) == {'r0', 'r1'}
+    assert find_recursive_functions({'a': {'a'}, 'b': set()}) == {'a'}
+
+def test_disjoint_lifetimes_share_an_offset():
+    frame = plan_function_frame('f0', HirLine.parse_hir_lines(HIR['f0']), {'x': VariableTypes.char, 'y': VariableTypes.char}, {'g'})
+    assert frame.offsets == {'x': 0, 'y': 0}
+    assert (frame.size, frame.saved) == (1, 1)
+
+def test_overlapping_lifetimes_do_not():
+    lines = HirLine.parse_hir_lines(["x = g + 1", "y = g + 2", "g = x + y"])
+    frame = plan_function_frame('f', lines, {'x': VariableTypes.char, 'y': VariableTypes.char}, {'g'})
+    assert sorted(frame.offsets.values()) == [0, 1]
+
+def test_siblings_share_and_callees_sit_above_callers():
+    overlay = plan(memory_temps={})
+    frames = overlay.frames
+    assert 'r0' not in frames and overlay.recursive == {'r0', 'r1'}
+    # f1 and f2 are never active together; f0 runs while f2's w is live.
+    assert frames['f1'].base == frames['f2'].base == 0
+    assert frames['f0'].base >= frames['f2'].base + frames['f2'].size
+    assert overlay.region_size == 2
+    # Four bytes of locals in two.
+    assert overlay.saved == 2
+
+def test_memory_temps_join_the_frame():
+    assert '.t0' in plan().frames['f2'].offsets
+    assert '.t0' not in plan(memory_temps={}).frames['f2'].offsets
+
+def test_variable_manager_names_overlaid_locals_per_function():
+    overlay = plan(memory_temps={})
+    manager = VariableManager()
+    manager.load_symbol_table(generate_symbol_table(pcp.CParser().parse(CODE)), overlay)
+    manager.load_overlay(overlay)
+    assert manager.get_variable('z', 'f1').address.address == manager.get_variable('w', 'f2').address.address
+    addresses = manager.addresses_for('f0')
+    assert {'g', 'x', 'y'} <= set(addresses) and 'z' not in addresses
+    assert addresses['x'] != addresses['g']
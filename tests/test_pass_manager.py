@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from entities.HirLine import HirLine, AssignmentHirLine
+from entities.SymbolTable import SymbolTable
+from modules.FrontEnd import FrontEndService
+from modules.HIRGen import generate_ir_high
+from modules.HIROptimizer import optimize_hir
+from modules.PassManager import PassManager, PassState, HirPass, PassGroup, Analysis, lines_changed
+from modules.SymbolTableGen import generate_symbol_table
+
+
+def drop_first_zero(state):
+    # Removes one `x = 0` per run, so the group needs a run per line.
+    for i, hir in enumerate(state.hir_lines):
+        if isinstance(hir, AssignmentHirLine) and hir.value == 0:
+            return state.hir_lines[:i] + state.hir_lines[i + 1:]
+    return state.hir_lines
+
+def manager_with(passes:list[HirPass], analyses:list[Analysis] = (), fixed_point:bool = True) -> PassManager:
+    manager = PassManager()
+    for analysis in analyses:
+        manager.register_analysis(analysis)
+    for hir_pass in passes:
+        manager.register(hir_pass)
+    manager.add_group(PassGroup('main', [hir_pass.name for hir_pass in passes], fixed_point))
+    return manager
+
+def test_fixed_point_runs_until_nothing_changes():
+    manager = manager_with([HirPass('drop', drop_first_zero)])
+    lines = HirLine.parse_hir_lines([".t0 = 0", "y = 1", "z = 0"])
+    state = manager.run(lines, SymbolTable())
+    assert [str(hir) for hir in state.hir_lines] == ["y = 1"]
+    assert [stats.changed for stats in manager.stats] == [True, True, False]
+    assert [(stats.instructions_in, stats.instructions_out) for stats in manager.stats] == [(3, 2), (2, 1), (1, 1)]
+    assert manager.stats[0].temps_removed == 1
+    assert manager_with([HirPass('drop', drop_first_zero)], fixed_point=False).run(lines, SymbolTable()).hir_lines != state.hir_lines
+
+def test_schedule_follows_after_and_rejects_cycles():
+    noop = lambda state: state.hir_lines
+    manager = manager_with([HirPass('b', noop, after=('a',)), HirPass('a', noop)])
+    assert [hir_pass.name for hir_pass in manager.schedule(manager.groups[0])] == ['a', 'b']
+    manager.register(HirPass('c', noop, after=('d',)))
+    manager.register(HirPass('d', noop, after=('c',)))
+    manager.add_group(PassGroup('cycle', ['c', 'd']))
+    with pytest.raises(ValueError):
+        manager.schedule(manager.groups[1])
+
+def test_unknown_names_are_rejected():
+    manager = PassManager()
+    with pytest.raises(ValueError):
+        manager.register(HirPass('p', lambda state: state.hir_lines, requires=('missing',)))
+    with pytest.raises(ValueError):
+        manager.add_group(PassGroup('g', ['missing']))
+
+def test_changes_invalidate_dependent_analyses():
+    builds = []
+    analyses = [
+        Analysis('base', lambda state: builds.append('base') or len(state.hir_lines)),
+        Analysis('derived', lambda state: builds.append('derived') or state.analysis('base'), depends=('base',)),
+        Analysis('other', lambda state: builds.append('other')),
+    ]
+    passes = [
+        HirPass('use', lambda state: state.hir_lines, requires=('derived', 'other')),
+        HirPass('drop', drop_first_zero, after=('use',), invalidates=('base',)),
+    ]
+    manager = manager_with(passes, analyses, fixed_point=False)
+    state = manager.run(HirLine.parse_hir_lines(["x = 0", "y = 1"]), SymbolTable())
+    assert builds == ['derived', 'base', 'other']
+    assert set(state.analyses) == {'other'}
+
+def test_json_and_chrome_trace_export(tmp_path):
+    manager = manager_with([HirPass('drop', drop_first_zero)])
+    manager.run(HirLine.parse_hir_lines(["x = 0", "y = 1"]), SymbolTable())
+    passes = json.loads(manager.to_json())['passes']
+    assert [(entry['name'], entry['group'], entry['iteration']) for entry in passes] == [('drop', 'main', 0), ('drop', 'main', 1)]
+    trace = manager.to_chrome_trace()
+    events = trace['traceEvents']
+    assert [event['ph'] for event in events] == ['X', 'X']
+    assert events[0]['ts'] + events[0]['dur'] <= events[1]['ts']
+    assert events[0]['args']['changed'] and not events[1]['args']['changed']
+    path = tmp_path / 'trace.json'
+    manager.write_chrome_trace(str(path))
+    assert json.loads(path.read_text()) == json.loads(json.dumps(trace))
+
+def test_change_detection_is_by_identity_then_text():
+    lines = HirLine.parse_hir_lines(["x = a + 1", "y = x"])
+    assert not lines_changed(lines, list(lines))
+    assert not lines_changed(lines, [lines[0], HirLine.parse_hir_line("y = x")])
+    assert lines_changed(lines, [lines[0], HirLine.parse_hir_line("y = a")])
+    assert lines_changed(lines, lines[:1])
+
+def test_unchanged_pass_keeps_the_analyses():
+    builds = []
+    copy = lambda state: [HirLine.parse_hir_line(str(hir)) for hir in state.hir_lines]
+    manager = manager_with([HirPass('copy', copy, requires=('count',))], [Analysis('count', lambda state: builds.append(1) or len(state.hir_lines))])
+    lines = HirLine.parse_hir_lines(["x = 1", "y = x"])
+    state = manager.run(lines, SymbolTable())
+    assert state.hir_lines is lines
+    assert builds == [1] and 'count' in state.analyses
+
+def test_temp_count_is_cached_until_the_lines_change():
+    state = PassState(HirLine.parse_hir_lines([".t0 = a", ".t1 = .t0 + 1", "x = .t1"]), SymbolTable(), PassManager())
+    assert state.temp_count == 2
+    state.set_lines(HirLine.parse_hir_lines(["x = a + 1"]))
+    assert state.temp_count == 0
+
+def test_optimizer_does_not_mutate_its_input():
+    code = "char a;\nchar r;\nvoid main(){\n    char k = 3;\n    r = a + k;\n    r = r * 4;\n}\n"
+    ast = FrontEndService().parse(code)
+    lines = generate_ir_high(ast)
+    before = [str(hir) for hir in lines]
+    optimized = optimize_hir(lines, generate_symbol_table(ast).scope('main'))
+    assert [str(hir) for hir in lines] == before
+    assert [str(hir) for hir in optimized] != before
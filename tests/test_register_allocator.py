@@ -0,0 +1,80 @@
+import pytest
+
+from entities.HirLine import HirLine
+from modules.BatchDriver import compile_source
+from modules.RegisterAllocator import InterferenceGraph, allocate_registers, coalesce, colour_graph
+from modules.Simulator import Simulator
+
+REGISTERS = ["RA", "RB", "RD"]
+
+
+def allocate(lines:list[str]):
+    return allocate_registers(HirLine.parse_hir_lines(lines))
+
+def test_live_temps_get_distinct_registers():
+    allocation = allocate([".t0 = a + 1", ".t1 = b + 2", "x = .t0 + .t1"])
+    assert not allocation.spilled
+    assert allocation.get_register('.t0') != allocation.get_register('.t1')
+
+def test_pressure_spills_and_reallocates():
+    allocation = allocate([
+        ".t0 = a + 1", ".t1 = b + 2", ".t2 = c + 3", ".t3 = d + 4",
+        ".t4 = .t0 + .t1", ".t5 = .t2 + .t3", "x = .t4 + .t5",
+    ])
+    assert allocation.spilled
+    assert allocation.rounds > 1
+    assert not allocation.spilled & set(allocation.registers)
+
+def test_copy_is_coalesced():
+    allocation = allocate([".t0 = a + 1", ".t1 = .t0", "x = .t1 + b"])
+    assert allocation.coalesced_moves == 1
+    assert allocation.get_register('.t0') == allocation.get_register('.t1')
+
+def test_constant_prefers_the_immediate_register():
+    assert allocate([".t0 = 5", "x = .t0 + b"]).get_register('.t0') == 'RA'
+
+def test_named_variables_need_a_symbol_table():
+    allocation = allocate(["x = a + 1", "y = x + 2"])
+    assert allocation.registers == {}
+
+def test_colouring_respects_interference():
+    graph = InterferenceGraph(REGISTERS)
+    for node in 'abc':
+        graph.add_node(node)
+    graph.add_edge('a', 'b')
+    graph.add_edge('b', 'c')
+    graph.add_edge('a', 'RB')
+    colours, spilled = colour_graph(graph, REGISTERS, {})
+    assert not spilled
+    assert colours['a'] != colours['b'] != colours['c']
+    assert colours['a'] != 'RB'
+
+def test_coalescing_skips_interfering_pairs():
+    graph = InterferenceGraph(REGISTERS)
+    for node in 'abc':
+        graph.add_node(node)
+    graph.add_edge('a', 'b')
+    graph.add_move('a', 'b', 5)
+    graph.add_move('b', 'c', 1)
+    alias = coalesce(graph, len(REGISTERS))
+    assert alias == {'c': 'b'}
+    assert graph.interferes('b', 'a') and 'c' not in graph.adjacency
+
+@pytest.mark.parametrize('a, b', [(3, 4), (200, 100), (255, 1)])
+def test_allocated_locals_keep_their_values(a, b):
+    code = """char a;
+char b;
+char r;
+void main(){
+    char x = a + 1;
+    char y = b + 2;
+    char z = x ^ y;
+    char w = x - y;
+    r = z + w + x + y;
+}
+"""
+    result = compile_source(code)
+    simulator = Simulator(result.lir, result.variables)
+    simulator.load_variables({'a': a, 'b': b})
+    x, y = (a + 1) & 0xFF, (b + 2) & 0xFF
+    assert simulator.run().variables['r'] == ((x ^ y) + (x - y) + x + y) & 0xFF
@@ -0,0 +1,67 @@
+import itertools
+
+import pytest
+
+from modules.BatchDriver import compile_source
+from modules.FrontEnd import FrontEndService
+from modules.HIRGen import generate_ir_high
+from modules.Simulator import Simulator
+
+
+def hir_of(body:str) -> list[str]:
+    ast = FrontEndService().parse(f"char a;\nchar b;\nchar r;\nvoid main(){{\n    {body}\n}}\n")
+    return [str(hir) for hir in generate_ir_high(ast)]
+
+def run(code:str, inputs:dict[str, int]) -> dict[str, int]:
+    result = compile_source(code)
+    simulator = Simulator(result.lir, result.variables)
+    simulator.load_variables(inputs)
+    return simulator.run().variables
+
+def test_and_jumps_out_on_the_first_false_operand():
+    assert hir_of("if(a && b){ r = 1; }") == [".t0 = a == 0", "IF .t0 GOTO .Lelse0", ".t1 = b == 0", "IF .t1 GOTO .Lelse0", "r = 1", ".Lelse0:"]
+
+def test_or_skips_the_right_operand_on_true():
+    assert hir_of("if(a || b){ r = 1; }") == [
+        ".t0 = a != 0", "IF .t0 GOTO .Lskip0", ".t1 = b == 0", "IF .t1 GOTO .Lelse0", ".Lskip0:", "r = 1", ".Lelse0:",
+    ]
+
+def test_not_flips_the_jumps_instead_of_computing_a_value():
+    lines = hir_of("if(!(a > 2 || b)){ r = 1; }")
+    assert lines == [".t0 = a > 2", "IF .t0 GOTO .Lelse0", ".t1 = b != 0", "IF .t1 GOTO .Lelse0", "r = 1", ".Lelse0:"]
+    assert not any(' not ' in line for line in lines)
+
+def test_value_context_materializes_zero_or_one():
+    assert hir_of("r = a && b;") == [
+        ".t0 = 0", ".t1 = a == 0", "IF .t1 GOTO .Lbool0", ".t2 = b == 0", "IF .t2 GOTO .Lbool0", ".t0 = 1", ".Lbool0:", "r = .t0",
+    ]
+
+def test_constant_operand_becomes_an_unconditional_jump():
+    assert "GOTO .Lelse0" in hir_of("if(a && 0){ r = 1; }")
+
+@pytest.mark.parametrize('a', [0, 1, 7])
+def test_right_operand_side_effect_only_runs_when_needed(a):
+    code = "char a;\nchar b;\nchar r;\nvoid main(){\n    r = a || (b = 3);\n}\n"
+    assert run(code, {'a': a, 'b': 0}) == {'a': a, 'b': 0 if a else 3, 'r': 1}
+    code = code.replace("||", "&&")
+    assert run(code, {'a': a, 'b': 0}) == {'a': a, 'b': 3 if a else 0, 'r': 1 if a else 0}
+
+def test_compound_conditions_match_c():
+    code = """char a;
+char b;
+char c;
+char r;
+void main(){
+    r = 0;
+    if((a > 2 && b) || !(c == 1 || a < b)){
+        r = 1;
+    }
+    r = r + ((a || b) && c) * 2;
+}
+"""
+    result = compile_source(code)
+    for a, b, c in itertools.product([0, 1, 3, 200], [0, 1, 5], [0, 1, 2]):
+        simulator = Simulator(result.lir, result.variables)
+        simulator.load_variables({'a': a, 'b': b, 'c': c})
+        expected = int(bool((a > 2 and b) or not (c == 1 or a < b))) + int(bool((a or b) and c)) * 2
+        assert simulator.run().variables['r'] == expected, (a, b, c)
@@ -0,0 +1,86 @@
+import pytest
+
+from helpers.ArchitectureHelper import INSTRUCTION_CYCLES, INSTRUCTION_BYTES, JCC_NOT_TAKEN_CYCLES
+from modules.Simulator import Simulator
+
+
+def run(lines, addresses=None, variables=None):
+    simulator = Simulator(lines, addresses)
+    if variables:
+        simulator.load_variables(variables)
+    return simulator.run()
+
+def test_alu_ops_wrap_to_8_bits():
+    for opcode, expected in [('ADD', (200 + 100) & 0xFF), ('SUB', (100 - 200) & 0xFF), ('AND', 100 & 200), ('OR', 100 | 200), ('XOR', 100 ^ 200)]:
+        result = run(["LDI 100", "MOV RD RA", "LDI 200", f"{opcode} RA", "MOV var:x ACC"])
+        assert result.variables['x'] == expected, opcode
+
+def test_ldi_truncates_to_8_bits():
+    result = run(["LDI 300", "MOV var:x RA"])
+    assert result.variables['x'] == 300 & 0xFF
+
+def test_loads_and_stores_go_through_the_given_addresses():
+    result = run(["MOV RD var:a", "MOV RB RD", "MOV var:b RB"], {'a': 0x10, 'b': 0x20}, {'a': 42})
+    assert result.memory[0x20] == 42
+    assert result.variables == {'a': 42, 'b': 42}
+    assert (result.loads, result.stores) == (1, 1)
+    assert (result.registers['MARL'], result.registers['MARH']) == (0x20, 0x00)
+
+def test_assembled_operands_address_memory_directly():
+    result = run(["LDI 7", "MOV [0x0102] RA", "MOV RB [0x0102]"])
+    assert result.memory[0x0102] == 7
+    assert result.registers['RB'] == 7
+    assert (result.registers['MARL'], result.registers['MARH']) == (0x02, 0x01)
+
+def test_unknown_variable_is_an_error_with_explicit_addresses():
+    with pytest.raises(ValueError):
+        Simulator(["MOV var:x RA"], {'y': 0})
+
+@pytest.mark.parametrize('jump, left, right, taken', [
+    ('JEQ', 5, 5, True), ('JEQ', 5, 6, False),
+    ('JNE', 5, 6, True), ('JNE', 5, 5, False),
+    # Comparisons are unsigned: 200 is not below 10.
+    ('JLT', 10, 200, True), ('JLT', 200, 10, False),
+    ('JGT', 200, 10, True), ('JGT', 10, 10, False),
+    ('JLE', 10, 10, True), ('JLE', 11, 10, False),
+    ('JGE', 10, 10, True), ('JGE', 9, 10, False),
+])
+def test_conditional_jumps_compare_rd_with_the_source(jump, left, right, taken):
+    result = run([
+        f"LDI {left}", "MOV RD RA", f"LDI {right}", "CMP RA",
+        f"{jump} .Ltaken",
+        "LDI 0", "MOV var:x RA", "JMP .Lend",
+        ".Ltaken:",
+        "LDI 1", "MOV var:x RA",
+        ".Lend:",
+    ])
+    assert result.variables['x'] == (1 if taken else 0)
+
+def test_cycles_count_taken_and_fallthrough_jumps_separately():
+    program = [
+        "LDI 3", "MOV RB RA", "LDI 1", "MOV RD RA",
+        ".Lloop:",
+        "MOV RD RB", "SUB RD", "MOV RD RB",
+        "LDI 1", "SUB RA", "MOV RB ACC", "MOV RD RB", "LDI 0", "CMP RA",
+        "JNE .Lloop",
+    ]
+    result = run(program)
+    assert result.registers['RB'] == 0
+    jump = len(program) - 2
+    assert result.counts[jump] == 3
+    assert result.taken[jump] == 2
+    assert result.instruction_cycles()[jump] == 2 * INSTRUCTION_CYCLES['JCC'] + JCC_NOT_TAKEN_CYCLES
+    assert result.cycles == sum(result.instruction_cycles())
+
+def test_code_size_and_addresses_follow_the_instruction_table():
+    result = run(["LDI 1", "MOV var:x RA", "MOV RD var:x", "ADD RA", "JMP .Lend", ".Lend:"])
+    kinds = ['LDI', 'STORE', 'LOAD', 'ALU', 'JMP']
+    assert [instruction.kind for instruction in result.program] == kinds
+    assert result.code_size == sum(INSTRUCTION_BYTES[kind] for kind in kinds)
+    assert [instruction.address for instruction in result.program] == [0, 2, 5, 8, 9]
+    # The jump leaves its target, the end of the program, in PRL/PRH.
+    assert result.registers['PRL'] == result.code_size
+
+def test_infinite_loop_stops_at_max_steps():
+    with pytest.raises(RuntimeError):
+        Simulator([".Lloop:", "JMP .Lloop"]).run(max_steps=100)
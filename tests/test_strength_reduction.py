@@ -0,0 +1,69 @@
+import pycparser as pcp
+import pytest
+
+from entities.HirLine import HirLine, ArithmeticOpHirLine
+from modules.BatchDriver import compile_source
+from modules.Simulator import Simulator
+from modules.StrengthReduction import multiplication_chain, reduce_strength, CHAIN_OPERAND, CHAIN_ZERO
+from modules.SymbolTableGen import generate_symbol_table
+
+
+def evaluate_chain(node, x:int) -> int:
+    if node == CHAIN_OPERAND:
+        return x
+    if node == CHAIN_ZERO:
+        return 0
+    operator, left, right = node
+    left, right = evaluate_chain(left, x), evaluate_chain(right, x)
+    return (left + right if operator == '+' else left - right) & 0xFF
+
+def reduce(lines:list[str], symbol_table=None) -> list[str]:
+    return [str(hir) for hir in reduce_strength(HirLine.parse_hir_lines(lines), symbol_table)]
+
+def test_every_chain_computes_its_product():
+    for factor in range(256):
+        cost, tree = multiplication_chain(factor)
+        assert all(evaluate_chain(tree, x) == (x * factor) & 0xFF for x in (1, 3, 77, 255)), factor
+
+def test_chain_costs():
+    assert multiplication_chain(8)[0] == 3
+    assert multiplication_chain(255)[0] == 1
+    assert multiplication_chain(10)[0] == 4
+    assert max(multiplication_chain(factor)[0] for factor in range(256)) <= 10
+
+def test_multiply_by_constant_becomes_additions():
+    assert reduce(["x = a * 4"]) == [".t0 = a + a", "x = .t0 + .t0"]
+    assert reduce(["x = 3 * a"]) == [".t0 = a + a", "x = .t0 + a"]
+    assert reduce(["x = a << 1"]) == ["x = a + a"]
+    assert reduce(["x = a * b"]) == ["x = a * b"]
+
+def test_power_of_two_modulo_is_a_mask():
+    assert reduce(["x = a % 8"]) == ["x = a & 7"]
+    assert reduce(["x = a / 1", "y = a % 1", "z = a / 0"]) == ["x = a", "y = 0", "z = 0"]
+
+def test_division_is_unrolled_with_fresh_names():
+    lines = reduce([".t4 = a / 64", ".Ldiv0:"])
+    assert not any(isinstance(hir, ArithmeticOpHirLine) and hir.operator in ('/', '%', '*', '<<', '>>') for hir in HirLine.parse_hir_lines(lines))
+    assert lines[:2] == [".t5 = a", ".t6 = 0"]
+    assert lines.count("IF .t7 GOTO .Ldiv1") == 1 and ".Ldiv0:" in lines[-1:]
+
+def test_volatile_multiplicand_is_read_once():
+    symbol_table = generate_symbol_table(pcp.CParser().parse("volatile char v;\nvoid main(){}\n")).scope('main')
+    lines = reduce(["x = v * 3"], symbol_table)
+    assert [line for line in lines if 'v' in line.split()] == [".t0 = v"]
+
+@pytest.mark.parametrize('expression, expected', [
+    ('a * 10', lambda a: a * 10),
+    ('a * 255', lambda a: a * 255),
+    ('a << 3', lambda a: a << 3),
+    ('a / 7', lambda a: a // 7),
+    ('a % 10', lambda a: a % 10),
+    ('a >> 5', lambda a: a >> 5),
+    ('a / 200', lambda a: a // 200),
+])
+def test_reduced_code_keeps_the_result(expression, expected):
+    result = compile_source(f"char a;\nchar r;\nvoid main(){{\n    r = {expression};\n}}\n")
+    for a in range(256):
+        simulator = Simulator(result.lir, result.variables)
+        simulator.load_variables({'a': a})
+        assert simulator.run().variables['r'] == expected(a) & 0xFF, a
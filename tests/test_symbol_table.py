@@ -0,0 +1,70 @@
+import pytest
+
+from entities.SymbolTable import SymbolTable, SymbolType, SymbolScope, SymbolQualifier
+from modules.BatchDriver import compile_source
+from modules.FrontEnd import FrontEndService
+from modules.HIRGen import generate_ir_high
+from modules.Simulator import Simulator
+from modules.SymbolTableGen import generate_symbol_table
+
+SHADOWING = """char x = 1;
+char r;
+void main(){
+    char y = x + 1;
+    char x = y + 2;
+    {
+        char x = 10;
+        r = x;
+    }
+    r = r + x;
+    for(char y = 0; y < 2; y++){
+        r = r + y;
+    }
+    r = r + y;
+}
+"""
+
+
+def test_scopes_look_up_outwards_and_number_densely():
+    root = SymbolTable()
+    root.add('g', SymbolType.CHAR, SymbolScope.GLOBAL)
+    root.add('h', SymbolType.INT, SymbolScope.GLOBAL)
+    f0, f1 = root.enter_scope('f0'), root.enter_scope('f1')
+    f0.add('a', SymbolType.CHAR, SymbolScope.LOCAL)
+    f1.add('b', SymbolType.CHAR, SymbolScope.LOCAL, SymbolQualifier.VOLATILE)
+    assert f0.get('g') is root.get('g') and f0.get('b') is None
+    assert (f0.id_of('a'), f1.id_of('b')) == (2, 2)
+    assert f0.names_by_id() == ['g', 'h', 'a'] and f1.by_id(2).name == 'b'
+    assert root.scope('missing') is root and f0.root is root
+
+def test_redeclaration_keeps_the_id_and_late_globals_are_rejected():
+    root = SymbolTable()
+    root.add('g', SymbolType.CHAR, SymbolScope.GLOBAL)
+    root.add('g', SymbolType.INT, SymbolScope.GLOBAL)
+    assert root.id_of('g') == 0 and root.get('g').type == SymbolType.INT
+    root.enter_scope('main')
+    with pytest.raises(ValueError):
+        root.add('late', SymbolType.CHAR, SymbolScope.GLOBAL)
+
+def test_shadowing_locals_are_renamed():
+    ast = FrontEndService().parse(SHADOWING)
+    main = generate_symbol_table(ast).scope('main')
+    assert sorted(name for name, _ in main.table.items()) == ['x.1', 'x.2', 'y', 'y.1']
+    assert main.get('x').scope == SymbolScope.GLOBAL
+    hir = [str(line) for line in generate_ir_high(ast)]
+    assert "x.2 = 10" in hir and "r = x.2" in hir
+    assert not any(line.startswith("x = ") for line in hir[1:])
+
+def test_item_view_lists_shadowed_names_once():
+    root = SymbolTable()
+    root.add('a', SymbolType.CHAR, SymbolScope.GLOBAL)
+    scope = root.enter_scope('main')
+    scope.add('a', SymbolType.INT, SymbolScope.LOCAL)
+    assert [(name, symbol.scope) for name, symbol in scope.items()] == [('a', SymbolScope.LOCAL)]
+
+def test_renamed_program_keeps_c_scoping():
+    result = compile_source(SHADOWING)
+    simulator = Simulator(result.lir, result.variables)
+    variables = simulator.run().variables
+    # y = 2 and x.1 = 4; r = 10 from the block, + 4, + 0 + 1 from the loop, + 2.
+    assert (variables['x'], variables['r']) == (1, 17)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from entities.HirLine import HirLine
+from helpers.TraceHelper import configure, get_tracer, parse_trace_spec, TraceLevel, TraceCategory, MemorySink, RingBufferSink, JsonlSink
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    configure('')
+
+def test_spec_parsing():
+    assert parse_trace_spec('') == (TraceLevel.OFF, {})
+    assert parse_trace_spec('info, optimizer=debug,symbols') == (TraceLevel.INFO, {'optimizer': TraceLevel.DEBUG, 'symbols': TraceLevel.DEBUG})
+    with pytest.raises(ValueError):
+        parse_trace_spec('optimizer=loud')
+
+def test_levels_gate_per_category():
+    sink = MemorySink()
+    configure('warning,optimizer=info', [sink])
+    optimizer, symbols = get_tracer(TraceCategory.OPTIMIZER), get_tracer(TraceCategory.SYMBOLS)
+    assert (optimizer.info, optimizer.debug, symbols.warning, symbols.info) == (True, False, True, False)
+    optimizer.emit(TraceLevel.INFO, 'kept', n=1)
+    optimizer.emit(TraceLevel.DEBUG, 'dropped')
+    symbols.emit(TraceLevel.INFO, 'dropped')
+    symbols.emit(TraceLevel.WARNING, 'kept')
+    assert [(event.category, event.name) for event in sink.events] == [('optimizer', 'kept'), ('symbols', 'kept')]
+    assert sink.events[0].as_dict()['fields'] == {'n': 1}
+
+def test_tracers_created_before_configure_are_updated():
+    tracer = get_tracer('test.late')
+    assert not tracer.debug
+    configure('test.late=debug', [MemorySink()])
+    assert tracer.debug
+    configure('')
+    assert tracer.level == TraceLevel.OFF
+
+def test_ring_buffer_keeps_the_last_events():
+    sink = RingBufferSink(capacity=2)
+    configure('debug', [sink])
+    for i in range(5):
+        get_tracer(TraceCategory.OPTIMIZER).emit(TraceLevel.DEBUG, 'event', i=i)
+    assert [event.fields['i'] for event in sink.events] == [3, 4]
+
+def test_folding_is_traced_only_when_enabled():
+    sink = MemorySink()
+    configure('', [sink])
+    HirLine.parse_hir_line("x = 2 + 3").evaluate_if_possible()
+    assert sink.events == []
+    configure('hir.fold=debug', [sink])
+    HirLine.parse_hir_line("x = 2 + 3").evaluate_if_possible()
+    assert [(event.name, event.fields) for event in sink.events] == [('fold', {'line': "x = 2 + 3", 'value': 5})]
+
+def test_jsonl_sink_writes_one_object_per_line(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    configure('symbols=info', [JsonlSink(str(path))])
+    get_tracer(TraceCategory.SYMBOLS).emit(TraceLevel.INFO, 'declare', name='a')
+    configure('')
+    (line,) = path.read_text().splitlines()
+    event = json.loads(line)
+    assert (event['category'], event['level'], event['name'], event['fields']) == ('symbols', 'info', 'declare', {'name': 'a'})
@@ -0,0 +1,50 @@
+import pycparser as pcp
+
+from entities.HirLine import HirLine
+from modules.SymbolTableGen import generate_symbol_table
+from modules.ValueNumbering import eliminate_common_subexpressions
+
+
+def cse(lines:list[str], symbol_table=None) -> list[str]:
+    return [str(hir) for hir in eliminate_common_subexpressions(HirLine.parse_hir_lines(lines), symbol_table)]
+
+def test_recomputation_becomes_a_copy():
+    assert cse(["x = a + b", "y = a + b"]) == ["x = a + b", "y = x"]
+
+def test_commutative_operands_are_normalized():
+    assert cse(["x = a + b", "y = b + a"]) == ["x = a + b", "y = x"]
+    assert cse(["x = a - b", "y = b - a"]) == ["x = a - b", "y = b - a"]
+
+def test_copies_share_the_value_number():
+    assert cse(["x = a + b", "y = x", "z = a + b"]) == ["x = a + b", "y = x", "z = x"]
+
+def test_redefining_an_operand_invalidates():
+    lines = ["x = a + b", "a = 1", "y = a + b"]
+    assert cse(lines) == lines
+
+def test_redefining_the_holder_invalidates():
+    lines = ["x = a + b", "x = 5", "y = a + b"]
+    assert cse(lines) == lines
+
+def test_dominating_block_is_reused_in_both_branches_and_the_join():
+    lines = ["x = a + b", "c = x >= 3", "IF c GOTO .L1", "y = a + b", "GOTO .L2", ".L1:", "z = a + b", ".L2:", "w = a + b"]
+    assert cse(lines) == ["x = a + b", "c = x >= 3", "IF c GOTO .L1", "y = x", "GOTO .L2", ".L1:", "z = x", ".L2:", "w = x"]
+
+def test_sibling_branches_do_not_share():
+    lines = ["c = a >= 3", "IF c GOTO .L1", "y = a + b", "GOTO .L2", ".L1:", "z = a + b", ".L2:", "w = a + b"]
+    assert cse(lines) == lines
+
+def test_assignment_on_one_path_blocks_the_join():
+    lines = ["x = a + b", "c = a >= 3", "IF c GOTO .L1", "a = 2", ".L1:", "w = a + b"]
+    assert cse(lines) == lines
+
+def test_loop_carried_redefinition_blocks_the_loop_body():
+    lines = ["x = a + b", ".L0:", "y = a + b", "a = y", "c = a < 9", "IF c GOTO .L0", "z = a + b"]
+    assert cse(lines) == lines
+
+def test_volatile_operands_are_excluded():
+    ast = pcp.CParser().parse("char a;\nchar b;\nvolatile char v;\nvoid main(){}\n")
+    symbol_table = generate_symbol_table(ast).scope('main')
+    lines = ["x = v + b", "y = v + b"]
+    assert cse(lines, symbol_table) == lines
+    assert cse(lines) == ["x = v + b", "y = x"]